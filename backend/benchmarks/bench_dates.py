@@ -0,0 +1,77 @@
+"""
+Date normalization microbenchmark.
+
+Checks every string in fixtures/dates.tsv against its expected value, then
+times normalize_dates() over a harvest-sized listing built from the corpus.
+
+    cd backend && python -m benchmarks.bench_dates [--rows 200000]
+"""
+from datetime import date
+from pathlib import Path
+import argparse
+import random
+import sys
+import time
+
+from scrapers.dates import _normalize, memo_stats, normalize_date, normalize_dates
+
+FIXTURES = Path(__file__).parent / "fixtures" / "dates.tsv"
+REFERENCE = date(2025, 1, 10)
+
+
+def load_corpus():
+    cases = []
+    for line in FIXTURES.read_text(encoding="utf-8").splitlines():
+        if not line or line.startswith("#"):
+            continue
+        raw, expected = line.split("\t")
+        cases.append((raw, expected))
+    return cases
+
+
+def check(cases) -> int:
+    failures = 0
+    for raw, expected in cases:
+        actual = normalize_date(raw, REFERENCE)
+        if actual != expected:
+            failures += 1
+            print(f"FAIL {raw!r}: expected {expected!r}, got {actual!r}")
+    print(f"{len(cases) - failures}/{len(cases)} fixture strings normalized as expected")
+    return failures
+
+
+def timed(label: str, fn, rows: int):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {rows / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    cases = load_corpus()
+    failures = check(cases)
+
+    # Listings repeat the same few deadlines; vary the date so the memo is realistic
+    rng = random.Random(0)
+    templates = [raw for raw, _ in cases]
+    listing = []
+    for _ in range(args.rows):
+        template = rng.choice(templates)
+        listing.append(template.replace("27", str(rng.randint(10, 28))))
+
+    uncached = _normalize.__wrapped__
+    timed("per row, no memo", lambda: [uncached(value.strip(), REFERENCE) for value in listing], args.rows)
+    _normalize.cache_clear()
+    timed("normalize_dates, cold memo", lambda: normalize_dates(listing, REFERENCE), args.rows)
+    timed("normalize_dates, warm memo", lambda: normalize_dates(listing, REFERENCE), args.rows)
+    print(f"memo: {memo_stats()}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Scraper benchmark against the offline portal stand-in (benchmarks/standin.py).
+
+For every scraper path it reports cold latency (first run, including the
+browser pool start for Playwright paths), warm latency (median of --runs),
+peak RSS of this process plus its browser children, Playwright protocol
+calls and HTTP requests served by the stand-in. Results can be stored as a
+baseline and later runs compared against it.
+
+    cd backend && python -m benchmarks.bench_scrapers --save-baseline benchmarks/baseline.json
+    cd backend && python -m benchmarks.bench_scrapers --baseline benchmarks/baseline.json
+
+The stand-in pages are synthetic: hand-written to the portals' structure,
+with generated rows, and the stand-in's JS flow emulation follows the same
+reading of the portal scripts as the HTTP fast paths. The numbers track
+regressions in the scrapers' own work; they do not show that a path still
+matches the live portals.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+
+from benchmarks.standin import PortalStandIn
+
+try:
+    import psutil
+except ImportError:  # in requirements.txt; without it peak_rss_mb excludes Chromium (warned in main)
+    psutil = None
+
+METRICS = ["cold_seconds", "warm_seconds", "peak_rss_mb", "protocol_calls", "http_requests"]
+
+
+class ProtocolCounter:
+    """Counts messages sent over the Playwright driver connection."""
+
+    def __init__(self):
+        self.calls = 0
+        self._original = None
+
+    def install(self):
+        try:
+            from playwright._impl._connection import Connection
+        except ImportError:
+            return
+        original = getattr(Connection, "_send_message_to_server", None)
+        if original is None:
+            return
+        counter = self
+
+        def counted(connection, *args, **kwargs):
+            counter.calls += 1
+            return original(connection, *args, **kwargs)
+
+        Connection._send_message_to_server = counted
+        self._original = (Connection, original)
+
+    @property
+    def available(self) -> bool:
+        return self._original is not None
+
+
+class RssSampler:
+    """Samples RSS of this process and its children while a benchmark runs."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _sample(self) -> float:
+        if psutil is None:
+            # ru_maxrss is in KiB on Linux; it is a lifetime peak and excludes live children
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    async def _run(self):
+        while True:
+            self.peak_mb = max(self.peak_mb, self._sample())
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self) -> "RssSampler":
+        self.peak_mb = self._sample()
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+def scraper_benchmarks() -> Dict[str, Callable]:
+    # Imported here so the scrapers pick up the stand-in base URLs from the environment
+    from scrapers.base import Deadline
+    from scrapers.gov import GovernmentPortalScraper
+    from scrapers.kanagawa import KanagawaScraper
+    from scrapers.kanagawa_http import KanagawaHttpScraper
+    from scrapers.tokyo import SEARCH_DEADLINE_SECONDS, TokyoMetroScraper
+    from scrapers.tokyo_http import TokyoHttpScraper
+
+    async def tokyo_browser(pool):
+        rows = []
+        async for batch in TokyoMetroScraper(pool)._iter_browser("", "goods", None, Deadline(SEARCH_DEADLINE_SECONDS)):
+            rows.extend(batch)
+        return rows
+
+    async def gov_browser(pool):
+        found = await GovernmentPortalScraper(pool).search_many(["工事", "購入", "業務"], "all")
+        return [item for items in found.values() for item in items]
+
+    # name -> (uses the browser pool, coroutine factory returning the rows)
+    return {
+        "tokyo/http": (False, lambda pool: TokyoHttpScraper(pool).search("", "goods")),
+        "tokyo/browser": (True, tokyo_browser),
+        "gov/browser": (True, gov_browser),
+        "kanagawa/http": (False, lambda pool: KanagawaHttpScraper(pool).crawl_listing("goods")),
+        "kanagawa/browser": (True, lambda pool: KanagawaScraper(pool)._crawl_listing_browser("goods")),
+    }
+
+
+async def measure(name: str, uses_browser: bool, run: Callable[[object], Awaitable[List]],
+                  runs: int, standin: PortalStandIn, protocol: ProtocolCounter) -> dict:
+    from scrapers.browser_pool import BrowserPool
+
+    pool = BrowserPool(size=1)
+    requests_before = sum(standin.requests.values())
+    calls_before = protocol.calls
+    try:
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            if uses_browser:
+                await pool.start()
+            rows = await run(pool)
+            cold = time.perf_counter() - started
+
+            warm = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                await run(pool)
+                warm.append(time.perf_counter() - started)
+    finally:
+        await pool.stop()
+
+    total_runs = runs + 1
+    return {
+        "rows": len(rows),
+        "cold_seconds": round(cold, 3),
+        "warm_seconds": round(statistics.median(warm), 3) if warm else None,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "protocol_calls": round((protocol.calls - calls_before) / total_runs, 1) if protocol.available else None,
+        "http_requests": round((sum(standin.requests.values()) - requests_before) / total_runs, 1),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Lines describing every metric that got worse than baseline * (1 + tolerance)."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or "error" in current:
+            continue
+        for metric in METRICS:
+            now, then = current.get(metric), previous.get(metric)
+            if now is None or not then:
+                continue
+            if now > then * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {then} -> {now} (+{(now / then - 1) * 100:.0f}%)")
+    return regressions
+
+
+def report(results: Dict[str, dict], baseline: Optional[Dict[str, dict]]):
+    print(f"{'scraper':<18}{'rows':>6}" + "".join(f"{m:>16}" for m in METRICS))
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<18} error: {result['error']}")
+            continue
+        cells = []
+        for metric in METRICS:
+            value = result.get(metric)
+            text = "-" if value is None else str(value)
+            previous = (baseline or {}).get(name, {}).get(metric)
+            if value is not None and previous:
+                text += f" ({(value / previous - 1) * 100:+.0f}%)"
+            cells.append(f"{text:>16}")
+        print(f"{name:<18}{result['rows']:>6}" + "".join(cells))
+
+
+async def run_all(args) -> Dict[str, dict]:
+    with PortalStandIn(latency=args.latency_ms / 1000) as standin:
+        os.environ.update(standin.env())
+        protocol = ProtocolCounter()
+        protocol.install()
+        results = {}
+        for name, (uses_browser, run) in scraper_benchmarks().items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            try:
+                results[name] = await measure(name, uses_browser, run, args.runs, standin, protocol)
+            except Exception as e:
+                results[name] = {"error": repr(e)}
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="warm runs per scraper")
+    parser.add_argument("--only", action="append", help="name prefix, e.g. tokyo or kanagawa/http")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stand-in delay per response")
+    parser.add_argument("--baseline", help="compare against this baseline JSON")
+    parser.add_argument("--save-baseline", help="write the results to this baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if psutil is None:
+        print("warning: psutil is not installed; peak_rss_mb covers this process only, not Chromium",
+              file=sys.stderr)
+    results = asyncio.run(run_all(args))
+    report(results, baseline)
+
+    if args.save_baseline:
+        # Paths not measured this run (--only, or no Chromium here) keep their recorded entries
+        saved = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, encoding="utf-8") as f:
+                saved = json.load(f)
+        saved.update((name, result) for name, result in results.items() if "error" not in result)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+function SelectTargetSubmit(mode, sub, target) {
+    document.frmPbi.mode.value = mode;
+    document.frmPbi.sub.value = sub;
+    document.frmPbi.target = target;
+    document.frmPbi.submit();
+}
+
+function SelectSubmitOrder(mode, sub) {
+    document.frmPbi.mode.value = mode;
+    document.frmPbi.sub.value = sub;
+    document.frmPbi.submit();
+}
+
+function SelectSubmit(mode, sub) {
+    document.frmPbi.mode.value = mode;
+    document.frmPbi.sub.value = sub;
+    document.frmPbi.submit();
+}
+
+function SelectPage(page) {
+    document.frmPbi.page.value = page;
+    document.frmPbi.mode.value = 4;
+    document.frmPbi.sub.value = 2;
+    document.frmPbi.submit();
+}
+
+function SelectSubmitNo(no) {
+    document.frmPbi.no.value = no;
+    document.frmPbi.mode.value = 5;
+    document.frmPbi.sub.value = 1;
+    document.frmPbi.submit();
+}
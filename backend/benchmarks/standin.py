@@ -0,0 +1,289 @@
+"""
+Offline stand-in for the three portals, built from the page fixtures in
+fixtures/portals/. It reproduces the flows the scrapers drive:
+- Tokyo: indexPbi.jsp → SelectTargetSubmit(3,3) → SelectSubmitOrder(4,1) → SelectPage(n)
+- Gov: OAA0100 form → #OAA0102 result table
+- Kanagawa: top page → frameset menu → P6510_10 popup → paged result table
+
+Each portal is mounted under its own prefix; env() returns the base URL
+overrides the scrapers read (TOKYO_BASE_URL, GOV_BASE_URL, KANAGAWA_BASE_URL).
+
+    cd backend && python -m benchmarks.standin --port 8010 --latency-ms 50
+"""
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from html import escape
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import math
+import random
+import threading
+import time
+
+PORTALS = Path(__file__).parent / "fixtures" / "portals"
+
+# Tokyo and Kanagawa serve Shift_JIS like the real sites; p-portal is UTF-8
+ENCODINGS = {"tokyo": "cp932", "gov": "utf-8", "kanagawa": "cp932"}
+CHARSETS = {"cp932": "Shift_JIS", "utf-8": "UTF-8"}
+
+TOKYO_PAGE_SIZE = 20
+EMPTY_MESSAGE = "該当するデータはありません"
+
+_SUBJECTS = ["庁舎清掃業務委託", "コピー用紙の購入", "道路補修工事", "パソコン賃貸借", "警備業務委託",
+             "橋りょう塗装工事", "消耗品の購入", "システム保守業務", "河川しゅんせつ工事", "植栽管理業務委託",
+             "複合機保守", "給食調理業務委託", "下水道管更生工事", "電力供給", "印刷物の製造"]
+_PLACES = ["本庁舎", "第二庁舎", "北部事務所", "南部事務所", "中央図書館", "総合病院", "県立高校", "浄水場"]
+_ORGS = ["総務局", "財務局", "建設局", "福祉局", "教育庁", "水道局", "環境局", "警視庁"]
+_CATEGORIES = {"construction": "工事", "goods": "物品", "services": "役務"}
+
+
+def _rows(portal: str, count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Deterministic listing; every title contains one of _SUBJECTS."""
+    rng = random.Random(f"{portal}:{seed}")
+    rows = []
+    for i in range(count):
+        subject = _SUBJECTS[i % len(_SUBJECTS)]
+        category = "construction" if "工事" in subject else rng.choice(["goods", "services"])
+        month, day = rng.randint(1, 12), rng.randint(1, 28)
+        rows.append({
+            "no": str(i + 1),
+            "title": f"{rng.choice(_PLACES)}{subject}（その{i // len(_SUBJECTS) + 1}）",
+            "org": rng.choice(_ORGS),
+            "category": category,
+            "era_date": f"R7.{month}.{day}",
+            "kanji_date": f"令和07年{month:02d}月{day:02d}日",
+            "western_date": f"2025/{month:02d}/{day:02d}",
+        })
+    return rows
+
+
+def _render(name: str, **values: str) -> str:
+    text = (PORTALS / name).read_text(encoding="utf-8")
+    for key, value in values.items():
+        text = text.replace("{{" + key + "}}", value)
+    return text
+
+
+class PortalStandIn:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 rows: Optional[Dict[str, int]] = None):
+        counts = {"tokyo": 120, "gov": 60, "kanagawa": 250}
+        counts.update(rows or {})
+        self.data = {portal: _rows(portal, count) for portal, count in counts.items()}
+        # Per-response delay in seconds, to approximate the real round trip
+        self.latency = latency
+        self.requests: Counter = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        return {
+            "TOKYO_BASE_URL": f"{self.base_url}/tokyo",
+            "GOV_BASE_URL": f"{self.base_url}/gov",
+            "KANAGAWA_BASE_URL": f"{self.base_url}/kanagawa",
+        }
+
+    def start(self) -> "PortalStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "PortalStandIn":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- portal pages --------------------------------------------------------
+
+    def tokyo(self, path: str, form: Dict[str, str]) -> Optional[str]:
+        if path == "/indexPbi.jsp":
+            return _render("tokyo/indexPbi.jsp.html")
+        if path != "/PbiServlet":
+            return None
+        mode, sub = form.get("mode"), form.get("sub")
+        if (mode, sub) == ("3", "3"):
+            return _render("tokyo/search.html")
+        if mode != "4":
+            return None
+
+        keyword = form.get("ankenName", "")
+        categories = set()
+        if form.get("constConsgoods"):
+            categories.add("construction")
+        if form.get("itemConsgoods"):
+            categories.update(("goods", "services"))
+        matches = [r for r in self.data["tokyo"]
+                   if keyword in r["title"] and (not categories or r["category"] in categories)]
+        page = max(1, int(form.get("page") or 1)) if sub == "2" else 1
+        start = (page - 1) * TOKYO_PAGE_SIZE
+        shown = matches[start:start + TOKYO_PAGE_SIZE]
+
+        category_fields = "".join(
+            f'<input type="hidden" name="{name}" value="1">'
+            for name in ("constConsgoods", "itemConsgoods") if form.get(name))
+        if shown:
+            header = "".join(f"<th>{h}</th>" for h in
+                             ["No.", "年度", "案件番号", "案件名称", "種別", "契約方法", "公表日", "入札日", "締切日", "履行場所", "担当部署"])
+            body = "".join(
+                f"<tr><td>{r['no']}</td><td>令和7年度</td><td>7-{int(r['no']):05d}</td>"
+                f"<td><a href=\"javascript:SelectSubmitNo({r['no']})\">{escape(r['title'])}</a></td>"
+                f"<td>{_CATEGORIES[r['category']]}</td><td>一般競争入札</td><td>R7.1.6</td><td>{r['era_date']}</td>"
+                f"<td>{r['era_date']}</td><td>東京都内</td><td>{r['org']}</td></tr>"
+                for r in shown)
+            results = f'<table class="list-data" border="1"><tr>{header}</tr>{body}</table>'
+        else:
+            results = f"<p>{EMPTY_MESSAGE}</p>"
+        pager = ""
+        if start + TOKYO_PAGE_SIZE < len(matches):
+            pager = f'<a href="javascript:SelectPage({page + 1})">次へ</a>'
+        return _render("tokyo/result.html", page=str(page), keyword=escape(keyword),
+                       category_fields=category_fields, total=str(len(matches)), results=results, pager=pager)
+
+    def gov(self, path: str, form: Dict[str, List[str]]) -> Optional[str]:
+        classes = set(form.get("procurementClassification", []))
+        checked = {name: "checked" if code in classes else ""
+                   for name, code in (("goods", "01"), ("services", "02"), ("construction", "03"), ("survey", "04"))}
+        keyword = (form.get("caseName") or [""])[0]
+        if path == "/pps-web-biz/UAA01/OAA0100":
+            return _render("gov/OAA0100.html", keyword="", results="",
+                           **{f"checked_{k}": "" for k in checked})
+        if path != "/pps-web-biz/UAA01/OAA0102":
+            return None
+
+        wanted = {category for category, code in (("goods", "01"), ("services", "02"), ("construction", "03"))
+                  if code in classes}
+        matches = [r for r in self.data["gov"]
+                   if keyword in r["title"] and (not wanted or r["category"] in wanted)]
+        if matches:
+            body = "".join(
+                f'<tr class="highlight"><td id="r{r["no"]}-articleNm">{escape(r["title"])}</td>'
+                f'<td id="r{r["no"]}-procurementOrgan">{r["org"]}</td>'
+                f'<td id="r{r["no"]}-procurementImplementNoticeBean">公告日 令和07年01月06日<br>締切 {r["kanji_date"]}</td>'
+                f'<td><a class="koukoku info-button" href="OAA0106?id={r["no"]}">公示本文</a>'
+                f'<a class="info-button keiyaku" href="#" onclick="window.open(\'https://www.p-portal.go.jp/pps-web-biz/UAA01/OAA0107?id={r["no"]}\')">入札</a></td></tr>'
+                for r in matches)
+            results = (f'<table class="main-summit-info"><thead><tr><th>調達案件名称</th><th>調達機関</th>'
+                       f'<th>公告日</th><th></th></tr></thead><tbody>{body}</tbody></table>')
+        else:
+            results = f"<p>{EMPTY_MESSAGE}</p>"
+        return _render("gov/OAA0100.html", keyword=escape(keyword), results=results,
+                       **{f"checked_{k}": v for k, v in checked.items()})
+
+    def kanagawa(self, path: str, form: Dict[str, str]) -> Optional[str]:
+        if path in ("", "/"):
+            return _render("kanagawa/index.html")
+        if path != "/P6510/search":
+            file = PORTALS / "kanagawa" / path.lstrip("/")
+            return _render(f"kanagawa/{path.lstrip('/')}") if file.is_file() else None
+
+        page_size = int(form.get("ddl_pageSize") or 10)
+        page = 1 if "btn_search" in form or "btn_next" not in form else int(form.get("hdn_page") or 1) + 1
+        selected = {f"selected_{n}": "selected" if n == str(page_size) else "" for n in ("10", "50", "100")}
+        if "btn_search" not in form and "btn_next" not in form:
+            return _render("kanagawa/P6510/search.html", page="1", results="", pager="", **selected)
+
+        rows = self.data["kanagawa"]
+        pages = max(1, math.ceil(len(rows) / page_size))
+        page = min(page, pages)
+        shown = rows[(page - 1) * page_size:page * page_size]
+        header = "".join(f"<th>{h}</th>" for h in
+                         ["No.", "詳細", "添付", "調達番号", "所属", "入札方法", "種別", "開札日", "件名", "納入場所", "締切日"])
+        body = "".join(
+            f"<tr><th>{r['no']}</th><td><input type=\"button\" value=\"詳細\"></td><td>-</td>"
+            f"<td>P{int(r['no']):06d}</td><td>{r['org']}</td><td>一般競争入札</td><td>{_CATEGORIES[r['category']]}</td>"
+            f"<td>{r['western_date']}</td><td>{escape(r['title'])}</td><td>{r['org']}庁舎</td>"
+            f"<td>{r['western_date']} 17:00</td></tr>"
+            for r in shown)
+        results = f'<p>{page} / {pages} ページ</p><table border="1"><tr>{header}</tr>{body}</table>'
+        pager = '<input type="submit" name="btn_next" value="次へ">' if page < pages else ""
+        return _render("kanagawa/P6510/search.html", page=str(page), results=results, pager=pager, **selected)
+
+    def static(self, portal: str, path: str) -> Optional[bytes]:
+        file = PORTALS / portal / path.lstrip("/")
+        if path.endswith(".js") and file.is_file():
+            return file.read_bytes()
+        return None
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._serve(b"")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self._serve(self.rfile.read(length))
+
+            def _serve(self, body: bytes):
+                if standin.latency:
+                    time.sleep(standin.latency)
+                url = urlsplit(self.path)
+                portal, _, path = url.path.lstrip("/").partition("/")
+                path = "/" + path
+                encoding = ENCODINGS.get(portal)
+                if encoding is None:
+                    return self._send(404, b"", "text/plain")
+                standin.requests[portal] += 1
+
+                script = standin.static(portal, path)
+                if script is not None:
+                    return self._send(200, script, "application/javascript")
+
+                fields = parse_qs(url.query, keep_blank_values=True, encoding=encoding)
+                for key, values in parse_qs(body.decode("ascii", "replace"), keep_blank_values=True,
+                                            encoding=encoding).items():
+                    fields.setdefault(key, []).extend(values)
+                if portal == "gov":
+                    html = standin.gov(path, fields)
+                else:
+                    single = {key: values[-1] for key, values in fields.items()}
+                    html = getattr(standin, portal)(path, single)
+                if html is None:
+                    return self._send(404, b"", "text/plain")
+                self._send(200, html.encode(encoding, "replace"), f"text/html; charset={CHARSETS[encoding]}")
+
+            def _send(self, status: int, payload: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    standin = PortalStandIn(args.host, args.port, latency=args.latency_ms / 1000)
+    for key, value in standin.env().items():
+        print(f"export {key}={value}")
+    try:
+        standin._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
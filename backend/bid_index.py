@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from scrapers.base import BidItem, fingerprint
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.getenv("BID_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bids.db"))
+
+# trigram needs at least 3 characters per term; shorter Japanese keywords
+# (警備, 清掃, ...) fall back to a LIKE scan over the base table.
+TRIGRAM_MIN_LENGTH = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bids (
+    id INTEGER PRIMARY KEY,
+    row_key TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    organization TEXT NOT NULL,
+    deadline TEXT,
+    category TEXT NOT NULL,
+    url TEXT NOT NULL,
+    source TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bids_source ON bids(source);
+CREATE VIRTUAL TABLE IF NOT EXISTS bids_fts USING fts5(
+    title, organization, content='bids', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS bids_ai AFTER INSERT ON bids BEGIN
+    INSERT INTO bids_fts(rowid, title, organization) VALUES (new.id, new.title, new.organization);
+END;
+CREATE TRIGGER IF NOT EXISTS bids_ad AFTER DELETE ON bids BEGIN
+    INSERT INTO bids_fts(bids_fts, rowid, title, organization) VALUES ('delete', old.id, old.title, old.organization);
+END;
+CREATE TRIGGER IF NOT EXISTS bids_au AFTER UPDATE OF title, organization ON bids BEGIN
+    INSERT INTO bids_fts(bids_fts, rowid, title, organization) VALUES ('delete', old.id, old.title, old.organization);
+    INSERT INTO bids_fts(rowid, title, organization) VALUES (new.id, new.title, new.organization);
+END;
+"""
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class BidIndex:
+    """
+    Local SQLite store of harvested listings with an FTS5 (trigram) index
+    over title and organization.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, items: Iterable[BidItem]) -> int:
+        """Inserts new listings and refreshes last_seen on known ones. Returns rows written."""
+        now = time.time()
+        rows = [(fingerprint(i), i.title, i.organization, i.deadline, i.category, i.url, i.source, now, now)
+                for i in items if i.title]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """INSERT INTO bids (row_key, title, organization, deadline, category, url, source, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(row_key) DO UPDATE SET
+                       category=excluded.category, url=excluded.url, last_seen=excluded.last_seen""",
+                rows,
+            )
+        return len(rows)
+
+    def search(self, keyword: str, sources: Optional[List[str]] = None, limit: int = 500) -> List[BidItem]:
+        keyword = (keyword or "").strip()
+        params: list = []
+        source_clause = ""
+        if sources:
+            source_clause = f" AND b.source IN ({','.join('?' * len(sources))})"
+
+        if not keyword:
+            sql = f"SELECT b.* FROM bids b WHERE 1=1{source_clause} ORDER BY b.last_seen DESC LIMIT ?"
+            params = list(sources or []) + [limit]
+        elif len(keyword) >= TRIGRAM_MIN_LENGTH:
+            sql = f"""SELECT b.* FROM bids_fts f JOIN bids b ON b.id = f.rowid
+                      WHERE bids_fts MATCH ?{source_clause} ORDER BY f.rank LIMIT ?"""
+            params = [_fts_phrase(keyword)] + list(sources or []) + [limit]
+        else:
+            sql = f"""SELECT b.* FROM bids b WHERE (b.title LIKE ? OR b.organization LIKE ?){source_clause}
+                      ORDER BY b.last_seen DESC LIMIT ?"""
+            pattern = f"%{keyword}%"
+            params = [pattern, pattern] + list(sources or []) + [limit]
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [BidItem(
+            title=r["title"],
+            organization=r["organization"],
+            deadline=r["deadline"],
+            category=r["category"],
+            url=r["url"],
+            source=r["source"],
+        ) for r in rows]
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Drops listings that no harvest has seen for `max_age_seconds`."""
+        cutoff = time.time() - max_age_seconds
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM bids WHERE last_seen < ?", (cutoff,))
+        return cur.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM bids").fetchone()[0]
+
+    # Async wrappers so the event loop never blocks on SQLite
+
+    async def upsert_async(self, items: Iterable[BidItem]) -> int:
+        items = list(items)
+        return await asyncio.get_running_loop().run_in_executor(None, self.upsert, items)
+
+    async def search_async(self, keyword: str, sources: Optional[List[str]] = None, limit: int = 500) -> List[BidItem]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.search, keyword, sources, limit)
+
+    async def prune_async(self, max_age_seconds: float) -> int:
+        return await asyncio.get_running_loop().run_in_executor(None, self.prune, max_age_seconds)
+
+    async def count_async(self) -> int:
+        return await asyncio.get_running_loop().run_in_executor(None, self.count)
+
+
+_index: Optional[BidIndex] = None
+
+
+def get_index() -> BidIndex:
+    global _index
+    if _index is None:
+        _index = BidIndex()
+    return _index
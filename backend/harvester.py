@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from bid_index import BidIndex
+from scheduler import scheduler, PRIORITY_LOW
+from scrapers.base import BaseScraper
+from scrapers.gov import GovernmentPortalScraper
+from scrapers.kanagawa import KanagawaScraper
+from scrapers.tokyo import TokyoMetroScraper
+from worker import scraper_for
+
+logger = logging.getLogger(__name__)
+
+HARVEST_INTERVAL_SECONDS = float(os.getenv("HARVEST_INTERVAL", "3600"))
+# Listings not seen by any harvest for this long are dropped from the index
+HARVEST_RETENTION_SECONDS = float(os.getenv("HARVEST_RETENTION", str(14 * 24 * 3600)))
+# Extra keywords to crawl on every pass besides the unfiltered listings
+HARVEST_KEYWORDS = [k.strip() for k in os.getenv("HARVEST_KEYWORDS", "").split(",") if k.strip()]
+
+
+class Harvester:
+    """
+    Periodically collects listings from every scraper into the local BidIndex.
+    Each pass crawls the unfiltered listings plus keywords users searched
+    recently, so popular queries stay answerable from the index. Crawls run
+    at low priority, on portal slots no live search is waiting for.
+    """
+
+    def __init__(self, index: BidIndex, interval: float = HARVEST_INTERVAL_SECONDS, recent_keywords: int = 50):
+        self.index = index
+        self.interval = interval
+        self.recent: Deque[str] = deque(maxlen=recent_keywords)
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record_keyword(self, keyword: str):
+        """Remembers a user keyword so the next pass harvests it too."""
+        if keyword and keyword not in self.recent:
+            self.recent.append(keyword)
+
+    def _keywords(self) -> List[str]:
+        return [""] + HARVEST_KEYWORDS + [k for k in self.recent if k not in HARVEST_KEYWORDS]
+
+    def _plan(self) -> List[Tuple[BaseScraper, str, str]]:
+        tokyo, kanagawa = scraper_for(TokyoMetroScraper), scraper_for(KanagawaScraper)
+        plan = []
+        for kw in self._keywords():
+            plan.append((tokyo, kw, "construction"))
+            plan.append((tokyo, kw, "goods"))
+        # The Kanagawa snapshot already holds the whole listing
+        plan.append((kanagawa, "", "goods"))
+        return plan
+
+    async def run_once(self) -> int:
+        written = 0
+        for scraper, kw, cat in self._plan():
+            try:
+                items = await scheduler.run(scraper.source_name, "harvester",
+                                            lambda: scraper.search(kw, cat), PRIORITY_LOW)
+                written += await self.index.upsert_async(items)
+            except Exception as e:
+                logger.error(f"Harvest failed for {type(scraper).__name__} '{kw}' ({cat}): {e}")
+
+        # Gov Portal runs every keyword through one form session
+        gov = scraper_for(GovernmentPortalScraper)
+        try:
+            batches = await scheduler.run(gov.source_name, "harvester",
+                                          lambda: gov.search_many(self._keywords(), "all"), PRIORITY_LOW)
+            for items in batches.values():
+                written += await self.index.upsert_async(items)
+        except Exception as e:
+            logger.error(f"Harvest failed for Gov Portal: {e}")
+        removed = await self.index.prune_async(HARVEST_RETENTION_SECONDS)
+        self.last_run = time.time()
+        logger.info(f"Harvest pass stored {written} rows, pruned {removed}, "
+                    f"index size {await self.index.count_async()}")
+        return written
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Harvest pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Searches running at once; further jobs wait in "queued"
+JOB_CONCURRENCY = int(os.getenv("SEARCH_JOB_CONCURRENCY", "4"))
+# Jobs kept in memory; the oldest finished ones are dropped first
+MAX_JOBS = int(os.getenv("SEARCH_JOB_MAX", "100"))
+# Finished jobs are replayable by id this long
+JOB_TTL_SECONDS = float(os.getenv("SEARCH_JOB_TTL", "1800"))
+# A finished job is only reused for an identical search this long; kept below the
+# result cache TTLs, so searching again later re-runs it (and refreshes stale entries)
+JOB_REUSE_SECONDS = float(os.getenv("SEARCH_JOB_REUSE", "60"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobQueueFull(Exception):
+    """Every job slot is taken by unfinished jobs."""
+
+
+class SearchJob:
+    def __init__(self, key: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        # Serialized NDJSON lines, each carrying its index as "seq"
+        self.events: List[bytes] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def append(self, event: dict):
+        self.events.append(dumps({**event, "seq": len(self.events)}) + b"\n")
+        self._notify()
+
+    def _notify(self):
+        # Wake every follower, then arm a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self, since: int = 0) -> AsyncIterator[bytes]:
+        """Buffered events from `since`, then live ones until the job finishes."""
+        position = max(0, since)
+        while True:
+            changed = self._changed
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.finished:
+                return
+            await changed.wait()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "events": len(self.events),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "params": self.params,
+        }
+
+
+class JobManager:
+    """
+    Runs searches detached from the HTTP request that started them, so a
+    reload can reattach to the buffered event stream. Identical searches
+    share one job while it is running or finished within `reuse` seconds.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, max_jobs: int = MAX_JOBS, ttl: float = JOB_TTL_SECONDS,
+                 reuse: float = JOB_REUSE_SECONDS):
+        self.concurrency = concurrency
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.reuse = reuse
+        self._jobs: "OrderedDict[str, SearchJob]" = OrderedDict()
+        self._by_key: dict = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.deduplicated = 0
+
+    def get(self, job_id: str) -> Optional[SearchJob]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def submit(self, key: str, params: dict, run: Callable[[], AsyncIterator[dict]]) -> Tuple[SearchJob, bool]:
+        """Returns (job, created); an unfinished or just finished job for the same key is reused."""
+        self._expire()
+        existing = self._jobs.get(self._by_key.get(key, ""))
+        if existing is not None and self._reusable(existing):
+            self.deduplicated += 1
+            return existing, False
+
+        if len(self._jobs) >= self.max_jobs:
+            self._evict_finished(len(self._jobs) - self.max_jobs + 1)
+            if len(self._jobs) >= self.max_jobs:
+                raise JobQueueFull(f"{len(self._jobs)} unfinished search jobs")
+
+        job = SearchJob(key, params)
+        self._jobs[job.id] = job
+        self._by_key[key] = job.id
+        job.task = asyncio.ensure_future(self._run(job, run))
+        return job, True
+
+    def _reusable(self, job: SearchJob) -> bool:
+        if not job.finished:
+            return True
+        return job.status == DONE and time.time() - job.finished_at <= self.reuse
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.finished or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    async def _run(self, job: SearchJob, run: Callable[[], AsyncIterator[dict]]):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                async for event in run():
+                    job.append(event)
+            job.status = DONE
+        except asyncio.CancelledError:
+            # Followers need a terminal event to stop waiting for "result"
+            job.append({"type": "error", "message": "検索は中止されました"})
+            job.status = CANCELLED
+        except Exception as e:
+            logger.error(f"Search job {job.id} failed: {e!r}")
+            job.append({"type": "error", "message": "検索中にエラーが発生しました"})
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job._notify()
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            self._drop(job_id)
+
+    def _evict_finished(self, count: int):
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:count]:
+            self._drop(job_id)
+
+    def _drop(self, job_id: str):
+        job = self._jobs.pop(job_id)
+        if self._by_key.get(job.key) == job_id:
+            del self._by_key[job.key]
+
+    def stats(self) -> dict:
+        statuses = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "jobs": len(self._jobs),
+            "max_jobs": self.max_jobs,
+            "concurrency": self.concurrency,
+            "by_status": statuses,
+            "deduplicated": self.deduplicated,
+        }
+
+
+job_manager = JobManager()
@@ -1,9 +1,15 @@
 import os
 import json
+import hashlib
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
 import google.generativeai as genai
 import logging
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
+from metrics import span
 
 logger = logging.getLogger(__name__)
 
@@ -17,21 +23,12 @@ if GEMINI_API_KEY:
 else:
     logger.warning("GEMINI_API_KEY not found in environment variables.")
 
-def _get_model():
-    return genai.GenerativeModel('gemini-2.5-flash')
+MODEL_NAME = 'gemini-2.5-flash'
 
-async def analyze_requirements(text: str) -> List[Tuple[str, str]]:
-    """
-    Analyzes the user's free text and returns a list of (keyword, category) tuples.
-    Categories: 'construction', 'goods', 'services'.
-    """
-    if not GEMINI_API_KEY:
-        logger.error("Gemini API key missing")
-        return [("Error: API Key Missing", "all")]
+def _get_model():
+    return genai.GenerativeModel(MODEL_NAME)
 
-    model = _get_model()
-    
-    prompt = f"""
+ANALYZE_PROMPT = """
     You are a procurement expert. Your task is to translate the user's request into effective search keywords for government tenders (入札案件).
     
     User Input: "{text}"
@@ -58,22 +55,177 @@ async def analyze_requirements(text: str) -> List[Tuple[str, str]]:
         {{"keyword": "車両借上", "category": "services"}}
     ]
     """
+
+REFINE_PROMPT = """
+    The user is looking for procurement opportunities based on: "{text}".
+    
+    We previously searched for: {previous_keywords}.
+    These searches yielded few or no results.
+    
+    Suggest 3 BROADER or ALTERNATIVE search queries (keyword, category) that might yield more results.
+    Think about synonyms, related fields, or more general terms.
+    
+    Return the result ONLY as a JSON array of objects with 'keyword' and 'category' fields.
+    """
+
+# Cached keyword plans are tied to the exact prompt and model; editing a
+# prompt changes its version and silently invalidates older entries.
+def _prompt_version(template: str) -> str:
+    return hashlib.sha1(f"{MODEL_NAME}\n{template}".encode("utf-8")).hexdigest()[:12]
+
+ANALYZE_PROMPT_VERSION = _prompt_version(ANALYZE_PROMPT)
+REFINE_PROMPT_VERSION = _prompt_version(REFINE_PROMPT)
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.json"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+# New entries are written to disk at most once per this many seconds
+LLM_CACHE_FLUSH_DELAY = float(os.getenv("LLM_CACHE_FLUSH_DELAY", "5"))
+
+class KeywordCache:
+    """
+    (keyword, category) lists keyed on normalized input + prompt version.
+    Kept in memory and mirrored to a JSON file so it survives restarts; puts
+    are batched into one write per `flush_delay`, done off the event loop.
+    """
+
+    def __init__(self, path: str, max_entries: int, flush_delay: float = LLM_CACHE_FLUSH_DELAY):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_delay = flush_delay
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, List[List[str]]]" = OrderedDict()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Writes may overlap (executor and flush()); an older snapshot never overwrites a newer one
+        self._write_lock = threading.Lock()
+        self._generation = 0
+        self._written_generation = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = OrderedDict(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable LLM cache {self.path}: {e}")
+
+    def _save(self, generation: int, entries: List[Tuple[str, List[List[str]]]]):
+        tmp_path = self.path + ".tmp"
+        with self._write_lock:
+            if generation <= self._written_generation:
+                return
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(OrderedDict(entries), f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._written_generation = generation
+            except Exception as e:
+                logger.warning(f"Could not persist LLM cache: {e}")
+
+    def _snapshot(self) -> Tuple[int, List[Tuple[str, List[List[str]]]]]:
+        return self._generation, list(self._entries.items())
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts): write through
+            self._save(*self._snapshot())
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_delay, self._flush_in_background)
+
+    def _flush_in_background(self):
+        self._flush_handle = None
+        asyncio.get_running_loop().run_in_executor(None, self._save, *self._snapshot())
+
+    def flush(self):
+        """Writes pending entries now; called at shutdown."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._generation > self._written_generation:
+            self._save(*self._snapshot())
+
+    @staticmethod
+    def key(version: str, *parts: str) -> str:
+        normalized = [" ".join(unicodedata.normalize("NFKC", p).split()).lower() for p in parts]
+        return hashlib.sha256("\x1f".join([version] + normalized).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Tuple[str, str]]]:
+        # Entries written before keywords were validated may hold null keywords
+        queries = _valid_queries(self._entries.get(key) or [])
+        if not queries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return queries
+
+    def put(self, key: str, queries: List[Tuple[str, str]]):
+        self._entries[key] = [[k, c] for k, c in queries]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._generation += 1
+        self._schedule_flush()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+keyword_cache = KeywordCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+
+
+def _valid_queries(queries) -> List[Tuple[str, str]]:
+    """(keyword, category) pairs with a non-empty keyword string; a missing or odd category becomes 'all'."""
+    valid = []
+    for keyword, category in queries:
+        if not isinstance(keyword, str) or not keyword.strip():
+            continue
+        valid.append((keyword.strip(), category if isinstance(category, str) and category else "all"))
+    return valid
+
+
+def _parse_queries(content: str) -> List[Tuple[str, str]]:
+    # Clean up code blocks if present
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.endswith("```"):
+        content = content[:-3]
+    data = json.loads(content.strip())
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a JSON array of keywords, got {type(data).__name__}")
+    return _valid_queries((item.get("keyword"), item.get("category", "all"))
+                          for item in data if isinstance(item, dict))
+
+
+async def analyze_requirements(text: str) -> List[Tuple[str, str]]:
+    """
+    Analyzes the user's free text and returns a list of (keyword, category) tuples.
+    Categories: 'construction', 'goods', 'services'.
+    """
+    if not GEMINI_API_KEY:
+        logger.error("Gemini API key missing")
+        return [("Error: API Key Missing", "all")]
+
+    cache_key = keyword_cache.key(ANALYZE_PROMPT_VERSION, text)
+    cached = keyword_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Keyword plan served from LLM cache")
+        return cached
+
+    model = _get_model()
+    
+    prompt = ANALYZE_PROMPT.format(text=text)
     
     try:
-        response = await model.generate_content_async(prompt)
-        content = response.text
-        
-        # Clean up code blocks if present
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        data = json.loads(content.strip())
-        results = []
-        for item in data:
-            results.append((item.get("keyword"), item.get("category", "all")))
-        
+        with span("llm.analyze"):
+            response = await model.generate_content_async(prompt)
+        results = _parse_queries(response.text)
+        if results:
+            keyword_cache.put(cache_key, results)
         return results
     except Exception as e:
         logger.error(f"Error in analyze_requirements: {e}")
@@ -87,33 +239,24 @@ async def refine_search(text: str, previous_keywords: List[str]) -> List[Tuple[s
     if not GEMINI_API_KEY:
         return []
 
+    # Earlier plans may hold malformed keywords; they must not break the cache key
+    previous_keywords = [k for k in previous_keywords if isinstance(k, str) and k]
+    cache_key = keyword_cache.key(REFINE_PROMPT_VERSION, text, *sorted(previous_keywords))
+    cached = keyword_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Refined keywords served from LLM cache")
+        return cached
+
     model = _get_model()
     
-    prompt = f"""
-    The user is looking for procurement opportunities based on: "{text}".
-    
-    We previously searched for: {previous_keywords}.
-    These searches yielded few or no results.
-    
-    Suggest 3 BROADER or ALTERNATIVE search queries (keyword, category) that might yield more results.
-    Think about synonyms, related fields, or more general terms.
-    
-    Return the result ONLY as a JSON array of objects with 'keyword' and 'category' fields.
-    """
+    prompt = REFINE_PROMPT.format(text=text, previous_keywords=previous_keywords)
     
     try:
-        response = await model.generate_content_async(prompt)
-        content = response.text
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
-            
-        data = json.loads(content.strip())
-        results = []
-        for item in data:
-            results.append((item.get("keyword"), item.get("category", "all")))
-        
+        with span("llm.refine"):
+            response = await model.generate_content_async(prompt)
+        results = _parse_queries(response.text)
+        if results:
+            keyword_cache.put(cache_key, results)
         return results
     except Exception as e:
         logger.error(f"Error in refine_search: {e}")
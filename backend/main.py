@@ -1,11 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Set
 import llm_service
 from scrapers.tokyo import TokyoMetroScraper
 from scrapers.gov import GovernmentPortalScraper
 from scrapers.kanagawa import KanagawaScraper
+from scrapers.browser_pool import get_pool
+from scrapers.base import BidItem, fingerprint, resource_filter
+from scrapers.har import har_archive
+from scrapers.tokyo import fast_path as tokyo_fast_path
+from scrapers.tokyo import MAX_ITEMS as TOKYO_MAX_ITEMS
+from scrapers.kanagawa import fast_path as kanagawa_fast_path
+from bid_index import get_index
+from harvester import Harvester
+from result_cache import result_cache
+from scheduler import scheduler, PRIORITY_LOW, PRIORITY_NORMAL
+from singleflight import flights
+from jobs import job_manager, JobQueueFull
+from saved_searches import SavedSearch, SavedSearchRunner, SavedSearchStore, listing_key
+from ranking import ranker
+from serialization import ResultRow, dumps, etag, etag_matches, layout_rows, maybe_gzip, ndjson, result_row
+import worker
+import metrics
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+import os
 import sys
 import asyncio
 import logging
@@ -19,7 +39,93 @@ if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
     logger.info("Set WindowsProactorEventLoopPolicy")
 
-app = FastAPI()
+# Background harvester feeding the local full-text index (mode=index)
+bid_index = get_index()
+harvester = Harvester(bid_index)
+saved_search_store = SavedSearchStore()
+HARVEST_ENABLED = os.getenv("HARVEST_ENABLED", "1") == "1"
+SAVED_SEARCHES_ENABLED = os.getenv("SAVED_SEARCHES_ENABLED", "1") == "1"
+# With SCRAPER_HAR_MODE=replay, load every captured session into the result cache at startup
+HAR_PREWARM = os.getenv("HAR_PREWARM", "1") == "1"
+# SCRAPER_BACKEND=queue: the worker processes this API starts (and restarts) itself
+worker_supervisor = worker.WorkerSupervisor(worker.LOCAL_WORKERS)
+
+# Query parameter source ids -> BidItem.source labels
+SOURCE_NAMES = {"gov": "Gov Portal", "tokyo": "Tokyo Metro", "kanagawa": "Kanagawa"}
+# Search category -> Tokyo listings to query
+TOKYO_CATEGORIES = {"all": ["construction", "goods"], "construction": ["construction"],
+                    "goods": ["goods"], "services": ["goods"]}
+# Kanagawa currently supports "goods" (which covers services too in Kanagawa)
+KANAGAWA_CATEGORIES = ("all", "goods", "services")
+# A saved-search run stops paging Tokyo after this many pages without unseen listings
+SAVED_SEARCH_STOP_PAGES = int(os.getenv("SAVED_SEARCH_STOP_PAGES", "2"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    browser_pool = None
+    if worker.SCRAPER_BACKEND == "queue":
+        # Browsers live in worker processes; this process only submits jobs
+        worker_supervisor.start()
+    else:
+        # One Playwright driver and a warm Chromium pool shared by every search
+        browser_pool = get_pool()
+        await browser_pool.start()
+    if HARVEST_ENABLED:
+        harvester.start()
+    if SAVED_SEARCHES_ENABLED:
+        saved_search_runner.start()
+    prewarm = None
+    if har_archive.mode == "replay" and HAR_PREWARM and browser_pool is not None:
+        prewarm = asyncio.ensure_future(prewarm_from_har())
+    try:
+        yield
+    finally:
+        if prewarm is not None:
+            prewarm.cancel()
+        await harvester.stop()
+        await saved_search_runner.stop()
+        if browser_pool is not None:
+            await browser_pool.stop()
+        await worker_supervisor.stop()
+        llm_service.keyword_cache.flush()
+        if _index_writes:
+            await asyncio.gather(*_index_writes, return_exceptions=True)
+
+
+async def prewarm_from_har():
+    """Replays every captured scraper session into the result cache (e.g. while a portal is down)."""
+    scrapers = {s.source_name: s for s in (TokyoMetroScraper(), GovernmentPortalScraper(), KanagawaScraper())}
+    warmed = 0
+    for capture in har_archive.captures():
+        scraper = scrapers.get(capture.get("source"))
+        category = capture.get("category", "")
+        keywords = capture.get("keywords", [])
+        if scraper is None:
+            continue
+        try:
+            if isinstance(scraper, KanagawaScraper):
+                # Keyword filtering runs on the listing snapshot, not the result cache
+                await scraper.snapshot(category).get()
+                warmed += 1
+                continue
+            if isinstance(scraper, GovernmentPortalScraper):
+                found = await scheduler.run(scraper.source_name, "har-prewarm",
+                                            lambda: scraper.search_many(keywords, category), PRIORITY_LOW)
+            else:
+                found = {}
+                for kw in keywords:
+                    found[kw] = await scheduler.run(scraper.source_name, "har-prewarm",
+                                                    lambda: scraper.search(kw, category), PRIORITY_LOW)
+            for kw, items in found.items():
+                result_cache.put((scraper.source_name, kw or "", category), items)
+                warmed += 1
+        except Exception as e:
+            logger.warning(f"HAR prewarm failed for {capture}: {e!r}")
+    logger.info(f"HAR prewarm loaded {warmed} cached searches")
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,152 +136,631 @@ app.add_middleware(
 )
 
 
-class SearchResult(BaseModel):
-    id: str
-    title: str
-    organization: str
-    deadline: Optional[str]
-    category: str
-    url: str
-    source: str
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+import json
+import time
 
 
-from fastapi.responses import StreamingResponse
-import json
+# Fresh scraper results are written through to the local index in the background.
+# This happens where results are fetched, so cache hits and coalesced callers are not written again.
+_index_writes: Set[asyncio.Task] = set()
 
-@app.get("/api/v1/bids")
-async def search_bids(q: Optional[str] = None, category: Optional[str] = "all", free_text: Optional[str] = None, sources: Optional[str] = "gov,tokyo,kanagawa"):
-    async def event_generator():
-        results = []
-        
-        # Initialize scrapers
-        tokyo_scraper = TokyoMetroScraper()
-        gov_scraper = GovernmentPortalScraper()
-        kanagawa_scraper = KanagawaScraper()
-        
-        target_sources = sources.split(",") if sources else ["gov", "tokyo", "kanagawa"]
-
-        search_queries = []
-        
-        if free_text:
-            logger.info(f"Analyzing free text: {free_text}")
-            yield json.dumps({"type": "log", "message": f"「{free_text}」というご要望を分析しています..."}) + "\n"
+
+def index_in_background(items: List[BidItem]):
+    if not items:
+        return
+    task = asyncio.ensure_future(bid_index.upsert_async(items))
+    _index_writes.add(task)
+    task.add_done_callback(_index_written)
+
+
+def _index_written(task: asyncio.Task):
+    _index_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Writing live results to the index failed: {task.exception()!r}")
+
+
+async def _scheduled_search(scraper, keyword: str, category: str, client: str, priority: int) -> List[BidItem]:
+    if not isinstance(scraper, KanagawaScraper):
+        items = await scheduler.run(scraper.source_name, client, lambda: scraper.search(keyword, category), priority)
+        index_in_background(items)
+        return items
+    # Kanagawa keywords only filter the in-memory listing: just the listing crawl takes a
+    # portal slot, and concurrent keywords share that one crawl
+    snapshot = scraper.snapshot(category)
+    if snapshot.fresh:
+        return scraper.matching(snapshot.rows, keyword)
+
+    async def refresh(flight_client):
+        loaded_at = snapshot.loaded_at
+        rows = await scheduler.run(scraper.source_name, flight_client, snapshot.get, priority)
+        if snapshot.loaded_at != loaded_at:
+            # The whole listing is indexed once per crawl, not per keyword
+            index_in_background(rows)
+        return rows
+
+    try:
+        rows = await flights.do((scraper.source_name, "", f"listing:{category}"), refresh, client, priority)
+    except Exception as e:
+        logger.error(f"Error scraping Kanagawa: {e}")
+        return []
+    # Filtered here rather than via scraper.search: after a failed refresh the snapshot
+    # still serves its previous rows but is not fresh, and search would crawl again
+    return scraper.matching(rows, keyword)
+
+
+def run_scraper(scraper, keyword: str, category: str, client_id: str, priority: int = PRIORITY_NORMAL,
+                max_stale: Optional[float] = None):
+    """Result cache -> single-flight -> per-source scheduler -> scraper.search."""
+    key = (scraper.source_name, keyword or "", category)
+    return result_cache.get_or_fetch(key, lambda: flights.do(
+        key, lambda client: _scheduled_search(scraper, keyword, category, client, priority), client_id, priority),
+        max_stale)
+
+
+async def run_scraper_batch(scraper, keywords: List[str], category: str, client_id: str,
+                            priority: int = PRIORITY_NORMAL, max_stale: Optional[float] = None):
+    """Like run_scraper, but cache misses share one scraper.search_many session."""
+    keys = [(scraper.source_name, kw or "", category) for kw in dict.fromkeys(keywords)]
+
+    async def fetch_many(missing, client):
+        found = await scheduler.run(scraper.source_name, client,
+                                    lambda: scraper.search_many([key[1] for key in missing], category), priority)
+        index_in_background([item for items in found.values() for item in items])
+        return {(scraper.source_name, kw, category): items for kw, items in found.items()}
+
+    cached = await result_cache.get_or_fetch_many(
+        keys, lambda missing: flights.do_many(missing, fetch_many, client_id, priority), max_stale)
+    return {key[1]: items for key, items in cached.items()}
+
+
+async def stream_scraper(scraper, keyword: str, category: str, client_id: str,
+                         priority: int = PRIORITY_NORMAL, limit: Optional[int] = None,
+                         max_stale: Optional[float] = None) -> AsyncIterator[List]:
+    """
+    Streaming run_scraper for scrapers with iter_pages: a cache hit is one
+    batch; a miss holds one scheduler slot while pages are yielded as they
+    arrive, and the collected rows are cached once the crawl completes.
+    Concurrent misses for the same key follow one shared crawl.
+    """
+    key = (scraper.source_name, keyword or "", category)
+    cached, stale = result_cache.lookup(key, max_stale)
+    if cached is not None:
+        if stale:
+            result_cache.refresh_in_background(key, lambda: flights.do(
+                key, lambda client: _scheduled_search(scraper, keyword, category, client, priority), client_id, priority))
+        yield cached
+        return
+
+    async def crawl(client):
+        collected = []
+        async with scheduler.slot(scraper.source_name, client, priority):
+            async for batch in scraper.iter_pages(keyword, category, limit=limit):
+                collected.extend(batch)
+                index_in_background(batch)
+                yield batch
+        result_cache.put(key, collected)
+
+    async for batch in flights.stream(key, crawl, client_id, priority):
+        yield batch
+
+
+async def _single(coro) -> AsyncIterator:
+    yield await coro
+
+
+async def collect_saved_search(saved: SavedSearch, watermark: Dict[str, Set[str]]) -> List[BidItem]:
+    """
+    One incremental run of a saved search: its stored keyword plan goes
+    through the usual cache/single-flight/scheduler path at low priority,
+    taking only cache entries within their TTL: a stale entry would record
+    outdated listings and move the watermark past them.
+    Once a source has a watermark, Tokyo paging stops after
+    SAVED_SEARCH_STOP_PAGES pages that only hold listings already seen.
+    """
+    client_id = f"saved-search-{saved.id}"
+    tokyo_scraper = worker.scraper_for(TokyoMetroScraper)
+    gov_scraper = worker.scraper_for(GovernmentPortalScraper)
+    kanagawa_scraper = worker.scraper_for(KanagawaScraper)
+
+    async def tokyo(kw, tc):
+        known = watermark.get(tokyo_scraper.source_name)
+        items, stale_pages = [], 0
+        async for batch in stream_scraper(tokyo_scraper, kw, tc, client_id, PRIORITY_LOW, limit=TOKYO_MAX_ITEMS,
+                                          max_stale=0):
+            items.extend(batch)
+            if known is None:
+                continue
+            stale_pages = 0 if any(listing_key(item) not in known for item in batch) else stale_pages + 1
+            if stale_pages >= SAVED_SEARCH_STOP_PAGES:
+                break
+        return items
+
+    async def gov(kws, cat):
+        found = await run_scraper_batch(gov_scraper, kws, cat, client_id, PRIORITY_LOW, max_stale=0)
+        return [item for items in found.values() for item in items]
+
+    calls = []
+    gov_batches = {}
+    for kw, cat in saved.plan:
+        if "tokyo" in saved.sources:
+            calls.extend(tokyo(kw, tc) for tc in TOKYO_CATEGORIES.get(cat, []))
+        if "gov" in saved.sources:
+            gov_batches.setdefault(cat, []).append(kw)
+        if "kanagawa" in saved.sources and cat in KANAGAWA_CATEGORIES:
+            calls.append(run_scraper(kanagawa_scraper, kw, "goods", client_id, PRIORITY_LOW, max_stale=0))
+    calls.extend(gov(kws, cat) for cat, kws in gov_batches.items())
+
+    try:
+        results = await asyncio.gather(*calls, return_exceptions=True)
+    finally:
+        scheduler.forget(client_id)
+    items = []
+    for result in results:
+        if isinstance(result, Exception):
+            # One portal failing must not make its listings look new on the next run
+            raise result
+        items.extend(result)
+    return items
+
+
+saved_search_runner = SavedSearchRunner(saved_search_store, collect_saved_search)
+
+
+async def instrumented(events: AsyncIterator[dict], emit_metrics: bool) -> AsyncIterator[dict]:
+    """
+    Times the whole request; with emit_metrics, every span recorded while
+    serving it (LLM calls, page loads, extraction, ...) is also streamed as
+    a {"type": "metric"} event ahead of the next regular event.
+    """
+    spans = metrics.collect_spans()
+
+    def drain():
+        metric_events = [{"type": "metric", **s} for s in spans] if emit_metrics else []
+        spans.clear()
+        return metric_events
+
+    with metrics.span("request"):
+        async for event in events:
+            for metric_event in drain():
+                yield metric_event
+            yield event
+    for metric_event in drain():
+        yield metric_event
+
+
+class SearchParams(BaseModel):
+    q: Optional[str] = None
+    category: Optional[str] = "all"
+    free_text: Optional[str] = None
+    sources: Optional[str] = "gov,tokyo,kanagawa"
+    incremental: bool = True
+    mode: str = "live"
+    top_up: bool = False
+    speculative: bool = True
+    # Also stream timing spans as {"type": "metric"} events
+    metrics: bool = False
+    # rows: one object per result; columns: {"columns": [...], "rows": [[...]]}
+    layout: str = "rows"
+    # Order results by relevance to free_text (or q) instead of arrival order
+    rank: bool = True
+
+
+async def search_events(params: SearchParams) -> AsyncIterator[dict]:
+    """The events of one search, shared by /api/v1/bids and search jobs; serialized by the caller."""
+    q, category, free_text, sources = params.q, params.category, params.free_text, params.sources
+    incremental, mode, top_up, speculative = params.incremental, params.mode, params.top_up, params.speculative
+    layout = params.layout
+
+    # Initialize scrapers
+    tokyo_scraper = worker.scraper_for(TokyoMetroScraper)
+    gov_scraper = worker.scraper_for(GovernmentPortalScraper)
+    kanagawa_scraper = worker.scraper_for(KanagawaScraper)
+    
+    # Scheduler queues are served round-robin per request
+    client_id = str(uuid.uuid4())
+
+    target_sources = sources.split(",") if sources else ["gov", "tokyo", "kanagawa"]
+
+    search_queries = []
+    
+    if free_text:
+        logger.info(f"Analyzing free text: {free_text}")
+        yield {"type": "log", "message": f"「{free_text}」というご要望を分析しています..."}
+        try:
+            search_queries = await llm_service.analyze_requirements(free_text)
+            keywords_str = ", ".join([f"「{k}」" for k, c in search_queries])
+            logger.info(f"Generated queries: {search_queries}")
+            yield {"type": "log", "message": f"AIが以下の検索キーワードを生成しました: {keywords_str}"}
+        except Exception as e:
+            logger.error(f"LLM analysis failed: {e}")
+            yield {"type": "log", "message": "AIによる分析に失敗しました。入力された言葉でそのまま検索します。"}
+            # Fallback to simple keyword search
+            search_queries = [(free_text[:20], category)]
+    else:
+        search_queries = [(q or "", category)]
+        yield {"type": "log", "message": f"キーワード「{q}」で検索を開始します。"}
+
+    all_results = []
+    # Ranked against the free text and every generated keyword, including refined ones.
+    # Rows are tokenized as they arrive, so the final ranking is only scoring and a sort.
+    rank_text = (free_text or q) if params.rank else None
+    ranking = ranker.session(rank_text, [k for k, c in search_queries]) if rank_text else None
+
+    def ranked(rows: List[ResultRow]) -> List[ResultRow]:
+        return ranking.order(rows) if ranking is not None else rows
+
+    def chunk_event(source: str, kw: str, rows: List[ResultRow]) -> dict:
+        if ranking is None:
+            return {"type": "result_chunk", "source": source, "keyword": kw, "data": layout_rows(rows, layout)}
+        # positions: where each row goes among every row streamed so far, best first
+        rows, positions = ranking.place(rows)
+        return {"type": "result_chunk", "source": source, "keyword": kw, "data": layout_rows(rows, layout),
+                "positions": positions}
+
+    # Fingerprints of every row sent so far, across keywords and rounds
+    seen_keys = set()
+
+    def add_items(items) -> List[ResultRow]:
+        """Appends items not seen yet in this request and returns the new rows."""
+        new_rows = []
+        for item in items:
+            key = fingerprint(item)
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
+            row = result_row(key, item)
+            all_results.append(row)
+            new_rows.append(row)
+        if ranking is not None:
+            ranking.add(new_rows)
+        return new_rows
+
+    # Build one (source, keyword, async iterable) task per scraper call.
+    # Tokyo streams one batch per result page; the others yield once.
+    # Gov Portal keywords are grouped per category into one batch session.
+    def build_tasks(queries, priority):
+        tasks = []
+        gov_batches = {}
+        for kw, cat in queries:
+            # Tokyo Metro Search
+            if "tokyo" in target_sources:
+                for tc in TOKYO_CATEGORIES.get(cat, []):
+                    if incremental:
+                        stream = stream_scraper(tokyo_scraper, kw, tc, client_id, priority, limit=TOKYO_MAX_ITEMS)
+                    else:
+                        stream = _single(run_scraper(tokyo_scraper, kw, tc, client_id, priority))
+                    tasks.append(("Tokyo Metro", kw, stream))
+
+            # Government Portal Search
+            if "gov" in target_sources:
+                gov_batches.setdefault(cat, []).append(kw)
+
+            # Kanagawa Search
+            if "kanagawa" in target_sources:
+                if cat in KANAGAWA_CATEGORIES:
+                    tasks.append(("Kanagawa", kw, _single(run_scraper(kanagawa_scraper, kw, "goods", client_id, priority))))
+
+        for cat, kws in gov_batches.items():
+            tasks.append(("Gov Portal", ", ".join(kws), _single(run_scraper_batch(gov_scraper, kws, cat, client_id, priority))))
+        return tasks
+
+    # Yields (source, keyword, result) as each scraper call finishes or
+    # streams a page, so the fastest portal decides when the first rows appear.
+    # mode=index answers from the local index first; live scraping then
+    # only runs as a freshness top-up when requested.
+    async def execute_search(queries, priority=PRIORITY_NORMAL):
+        if mode == "index":
+            index_sources = [SOURCE_NAMES[s] for s in target_sources if s in SOURCE_NAMES]
+            for kw, cat in queries:
+                harvester.record_keyword(kw)
+                try:
+                    yield "index", kw, await bid_index.search_async(kw, index_sources)
+                except Exception as e:
+                    yield "index", kw, e
+            if not top_up:
+                return
+
+        # Each task is drained by its own pump into one queue; None marks a finished task
+        merged = asyncio.Queue()
+
+        async def pump(source, kw, stream):
+            started = time.perf_counter()
             try:
-                search_queries = await llm_service.analyze_requirements(free_text)
-                keywords_str = ", ".join([f"「{k}」" for k, c in search_queries])
-                logger.info(f"Generated queries: {search_queries}")
-                yield json.dumps({"type": "log", "message": f"AIが以下の検索キーワードを生成しました: {keywords_str}"}) + "\n"
+                async for result in stream:
+                    rows = [i for items in result.values() for i in items] if isinstance(result, dict) else result
+                    metrics.source_results.inc(source, amount=len(rows))
+                    merged.put_nowait((source, kw, result))
+                metrics.source_seconds.observe(time.perf_counter() - started, source)
             except Exception as e:
-                logger.error(f"LLM analysis failed: {e}")
-                yield json.dumps({"type": "log", "message": "AIによる分析に失敗しました。入力された言葉でそのまま検索します。"}) + "\n"
-                # Fallback to simple keyword search
-                search_queries = [(free_text[:20], category)]
-        else:
-            search_queries = [(q or "", category)]
-            yield json.dumps({"type": "log", "message": f"キーワード「{q}」で検索を開始します。"}) + "\n"
-
-        all_results = []
-        
-        # Function to execute search for a list of queries
-        async def execute_search(queries):
-            tasks = []
-            for kw, cat in queries:
-                # Tokyo Metro Search
-                if "tokyo" in target_sources:
-                    tokyo_searches = []
-                    if cat == "all":
-                        tokyo_searches = ["construction", "goods"]
-                    elif cat == "construction":
-                        tokyo_searches = ["construction"]
-                    elif cat in ["goods", "services"]:
-                        tokyo_searches = ["goods"]
-                    
-                    for tc in tokyo_searches:
-                        tasks.append(tokyo_scraper.search(kw, tc))
-                
-                # Government Portal Search
-                if "gov" in target_sources:
-                    tasks.append(gov_scraper.search(kw, cat))
-                
-                # Kanagawa Search
-                # Currently supports "goods" (which covers services too in Kanagawa)
-                if "kanagawa" in target_sources:
-                    if cat in ["all", "goods", "services"]:
-                        tasks.append(kanagawa_scraper.search(kw, "goods"))
-            
-            if not tasks:
-                return []
-            
-            return await asyncio.gather(*tasks, return_exceptions=True)
-
-        scraper_results = []
-        # We need to await the execute_search inside the generator, but execute_search is also async.
-        # However, execute_search returns a coroutine that returns results.
-        # We can't yield from inside execute_search easily if it's just gathering tasks.
-        # Let's just call it.
-        
-        # To provide more granular updates, we could wrap the tasks, but for now let's just log before execution.
-        yield json.dumps({"type": "log", "message": "各サイトの検索を開始します..."}) + "\n"
-        
-        # Re-implement execute_search logic inline to yield logs if needed, or just keep it simple.
-        # Keeping it simple for now to minimize risk.
-        scraper_results = await execute_search(search_queries)
-        
-        # Process results
-        for res in scraper_results:
+                metrics.source_errors.inc(source)
+                merged.put_nowait((source, kw, e))
+            finally:
+                merged.put_nowait(None)
+
+        pending = [asyncio.ensure_future(pump(*task)) for task in build_tasks(queries, priority)]
+        try:
+            remaining = len(pending)
+            while remaining:
+                item = await merged.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                source, kw, result = item
+                if isinstance(result, dict):
+                    # Batch task: report each keyword separately
+                    for batch_kw, items in result.items():
+                        yield source, batch_kw, items
+                else:
+                    yield source, kw, result
+        finally:
+            # Client went away or the generator was closed early
+            for task in pending:
+                task.cancel()
+
+    # Speculative refine: the broader keywords are requested while the
+    # first round runs and their searches queue at low priority. They are
+    # only used if the first round comes back thin, and cancelled otherwise.
+    refine_task = None
+    speculation = None
+    speculative_results = asyncio.Queue()
+    if free_text and speculative:
+        previous_keywords = [q[0] for q in search_queries]
+        refine_task = asyncio.ensure_future(llm_service.refine_search(free_text, previous_keywords))
+
+        async def speculate():
+            try:
+                async for result in execute_search(await refine_task, PRIORITY_LOW):
+                    speculative_results.put_nowait(result)
+            finally:
+                speculative_results.put_nowait(None)
+
+        speculation = asyncio.ensure_future(speculate())
+
+    async def drain_speculation():
+        while True:
+            result = await speculative_results.get()
+            if result is None:
+                return
+            yield result
+
+    try:
+        yield {"type": "log", "message": "各サイトの検索を開始します..."}
+
+        async for source, kw, res in execute_search(search_queries):
             if isinstance(res, list):
-                for item in res:
-                    all_results.append(SearchResult(
-                        id=str(uuid.uuid4()),
-                        title=item.title,
-                        organization=item.organization,
-                        deadline=item.deadline,
-                        category=item.category,
-                        url=item.url,
-                        source=item.source
-                    ).dict())
+                new_rows = add_items(res)
+                if incremental and new_rows:
+                    yield chunk_event(source, kw, new_rows)
             else:
-                logger.error(f"Error in scraper: {res!r}")
-        
-        yield json.dumps({"type": "log", "message": f"最初の検索で {len(all_results)} 件の案件が見つかりました。"}) + "\n"
+                logger.error(f"Error in scraper ({source}, {kw}): {res!r}")
+
+        yield {"type": "log", "message": f"最初の検索で {len(all_results)} 件の案件が見つかりました。"}
 
         # Refine search if results are few and using free text
         if free_text and len(all_results) < 5:
             logger.info("Few results found. Refining search...")
-            yield json.dumps({"type": "log", "message": "検索結果が少ないため、AIがより広いキーワードで再検索を試みます..."}) + "\n"
-            previous_keywords = [q[0] for q in search_queries]
-            new_queries = await llm_service.refine_search(free_text, previous_keywords)
-            
+            yield {"type": "log", "message": "検索結果が少ないため、AIがより広いキーワードで再検索を試みます..."}
+            if refine_task is not None:
+                new_queries = await refine_task
+                # Speculative searches are needed after all: stop treating them as idle work
+                scheduler.promote(client_id)
+                flights.promote(client_id)
+            else:
+                previous_keywords = [q[0] for q in search_queries]
+                new_queries = await llm_service.refine_search(free_text, previous_keywords)
+
             if new_queries:
                 keywords_str = ", ".join([f"「{k}」" for k, c in new_queries])
                 logger.info(f"Refined queries: {new_queries}")
-                yield json.dumps({"type": "log", "message": f"追加のキーワードを生成しました: {keywords_str}"}) + "\n"
-                
-                refined_results = await execute_search(new_queries)
+                if ranking is not None:
+                    ranking.add_keywords(k for k, c in new_queries)
+                yield {"type": "log", "message": f"追加のキーワードを生成しました: {keywords_str}"}
+
                 added_count = 0
-                for res in refined_results:
+                refined = drain_speculation() if speculation is not None else execute_search(new_queries)
+                async for source, kw, res in refined:
                     if isinstance(res, list):
-                        for item in res:
-                            # Avoid duplicates based on URL
-                            if not any(r['url'] == item.url for r in all_results):
-                                all_results.append(SearchResult(
-                                    id=str(uuid.uuid4()),
-                                    title=item.title,
-                                    organization=item.organization,
-                                    deadline=item.deadline,
-                                    category=item.category,
-                                    url=item.url,
-                                    source=item.source
-                                ).dict())
-                                added_count += 1
-                yield json.dumps({"type": "log", "message": f"再検索の結果、新たに {added_count} 件の案件を追加しました。"}) + "\n"
+                        new_rows = add_items(res)
+                        added_count += len(new_rows)
+                        if incremental and new_rows:
+                            yield chunk_event(source, kw, new_rows)
+                    else:
+                        logger.error(f"Error in scraper ({source}, {kw}): {res!r}")
+                yield {"type": "log", "message": f"再検索の結果、新たに {added_count} 件の案件を追加しました。"}
             else:
-                yield json.dumps({"type": "log", "message": "追加の有効なキーワードが見つかりませんでした。"}) + "\n"
+                yield {"type": "log", "message": "追加の有効なキーワードが見つかりませんでした。"}
+    finally:
+        if speculation is not None:
+            speculation.cancel()
+            refine_task.cancel()
+        scheduler.forget(client_id)
+
+    yield {"type": "log", "message": f"最終的に {len(all_results)} 件の案件を表示します。"}
+    all_results = ranked(all_results)
+    yield {"type": "result", "data": layout_rows(all_results, layout), "etag": etag(all_results, layout)}
+
+
+@app.get("/api/v1/bids")
+async def search_bids(request: Request, q: Optional[str] = None, category: Optional[str] = "all", free_text: Optional[str] = None, sources: Optional[str] = "gov,tokyo,kanagawa", incremental: bool = True, mode: str = "live", top_up: bool = False, speculative: bool = True, metrics_events: bool = Query(False, alias="metrics"), layout: str = "rows", format: str = "ndjson", rank: bool = True):
+    params = SearchParams(q=q, category=category, free_text=free_text, sources=sources, incremental=incremental,
+                          mode=mode, top_up=top_up, speculative=speculative, metrics=metrics_events, layout=layout,
+                          rank=rank)
+    metrics.requests_total.inc(mode)
+    if format == "json":
+        return await search_json(params, request.headers)
+    return StreamingResponse(ndjson(instrumented(search_events(params), params.metrics)), media_type="application/x-ndjson")
+
+
+async def search_json(params: SearchParams, headers) -> Response:
+    """
+    format=json: one response with only the final result list, validated
+    with an ETag derived from the rows. Repeated searches answered from the
+    result cache cost little and return 304 to a matching If-None-Match.
+    """
+    result = None
+    async for event in search_events(params.copy(update={"incremental": False})):
+        if event["type"] == "result":
+            result = event
+    tag = result["etag"]
+    if etag_matches(headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers={"ETag": tag})
+    body, encoding = maybe_gzip(dumps({"data": result["data"]}), headers.get("accept-encoding"))
+    response_headers = {"ETag": tag, "Vary": "Accept-Encoding"}
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=response_headers)
+
+
+@app.post("/api/v1/search-jobs")
+async def create_search_job(params: SearchParams):
+    """Starts a search detached from this request; identical running or recent searches are reused."""
+    key = json.dumps(params.dict(), sort_keys=True, ensure_ascii=False)
+    try:
+        job, created = job_manager.submit(key, params.dict(),
+                                          lambda: instrumented(search_events(params), params.metrics))
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="Too many search jobs; retry later")
+    if created:
+        metrics.requests_total.inc(params.mode)
+    return {"id": job.id, "status": job.status, "created": created}
+
+
+@app.get("/api/v1/search-jobs/{job_id}")
+async def get_search_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Search job not found or expired")
+    return job.summary()
+
+
+@app.get("/api/v1/search-jobs/{job_id}/events")
+async def search_job_events(job_id: str, since: int = 0):
+    """Replays events from seq `since`, then follows the job live; disconnecting does not stop the job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Search job not found or expired")
+    return StreamingResponse(job.follow(since), media_type="application/x-ndjson")
+
+
+@app.delete("/api/v1/search-jobs/{job_id}")
+async def cancel_search_job(job_id: str):
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Search job not found or expired")
+    return {"cancelled": job_manager.cancel(job_id)}
+
+class SavedSearchRequest(BaseModel):
+    name: Optional[str] = None
+    q: Optional[str] = None
+    free_text: Optional[str] = None
+    category: str = "all"
+    sources: str = "gov,tokyo,kanagawa"
+    interval_hours: float = 24
+
+
+async def _saved_search_or_404(search_id: int) -> SavedSearch:
+    saved = await saved_search_store.get_async(search_id)
+    if saved is None:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return saved
+
+
+@app.post("/api/v1/saved-searches")
+async def create_saved_search(request: SavedSearchRequest):
+    """Saves a search; the keyword plan is generated once here and reused by every run."""
+    if request.free_text:
+        try:
+            plan = await llm_service.analyze_requirements(request.free_text)
+        except Exception as e:
+            logger.error(f"LLM analysis failed: {e}")
+            plan = [(request.free_text[:20], request.category)]
+    elif request.q:
+        plan = [(request.q, request.category)]
+    else:
+        raise HTTPException(status_code=400, detail="q or free_text is required")
+    if request.interval_hours <= 0:
+        raise HTTPException(status_code=400, detail="interval_hours must be positive")
+    sources = [s for s in request.sources.split(",") if s in SOURCE_NAMES]
+    saved = await saved_search_store.create_async(request.name or request.free_text or request.q,
+                                                  request.free_text, request.category, sources,
+                                                  [tuple(p) for p in plan], request.interval_hours * 3600)
+    return asdict(saved)
+
+
+@app.get("/api/v1/saved-searches")
+async def list_saved_searches():
+    return [asdict(saved) for saved in await saved_search_store.list_async()]
+
+
+@app.get("/api/v1/saved-searches/{search_id}")
+async def get_saved_search(search_id: int):
+    return asdict(await _saved_search_or_404(search_id))
+
+
+@app.delete("/api/v1/saved-searches/{search_id}")
+async def delete_saved_search(search_id: int):
+    return {"deleted": await saved_search_store.delete_async(search_id)}
+
+
+@app.post("/api/v1/saved-searches/{search_id}/run")
+async def run_saved_search(search_id: int):
+    """Runs a saved search now instead of waiting for its schedule."""
+    counts = await saved_search_runner.run(await _saved_search_or_404(search_id))
+    if counts is None:
+        raise HTTPException(status_code=409, detail="Saved search is already running")
+    return counts
+
+
+@app.get("/api/v1/saved-searches/{search_id}/new")
+async def saved_search_feed(search_id: int, since: int = 0, limit: int = Query(500, le=5000)):
+    """New or changed listings found after the first run; pass the returned cursor as `since` next time."""
+    await _saved_search_or_404(search_id)
+    entries, cursor = await saved_search_store.feed_async(search_id, since, limit)
+    return {"cursor": cursor, "data": entries}
+
+
+@app.get("/api/v1/stats")
+async def stats():
+    return {
+        "result_cache": result_cache.stats(),
+        "llm_cache": llm_service.keyword_cache.stats(),
+        "scheduler": scheduler.stats(),
+        "single_flight": flights.stats(),
+        "search_jobs": job_manager.stats(),
+        "saved_searches": saved_search_runner.stats(),
+        "ranking": ranker.stats(),
+        "scrape_queue": worker.get_queue().stats() if worker.SCRAPER_BACKEND == "queue" else None,
+        "scraper_workers": worker_supervisor.stats() if worker.SCRAPER_BACKEND == "queue" else None,
+        "resource_filter": resource_filter.stats(),
+        "http_fastpath": {
+            "Tokyo Metro": tokyo_fast_path.stats(),
+            "Kanagawa": kanagawa_fast_path.stats(),
+        },
+    }
+
+metrics.registry.register(metrics.Gauge(
+    "bid_search_live_browsers", "Chromium processes in the pool", lambda: get_pool().live_browsers))
+metrics.registry.register(metrics.Gauge(
+    "bid_search_browser_launches_total", "Chromium launches since start", lambda: get_pool().launch_count, kind="counter"))
+metrics.registry.register(metrics.Gauge(
+    "bid_search_scheduler_running", "Scraper calls holding a scheduler slot", lambda: scheduler.global_running))
+metrics.registry.register(metrics.Gauge(
+    "bid_search_scheduler_queued", "Scraper calls waiting for a slot",
+    lambda: sum(s["queue_depth"] + s["low_priority_depth"] for s in scheduler.stats()["sources"].values())))
+metrics.registry.register(metrics.Gauge(
+    "bid_search_coalesced_calls_total", "Scraper calls that joined an identical call already in flight",
+    lambda: flights.coalesced, kind="counter"))
+metrics.registry.register(metrics.Gauge(
+    "bid_search_scrape_queue_queued", "Scraper jobs waiting for a worker (SCRAPER_BACKEND=queue)",
+    lambda: worker.get_queue().stats()["by_status"].get(worker.QUEUED, 0) if worker.SCRAPER_BACKEND == "queue" else None))
+metrics.registry.register(metrics.Gauge(
+    "bid_search_result_cache_entries", "Entries in the result cache", lambda: result_cache.stats()["entries"]))
+
 
-        yield json.dumps({"type": "log", "message": f"最終的に {len(all_results)} 件の案件を表示します。"}) + "\n"
-        yield json.dumps({"type": "result", "data": all_results}) + "\n"
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.exposition(), media_type="text/plain; version=0.0.4")
 
-    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,165 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; portal stages range from tens of milliseconds to minutes
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def exposition(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[label_values] = series
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def exposition(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labels, values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {count}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback; kind="counter" for totals kept elsewhere."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], Optional[float]], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+
+    def exposition(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} failed: {e!r}")
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "bid_search_stage_seconds", "Duration of one timed stage (LLM call, page load, extraction, ...)",
+    ("stage", "source")))
+stage_errors = registry.register(Counter(
+    "bid_search_stage_errors_total", "Timed stages that raised", ("stage", "source")))
+source_seconds = registry.register(Histogram(
+    "bid_search_source_seconds", "Time until a source answered one search task, including cache and queueing",
+    ("source",)))
+source_errors = registry.register(Counter(
+    "bid_search_source_errors_total", "Search tasks that failed", ("source",)))
+source_results = registry.register(Counter(
+    "bid_search_source_results_total", "Rows returned per source", ("source",)))
+requests_total = registry.register(Counter(
+    "bid_search_requests_total", "Search requests by mode", ("mode",)))
+
+# Spans recorded while this is set are also appended to it (per-request NDJSON metric events)
+_span_sink: "ContextVar[Optional[List[dict]]]" = ContextVar("span_sink", default=None)
+
+
+@contextmanager
+def span(stage: str, source: str = ""):
+    """Times a stage into bid_search_stage_seconds; failures are counted and re-raised."""
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage, source)
+        if failed:
+            stage_errors.inc(stage, source)
+        logger.debug(f"span {stage} [{source}] {elapsed:.3f}s{' (failed)' if failed else ''}")
+        sink = _span_sink.get()
+        if sink is not None:
+            sink.append({"stage": stage, "source": source, "seconds": round(elapsed, 3), "ok": not failed})
+
+
+def collect_spans() -> List[dict]:
+    """Starts collecting spans for the current context (and tasks created from it)."""
+    sink: List[dict] = []
+    _span_sink.set(sink)
+    return sink
@@ -0,0 +1,271 @@
+import math
+import os
+import re
+import unicodedata
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from datetime import date
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from serialization import ResultRow
+
+# BM25 parameters; titles are short, so length normalization stays moderate
+BM25_K1 = 1.2
+BM25_B = 0.5
+# Character n-gram size: bigrams match Japanese compounds without a dictionary
+NGRAM = 2
+# Query weight of n-grams from generated keywords relative to the free text
+KEYWORD_TERM_WEIGHT = float(os.getenv("RANK_KEYWORD_WEIGHT", "1.5"))
+# Added per generated keyword that appears verbatim in the title
+KEYWORD_HIT_BOOST = float(os.getenv("RANK_KEYWORD_HIT_BOOST", "2.0"))
+# Open deadlines within this many days get up to DEADLINE_BOOST extra (relative), linearly
+DEADLINE_HORIZON_DAYS = float(os.getenv("RANK_DEADLINE_HORIZON_DAYS", "30"))
+DEADLINE_BOOST = float(os.getenv("RANK_DEADLINE_BOOST", "0.3"))
+# Closed tenders sink below open ones with a similar text score
+EXPIRED_FACTOR = 0.5
+# Tokenized rows kept between searches (cache hits are not tokenized again)
+MAX_CACHED_ROWS = int(os.getenv("RANK_CACHE_ROWS", "20000"))
+
+_SPACES = re.compile(r"\s+")
+
+# ResultRow positions (serialization.RESULT_COLUMNS)
+_ID, _TITLE, _ORGANIZATION, _DEADLINE = 0, 1, 2, 3
+
+# (terms, counts of repeated terms, length in n-grams, folded title, deadline)
+_Document = Tuple[FrozenSet[str], Optional[Dict[str, int]], int, str, Optional[date]]
+# (query terms in the row, their repeat counts, length, keyword boost, deadline factor)
+_Match = Tuple[FrozenSet[str], Optional[Dict[str, int]], int, float, float]
+
+
+def _fold(text: Optional[str]) -> str:
+    return _SPACES.sub("", unicodedata.normalize("NFKC", text or "")).lower()
+
+
+def _grams(folded: str) -> List[str]:
+    if len(folded) <= NGRAM:
+        return [folded] if folded else []
+    return [folded[i:i + NGRAM] for i in range(len(folded) - NGRAM + 1)]
+
+
+def ngrams(text: Optional[str]) -> List[str]:
+    return _grams(_fold(text))
+
+
+# A few hundred issuing organizations cover nearly every row
+_organization_grams = lru_cache(maxsize=4096)(ngrams)
+
+
+@lru_cache(maxsize=4096)
+def _deadline(value: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+def _deadline_factor(deadline: Optional[date], today: date) -> float:
+    if deadline is None:
+        return 1.0
+    days_left = (deadline - today).days
+    if days_left < 0:
+        return EXPIRED_FACTOR
+    if days_left < DEADLINE_HORIZON_DAYS:
+        return 1 + DEADLINE_BOOST * (1 - days_left / DEADLINE_HORIZON_DAYS)
+    return 1.0
+
+
+class RankSession:
+    """
+    Ranking state of one search, built up while its rows stream in: add()
+    tokenizes each new row and keeps what its final score needs (the query
+    terms it contains, its length, keyword boost and deadline factor) along
+    with running document frequencies. order() then only derives the idf
+    and scores the rows that matched, so the final ranking is a short pass
+    and a sort rather than tokenizing the whole result set at the end.
+    """
+
+    def __init__(self, ranker: "Ranker", free_text: Optional[str], keywords: Iterable[str],
+                 today: Optional[date] = None):
+        self.ranker = ranker
+        self.free_text = free_text
+        self.keywords = list(keywords)
+        self.today = today or date.today()
+        self._documents: Dict[str, _Document] = {}
+        self._matches: Dict[str, _Match] = {}
+        self._frequencies: Dict[str, int] = {}
+        self._total_length = 0
+        # One shared object per distinct set of matched terms; scores() sums each set's idf once
+        self._term_sets: Dict[FrozenSet[str], FrozenSet[str]] = {}
+        # Sort keys (-score) of the rows place() has handed out, in their displayed order
+        self._placed: List[float] = []
+        self._query()
+
+    def _query(self):
+        weights: Dict[str, float] = {}
+        for gram in ngrams(self.free_text):
+            weights[gram] = max(weights.get(gram, 0.0), 1.0)
+        self._folded_keywords = []
+        for keyword in self.keywords:
+            folded = _fold(keyword)
+            if not folded:
+                continue
+            self._folded_keywords.append(folded)
+            for gram in ngrams(folded):
+                weights[gram] = max(weights.get(gram, 0.0), KEYWORD_TERM_WEIGHT)
+        self._weights = weights
+        self._terms = frozenset(weights)
+
+    def _match(self, row_id: str, document: _Document):
+        terms, repeats, length, title, deadline = document
+        common = self._terms.intersection(terms)
+        boost = sum(KEYWORD_HIT_BOOST for keyword in self._folded_keywords if keyword in title)
+        if not common and not boost:
+            return
+        frequencies = self._frequencies
+        for term in common:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        common = self._term_sets.setdefault(common, common)
+        if repeats:
+            repeats = {term: tf for term, tf in repeats.items() if term in common} or None
+        self._matches[row_id] = (common, repeats, length, boost, _deadline_factor(deadline, self.today))
+
+    def add(self, rows: Iterable[ResultRow]):
+        document_for = self.ranker.document
+        for row in rows:
+            row_id = row[_ID]
+            if row_id in self._documents:
+                continue
+            document = self._documents[row_id] = document_for(row)
+            self._total_length += document[2]
+            self._match(row_id, document)
+
+    def add_keywords(self, keywords: Iterable[str]):
+        """Extends the query (refined keywords); rows already added are matched again."""
+        self.keywords.extend(keywords)
+        self._query()
+        self._matches.clear()
+        self._frequencies.clear()
+        self._term_sets.clear()
+        for row_id, document in self._documents.items():
+            self._match(row_id, document)
+
+    def scores(self, rows: Sequence[ResultRow]) -> Dict[str, float]:
+        """Scores of those of `rows` that match the query, by row id; the rows must have been added."""
+        total = len(self._documents)
+        if not total or not self._matches:
+            return {}
+        average_length = self._total_length / total or 1.0
+        idf = {term: self._weights[term] * math.log(1 + (total - df + 0.5) / (df + 0.5))
+               for term, df in self._frequencies.items()}
+        idf_of = idf.__getitem__
+        matches = self._matches
+        k1_plus_1 = BM25_K1 + 1
+        # BM25's length normalization, with the per-row part folded into one multiplier
+        fixed = BM25_K1 * (1 - BM25_B)
+        per_length = BM25_K1 * BM25_B / average_length
+        if len(rows) >= len(self._documents):
+            # The whole result set (the final ranking): walk the matches only
+            candidates = matches.items()
+            term_sets = self._term_sets
+        else:
+            candidates = [(row[_ID], matches[row[_ID]]) for row in rows if row[_ID] in matches]
+            term_sets = {id(match[0]): match[0] for _, match in candidates}.values()
+        sums = {id(terms): sum(map(idf_of, terms)) for terms in term_sets}
+        scores = {}
+        for row_id, (common, repeats, length, boost, factor) in candidates:
+            norm = fixed + per_length * length
+            single = k1_plus_1 / (1 + norm)
+            score = sums[id(common)] * single
+            if repeats:
+                # Most n-grams occur once per row; only repeats need the full tf term
+                for term, tf in repeats.items():
+                    score += idf[term] * (tf * k1_plus_1 / (tf + norm) - single)
+            scores[row_id] = (score + boost) * factor
+        return scores
+
+    def order(self, rows: Sequence[ResultRow]) -> List[ResultRow]:
+        """
+        Rows best first, scored against every row added so far; rows with
+        equal scores (or no match) keep their arrival order.
+        """
+        return self._ordered(rows)[0]
+
+    def _ordered(self, rows: Sequence[ResultRow]) -> Tuple[List[ResultRow], Dict[str, float]]:
+        self.add(rows)
+        scores = self.scores(rows)
+        matched = [row for row in rows if row[_ID] in scores]
+        # sort() is stable, so ties stay in arrival order
+        matched.sort(key=lambda row: scores[row[_ID]], reverse=True)
+        if len(matched) < len(rows):
+            matched.extend(row for row in rows if row[_ID] not in scores)
+        return matched, scores
+
+    def place(self, rows: Sequence[ResultRow]) -> Tuple[List[ResultRow], List[int]]:
+        """
+        For streaming: the rows best first, and for each the index at which
+        to insert it among the rows placed so far (including the earlier ones
+        of this call), so a client holding every chunk in one list keeps it
+        ranked as chunks from different sources arrive. Earlier rows are
+        not moved when later ones shift the idf; the final order() does that.
+        """
+        ordered, scores = self._ordered(rows)
+        placed = self._placed
+        positions = []
+        for row in ordered:
+            score = scores.get(row[_ID])
+            # Unmatched rows go last; ties go after the rows already placed
+            key = -score if score is not None else math.inf
+            position = bisect_right(placed, key)
+            placed.insert(position, key)
+            positions.append(position)
+        return ordered, positions
+
+
+class Ranker:
+    """
+    BM25 over character n-grams of title and organization, scored against
+    the user's free text and the generated keywords, with boosts for
+    verbatim keyword hits and near deadlines. Each search ranks through its
+    own RankSession; tokenized rows are memoized here by row id (the
+    content fingerprint), so rows served again from the result cache are
+    not tokenized again.
+    """
+
+    def __init__(self, max_cached: int = MAX_CACHED_ROWS):
+        self.max_cached = max_cached
+        self._documents: "OrderedDict[str, _Document]" = OrderedDict()
+        self.tokenized = 0
+
+    def document(self, row: ResultRow) -> _Document:
+        row_id = row[_ID]
+        document = self._documents.get(row_id)
+        if document is not None:
+            self._documents.move_to_end(row_id)
+            return document
+        title = _fold(row[_TITLE])
+        grams = _grams(title) + _organization_grams(row[_ORGANIZATION])
+        terms = frozenset(grams)
+        repeats = None
+        if len(terms) < len(grams):
+            repeats = {term: tf for term, tf in Counter(grams).items() if tf > 1}
+        deadline = _deadline(row[_DEADLINE]) if row[_DEADLINE] else None
+        document = self._documents[row_id] = (terms, repeats, len(grams), title, deadline)
+        self.tokenized += 1
+        while len(self._documents) > self.max_cached:
+            self._documents.popitem(last=False)
+        return document
+
+    def session(self, free_text: Optional[str], keywords: Iterable[str], today: Optional[date] = None) -> RankSession:
+        return RankSession(self, free_text, keywords, today)
+
+    def rank(self, rows: Sequence[ResultRow], free_text: Optional[str], keywords: Iterable[str],
+             today: Optional[date] = None) -> List[ResultRow]:
+        """One-off ranking of a complete result set."""
+        return self.session(free_text, keywords, today).order(rows)
+
+    def stats(self) -> dict:
+        return {"cached_rows": len(self._documents), "max_cached": self.max_cached, "tokenized": self.tokenized}
+
+
+ranker = Ranker()
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from scrapers.base import BidItem
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+# Per-source freshness in seconds (BidItem.source labels)
+DEFAULT_TTLS = {
+    "Gov Portal": float(os.getenv("CACHE_TTL_GOV", "900")),
+    "Tokyo Metro": float(os.getenv("CACHE_TTL_TOKYO", "900")),
+    "Kanagawa": float(os.getenv("CACHE_TTL_KANAGAWA", "300")),
+}
+
+
+class ResultCache:
+    """
+    Bounded TTL + LRU cache in front of BaseScraper.search, keyed by
+    (source, keyword, category). Entries past their TTL but younger than
+    `max_stale` are served immediately while one background task refreshes them.
+    """
+
+    def __init__(self, max_entries: int = 512, ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = 600, max_stale: float = 6 * 3600, empty_ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else dict(DEFAULT_TTLS)
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+        # Empty results are often a transient portal failure; keep them briefly
+        self.empty_ttl = empty_ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[List[BidItem], float]]" = OrderedDict()
+        self._refreshing: Set[CacheKey] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    def _ttl(self, key: CacheKey, items: List[BidItem]) -> float:
+        ttl = self.ttls.get(key[0], self.default_ttl)
+        return min(ttl, self.empty_ttl) if not items else ttl
+
+    def get(self, key: CacheKey) -> Optional[Tuple[List[BidItem], float]]:
+        """Returns (items, age) or None; does not touch the counters."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        items, stored_at = entry
+        return items, time.monotonic() - stored_at
+
+    def put(self, key: CacheKey, items: List[BidItem]):
+        self._entries[key] = (items, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, key: CacheKey, max_stale: Optional[float] = None) -> Tuple[Optional[List[BidItem]], bool]:
+        """
+        Returns (items, stale) for servable entries and counts the lookup.
+        `max_stale` overrides the instance's limit for this lookup (0: fresh entries only).
+        """
+        if max_stale is None:
+            max_stale = self.max_stale
+        cached = self.get(key)
+        if cached is not None:
+            items, age = cached
+            ttl = self._ttl(key, items)
+            if age < ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return items, False
+            if age < ttl + max_stale:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                return items, True
+        self.misses += 1
+        return None, False
+
+    async def get_or_fetch(self, key: CacheKey, fetch: Callable[[], Awaitable[List[BidItem]]],
+                           max_stale: Optional[float] = None) -> List[BidItem]:
+        items, stale = self.lookup(key, max_stale)
+        if items is not None:
+            if stale:
+                self.refresh_in_background(key, fetch)
+            return items
+
+        items = await fetch()
+        self.put(key, items)
+        return items
+
+    async def get_or_fetch_many(self, keys: List[CacheKey],
+                                fetch_many: Callable[[List[CacheKey]], Awaitable[Dict[CacheKey, List[BidItem]]]],
+                                max_stale: Optional[float] = None) -> Dict[CacheKey, List[BidItem]]:
+        """Batch variant: all misses go to a single fetch_many call, stale keys to one background refresh."""
+        results: Dict[CacheKey, List[BidItem]] = {}
+        missing, stale_keys = [], []
+        for key in keys:
+            items, stale = self.lookup(key, max_stale)
+            if items is None:
+                missing.append(key)
+                continue
+            results[key] = items
+            if stale and key not in self._refreshing:
+                stale_keys.append(key)
+
+        if stale_keys:
+            self._refresh_many_in_background(stale_keys, fetch_many)
+
+        if missing:
+            fetched = await fetch_many(missing)
+            for key in missing:
+                items = fetched.get(key, [])
+                self.put(key, items)
+                results[key] = items
+        return results
+
+    def refresh_in_background(self, key: CacheKey, fetch: Callable[[], Awaitable[List[BidItem]]]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                self.put(key, await fetch())
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.error(f"Background refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.ensure_future(refresh())
+
+    def _refresh_many_in_background(self, keys: List[CacheKey], fetch_many):
+        self._refreshing.update(keys)
+
+        async def refresh():
+            try:
+                fetched = await fetch_many(keys)
+                for key in keys:
+                    if key in fetched:
+                        self.put(key, fetched[key])
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.error(f"Background refresh failed for {keys}: {e}")
+            finally:
+                self._refreshing.difference_update(keys)
+
+        asyncio.ensure_future(refresh())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            "refreshing": len(self._refreshing),
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+result_cache = ResultCache(max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "512")))
@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from bid_index import INDEX_PATH
+from scrapers.base import BidItem, fingerprint
+from scrapers.gov import SEARCH_URL as GOV_SEARCH_URL
+
+logger = logging.getLogger(__name__)
+
+# How often the runner looks for saved searches that are due
+CHECK_INTERVAL_SECONDS = float(os.getenv("SAVED_SEARCH_CHECK_INTERVAL", "60"))
+# Feed entries and watermark rows older than this are dropped
+RETENTION_SECONDS = float(os.getenv("SAVED_SEARCH_RETENTION", str(30 * 24 * 3600)))
+
+NEW, CHANGED = "new", "changed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_searches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    free_text TEXT,
+    category TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    interval REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_run REAL,
+    next_run REAL NOT NULL,
+    runs INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS saved_search_seen (
+    search_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (search_id, row_key)
+);
+CREATE TABLE IF NOT EXISTS saved_search_feed (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    search_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    item TEXT NOT NULL,
+    found_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS saved_search_feed_search ON saved_search_feed(search_id, seq);
+"""
+
+
+@dataclass
+class SavedSearch:
+    id: int
+    name: str
+    free_text: Optional[str]
+    category: str
+    sources: List[str]
+    # (keyword, category) pairs, generated once when the search was saved
+    plan: List[Tuple[str, str]]
+    interval: float
+    created_at: float
+    last_run: Optional[float]
+    next_run: float
+    runs: int
+
+
+def listing_key(item: BidItem) -> str:
+    """
+    Identity of a listing across runs. Gov Portal links each listing's own
+    detail page, so its URL is the key and an edited title or deadline is
+    reported as changed. Tokyo and Kanagawa only give placeholder URLs, so
+    they are keyed by fingerprint (title, organization, deadline), and an
+    edited listing there is reported as new.
+    """
+    if item.source == "Gov Portal" and item.url and item.url != GOV_SEARCH_URL:
+        return hashlib.sha1(f"{item.source}\x1f{item.url}".encode("utf-8")).hexdigest()
+    return fingerprint(item)
+
+
+def _digest(item: BidItem) -> str:
+    # The listing's content; a different value under the same key means the listing was updated.
+    # Not category: for Tokyo and Gov that is the plan category searched, not part of the listing.
+    raw = "\x1f".join(value or "" for value in (item.title, item.organization, item.deadline, item.url))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SavedSearchStore:
+    """
+    Saved keyword plans, their per-source watermark of listing keys
+    already reported, and a feed of the new or changed listings each run found.
+    Lives next to the bid index in the same SQLite file.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _from_row(row) -> SavedSearch:
+        return SavedSearch(
+            id=row["id"],
+            name=row["name"],
+            free_text=row["free_text"],
+            category=row["category"],
+            sources=row["sources"].split(","),
+            plan=[tuple(pair) for pair in json.loads(row["plan"])],
+            interval=row["interval"],
+            created_at=row["created_at"],
+            last_run=row["last_run"],
+            next_run=row["next_run"],
+            runs=row["runs"],
+        )
+
+    def create(self, name: str, free_text: Optional[str], category: str, sources: List[str],
+               plan: List[Tuple[str, str]], interval: float) -> SavedSearch:
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """INSERT INTO saved_searches (name, free_text, category, sources, plan, interval, created_at, next_run)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (name, free_text, category, ",".join(sources), json.dumps(plan, ensure_ascii=False), interval, now, now))
+        return self.get(cursor.lastrowid)
+
+    def get(self, search_id: int) -> Optional[SavedSearch]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM saved_searches WHERE id = ?", (search_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def list(self) -> List[SavedSearch]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM saved_searches ORDER BY id").fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def due(self, now: float) -> List[SavedSearch]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM saved_searches WHERE next_run <= ? ORDER BY next_run",
+                                      (now,)).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def delete(self, search_id: int) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM saved_searches WHERE id = ?", (search_id,))
+            self._conn.execute("DELETE FROM saved_search_seen WHERE search_id = ?", (search_id,))
+            self._conn.execute("DELETE FROM saved_search_feed WHERE search_id = ?", (search_id,))
+        return cursor.rowcount > 0
+
+    def watermark(self, search_id: int) -> Dict[str, Set[str]]:
+        """Listing keys already reported, per source."""
+        with self._lock:
+            rows = self._conn.execute("SELECT source, row_key FROM saved_search_seen WHERE search_id = ?",
+                                      (search_id,)).fetchall()
+        seen: Dict[str, Set[str]] = {}
+        for row in rows:
+            seen.setdefault(row["source"], set()).add(row["row_key"])
+        return seen
+
+    def record(self, saved: SavedSearch, items: List[BidItem]) -> Dict[str, int]:
+        """
+        Diffs one run against the watermark, appends new and changed listings
+        to the feed and advances the watermark. The first run only sets the
+        baseline, so the feed starts with what appeared after saving.
+        """
+        now = time.time()
+        baseline = saved.runs == 0
+        counts = {NEW: 0, CHANGED: 0}
+        by_key = {listing_key(item): item for item in items if item.title}
+        with self._lock, self._conn:
+            known = dict(self._conn.execute(
+                "SELECT row_key, digest FROM saved_search_seen WHERE search_id = ?", (saved.id,)).fetchall())
+            feed, seen = [], []
+            for key, item in by_key.items():
+                digest = _digest(item)
+                previous = known.get(key)
+                kind = NEW if previous is None else CHANGED if previous != digest else None
+                if kind is not None:
+                    counts[kind] += 1
+                    if not baseline:
+                        feed.append((saved.id, kind, key, json.dumps(asdict(item), ensure_ascii=False), now))
+                seen.append((saved.id, item.source, key, digest, now, now))
+            self._conn.executemany(
+                """INSERT INTO saved_search_seen (search_id, source, row_key, digest, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(search_id, row_key) DO UPDATE SET digest=excluded.digest, last_seen=excluded.last_seen""",
+                seen)
+            self._conn.executemany(
+                "INSERT INTO saved_search_feed (search_id, kind, row_key, item, found_at) VALUES (?, ?, ?, ?, ?)", feed)
+            self._conn.execute("UPDATE saved_searches SET last_run = ?, next_run = ?, runs = runs + 1 WHERE id = ?",
+                               (now, now + saved.interval, saved.id))
+            cutoff = now - RETENTION_SECONDS
+            self._conn.execute("DELETE FROM saved_search_seen WHERE search_id = ? AND last_seen < ?", (saved.id, cutoff))
+            self._conn.execute("DELETE FROM saved_search_feed WHERE search_id = ? AND found_at < ?", (saved.id, cutoff))
+        return counts
+
+    def postpone(self, saved: SavedSearch):
+        """Failed runs are retried at the next interval instead of on every check."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE saved_searches SET next_run = ? WHERE id = ?",
+                               (time.time() + saved.interval, saved.id))
+
+    def feed(self, search_id: int, since: int = 0, limit: int = 500) -> Tuple[List[dict], int]:
+        """Feed entries after seq `since`, and the cursor to pass next time."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM saved_search_feed WHERE search_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (search_id, since, limit)).fetchall()
+        entries = [{**json.loads(row["item"]), "id": row["row_key"], "change": row["kind"], "found_at": row["found_at"]}
+                   for row in rows]
+        return entries, rows[-1]["seq"] if rows else since
+
+    # Async wrappers so the event loop never blocks on SQLite
+
+    async def create_async(self, name: str, free_text: Optional[str], category: str, sources: List[str],
+                           plan: List[Tuple[str, str]], interval: float) -> SavedSearch:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.create, name, free_text, category, sources, plan, interval)
+
+    async def get_async(self, search_id: int) -> Optional[SavedSearch]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, search_id)
+
+    async def list_async(self) -> List[SavedSearch]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.list)
+
+    async def due_async(self, now: float) -> List[SavedSearch]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.due, now)
+
+    async def delete_async(self, search_id: int) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(None, self.delete, search_id)
+
+    async def watermark_async(self, search_id: int) -> Dict[str, Set[str]]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.watermark, search_id)
+
+    async def postpone_async(self, saved: SavedSearch):
+        await asyncio.get_running_loop().run_in_executor(None, self.postpone, saved)
+
+    async def record_async(self, saved: SavedSearch, items: List[BidItem]) -> Dict[str, int]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.record, saved, items)
+
+    async def feed_async(self, search_id: int, since: int = 0, limit: int = 500) -> Tuple[List[dict], int]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.feed, search_id, since, limit)
+
+
+# (saved search, per-source watermark) -> listings found by this run
+Collect = Callable[[SavedSearch, Dict[str, Set[str]]], Awaitable[List[BidItem]]]
+
+
+class SavedSearchRunner:
+    """
+    Re-runs due saved searches from their stored keyword plan (no LLM call)
+    and records the delta. `collect` does the scraping; it gets the
+    watermark so paged sources can stop once pages only hold known listings.
+    """
+
+    def __init__(self, store: SavedSearchStore, collect: Collect, check_interval: float = CHECK_INTERVAL_SECONDS):
+        self.store = store
+        self.collect = collect
+        self.check_interval = check_interval
+        self._running: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, saved: SavedSearch) -> Optional[Dict[str, int]]:
+        """Runs one saved search now; None if it is already running."""
+        if saved.id in self._running:
+            return None
+        self._running.add(saved.id)
+        try:
+            watermark = await self.store.watermark_async(saved.id)
+            items = await self.collect(saved, watermark)
+            counts = await self.store.record_async(saved, items)
+            self.completed += 1
+            logger.info(f"Saved search {saved.id} ({saved.name}): {counts[NEW]} new, {counts[CHANGED]} changed "
+                        f"of {len(items)} listings")
+            return counts
+        except Exception:
+            self.failed += 1
+            await self.store.postpone_async(saved)
+            raise
+        finally:
+            self._running.discard(saved.id)
+
+    async def _loop(self):
+        while True:
+            for saved in await self.store.due_async(time.time()):
+                try:
+                    await self.run(saved)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Saved search {saved.id} failed: {e!r}")
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"running": len(self._running), "completed": self.completed, "failed": self.failed}
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class SourceLimit:
+    concurrency: int
+    # Calls started per second; None disables rate limiting
+    rate: Optional[float] = None
+    burst: int = 1
+
+
+def _limit_from_env(prefix: str, concurrency: int, rate: float) -> SourceLimit:
+    rate_value = float(os.getenv(f"SCHED_{prefix}_RATE", str(rate)))
+    return SourceLimit(
+        concurrency=int(os.getenv(f"SCHED_{prefix}_CONCURRENCY", str(concurrency))),
+        rate=rate_value if rate_value > 0 else None,
+        burst=int(os.getenv(f"SCHED_{prefix}_BURST", "2")),
+    )
+
+
+# Keyed by BidItem.source / BaseScraper.source_name
+DEFAULT_LIMITS = {
+    "Gov Portal": _limit_from_env("GOV", 2, 1.0),
+    "Tokyo Metro": _limit_from_env("TOKYO", 2, 1.0),
+    "Kanagawa": _limit_from_env("KANAGAWA", 1, 0.5),
+}
+GLOBAL_CONCURRENCY = int(os.getenv("SCHED_GLOBAL_CONCURRENCY", "4"))
+
+PRIORITY_NORMAL = 0
+# Speculative work: only started on slots no normal-priority call is waiting for
+PRIORITY_LOW = 1
+
+
+class _Waiter:
+    __slots__ = ("future", "client", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, client: str):
+        self.future = future
+        self.client = client
+        self.enqueued_at = time.monotonic()
+
+
+class _SourceState:
+    def __init__(self, limit: SourceLimit):
+        self.limit = limit
+        self.running = 0
+        # client id -> its queued calls; clients are served round-robin
+        self.queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.low_queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.tokens = float(limit.burst)
+        self.refilled_at = time.monotonic()
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    @property
+    def low_depth(self) -> int:
+        return sum(len(q) for q in self.low_queues.values())
+
+    def seconds_until_token(self, now: float) -> float:
+        """Refills the bucket; 0 when a call may start now."""
+        if self.limit.rate is None:
+            return 0.0
+        self.tokens = min(float(self.limit.burst), self.tokens + (now - self.refilled_at) * self.limit.rate)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.limit.rate
+
+
+class Scheduler:
+    """
+    Admission control for scraper calls: a concurrency cap and token-bucket
+    rate limit per source, plus a global concurrency cap. Queued calls are
+    served round-robin across clients (API requests), so one large fan-out
+    cannot starve other users.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, SourceLimit]] = None, global_concurrency: int = GLOBAL_CONCURRENCY):
+        self.limits = limits if limits is not None else dict(DEFAULT_LIMITS)
+        self.global_concurrency = global_concurrency
+        self.global_running = 0
+        self._sources: "OrderedDict[str, _SourceState]" = OrderedDict()
+        # Clients whose low-priority work has been promoted to normal
+        self._promoted: Set[str] = set()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    def _state(self, source: str) -> _SourceState:
+        state = self._sources.get(source)
+        if state is None:
+            state = _SourceState(self.limits.get(source, SourceLimit(concurrency=1)))
+            self._sources[source] = state
+        return state
+
+    async def run(self, source: str, client: str, fn: Callable[[], Awaitable[T]],
+                  priority: int = PRIORITY_NORMAL) -> T:
+        """Waits for a slot for `source`, then awaits fn()."""
+        async with self.slot(source, client, priority):
+            return await fn()
+
+    @asynccontextmanager
+    async def slot(self, source: str, client: str, priority: int = PRIORITY_NORMAL):
+        """Holds a slot for `source` for the duration of the block (e.g. a streamed crawl)."""
+        await self._acquire(source, client, priority)
+        try:
+            yield
+        finally:
+            self._release(source)
+
+    async def _acquire(self, source: str, client: str, priority: int):
+        state = self._state(source)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), client)
+        low = priority == PRIORITY_LOW and client not in self._promoted
+        queues = state.low_queues if low else state.queues
+        queues.setdefault(client, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just before the cancellation landed
+                self._release(source)
+            else:
+                self._discard(state, waiter)
+            raise
+
+    def _discard(self, state: _SourceState, waiter: _Waiter):
+        # The waiter may have been promoted since it was queued
+        for queues in (state.queues, state.low_queues):
+            queue = queues.get(waiter.client)
+            if queue is None or waiter not in queue:
+                continue
+            queue.remove(waiter)
+            if not queue:
+                del queues[waiter.client]
+            return
+
+    def promote(self, client: str):
+        """
+        Moves a client's queued low-priority calls to normal priority; calls
+        it queues later are normal priority too, until forget(client).
+        """
+        self._promoted.add(client)
+        for state in self._sources.values():
+            low = state.low_queues.pop(client, None)
+            if low:
+                state.queues.setdefault(client, deque()).extend(low)
+        self._dispatch()
+
+    def is_promoted(self, client: str) -> bool:
+        return client in self._promoted
+
+    def forget(self, client: str):
+        self._promoted.discard(client)
+
+    def _release(self, source: str):
+        self._sources[source].running -= 1
+        self.global_running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        next_token_in: Optional[float] = None
+        progress = True
+        while progress and self.global_running < self.global_concurrency:
+            progress = False
+            # Low-priority calls only get slots no normal call could take now
+            normal_ready = any(
+                state.queues and state.running < state.limit.concurrency and state.seconds_until_token(now) == 0
+                for state in self._sources.values()
+            )
+            for source, state in list(self._sources.items()):
+                if self.global_running >= self.global_concurrency:
+                    break
+                if state.queues:
+                    queues = state.queues
+                elif not normal_ready:
+                    queues = state.low_queues
+                else:
+                    continue
+                if not queues or state.running >= state.limit.concurrency:
+                    continue
+                wait = state.seconds_until_token(now)
+                if wait > 0:
+                    next_token_in = wait if next_token_in is None else min(next_token_in, wait)
+                    continue
+
+                client, queue = next(iter(queues.items()))
+                waiter = queue.popleft()
+                if queue:
+                    queues.move_to_end(client)
+                else:
+                    del queues[client]
+                if waiter.future.done():
+                    # Cancelled while queued; its task has not run _discard() yet
+                    progress = True
+                    continue
+
+                if state.limit.rate is not None:
+                    state.tokens -= 1
+                state.running += 1
+                self.global_running += 1
+                waited = now - waiter.enqueued_at
+                state.dispatched += 1
+                state.total_wait += waited
+                state.max_wait = max(state.max_wait, waited)
+                waiter.future.set_result(None)
+                # Let other sources go first for the next global slot
+                self._sources.move_to_end(source)
+                progress = True
+
+        if next_token_in is not None and self._wakeup is None:
+            def wake():
+                self._wakeup = None
+                self._dispatch()
+            self._wakeup = asyncio.get_event_loop().call_later(next_token_in, wake)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        sources = {}
+        for source, state in self._sources.items():
+            oldest = min((w.enqueued_at for q in list(state.queues.values()) + list(state.low_queues.values()) for w in q), default=None)
+            sources[source] = {
+                "running": state.running,
+                "queue_depth": state.depth,
+                "low_priority_depth": state.low_depth,
+                "waiting_clients": len(state.queues),
+                "concurrency": state.limit.concurrency,
+                "rate": state.limit.rate,
+                "dispatched": state.dispatched,
+                "avg_wait_seconds": round(state.total_wait / state.dispatched, 3) if state.dispatched else 0.0,
+                "max_wait_seconds": round(state.max_wait, 3),
+                "oldest_wait_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+            }
+        return {
+            "global_running": self.global_running,
+            "global_concurrency": self.global_concurrency,
+            "sources": sources,
+        }
+
+
+scheduler = Scheduler()
@@ -1,7 +1,21 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from datetime import datetime
-from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+from dataclasses import dataclass, field
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from .browser_pool import BrowserPool, get_pool
+from .har import har_archive
+# Date parsing lives in .dates; re-exported for the scrapers
+from .dates import normalize_date, normalize_dates  # noqa: F401
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class BidItem:
@@ -12,88 +26,263 @@ class BidItem:
     url: str
     source: str
 
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _fold(text: Optional[str]) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def fingerprint(item: BidItem) -> str:
+    """
+    Stable identity of a bid: hash of NFKC/whitespace-folded source, title,
+    organization and deadline. URLs are left out because Tokyo and Kanagawa
+    only expose placeholder URLs.
+    """
+    raw = "\x1f".join(_fold(value) for value in (item.source, item.title, item.organization, item.deadline))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+# Trackers and beacons are never needed, whatever the resource type
+ANALYTICS_PATTERNS = [
+    r"google-analytics\.com", r"googletagmanager\.com", r"doubleclick\.net",
+    r"/gtag/js", r"/analytics\.js", r"/ga\.js",
+]
+
+# Blocked requests are never downloaded, so savings use typical sizes
+_ESTIMATED_BYTES = {"image": 30_000, "font": 60_000, "stylesheet": 20_000, "media": 200_000}
+
+
+@dataclass
+class ResourcePolicy:
+    # Playwright resource types (document, script, xhr, fetch, stylesheet, image, font, media, ...)
+    allowed_types: Set[str]
+    # URLs matching these load regardless of type
+    allowed_url_patterns: List[str] = field(default_factory=list)
+    blocked_url_patterns: List[str] = field(default_factory=lambda: list(ANALYTICS_PATTERNS))
+
+
+# Per-source allowlists. Frames are "document" requests; the portals drive
+# their forms with inline and external JS, so scripts stay enabled.
+RESOURCE_POLICIES: Dict[str, ResourcePolicy] = {
+    "Tokyo Metro": ResourcePolicy({"document", "script", "xhr", "fetch"}),
+    "Gov Portal": ResourcePolicy({"document", "script", "xhr", "fetch"}),
+    "Kanagawa": ResourcePolicy({"document", "script", "xhr", "fetch"}),
+}
+
+
+class ResourceFilter:
+    """
+    Aborts requests a scraper does not need (images, fonts, CSS, analytics)
+    via context.route. Set SCRAPER_RESOURCE_FILTER=0 to switch it off, or
+    list sources to exempt in SCRAPER_RESOURCE_FILTER_DISABLE (e.g. when a
+    portal breaks without CSS).
+    """
+
+    def __init__(self, policies: Dict[str, ResourcePolicy]):
+        self.policies = policies
+        self.enabled = os.getenv("SCRAPER_RESOURCE_FILTER", "1") != "0"
+        self.disabled_sources: Set[str] = {
+            s.strip() for s in os.getenv("SCRAPER_RESOURCE_FILTER_DISABLE", "").split(",") if s.strip()
+        }
+        self._compiled = {
+            source: (
+                [re.compile(p) for p in policy.allowed_url_patterns],
+                [re.compile(p) for p in policy.blocked_url_patterns],
+            )
+            for source, policy in policies.items()
+        }
+        self.allowed = 0
+        self.blocked: Dict[str, int] = {}
+        self.bytes_saved_estimate = 0
+
+    def active_for(self, source: str) -> bool:
+        return self.enabled and source in self.policies and source not in self.disabled_sources
+
+    def is_allowed(self, source: str, resource_type: str, url: str) -> bool:
+        allow_patterns, block_patterns = self._compiled[source]
+        if any(p.search(url) for p in block_patterns):
+            return False
+        if resource_type in self.policies[source].allowed_types:
+            return True
+        return any(p.search(url) for p in allow_patterns)
+
+    async def install(self, context, source: str):
+        if not self.active_for(source):
+            return
+
+        async def handle(route, request):
+            if self.is_allowed(source, request.resource_type, request.url):
+                self.allowed += 1
+                # fallback() rather than continue_(): lets a HAR replay route answer it
+                await route.fallback()
+                return
+            self.blocked[request.resource_type] = self.blocked.get(request.resource_type, 0) + 1
+            self.bytes_saved_estimate += _ESTIMATED_BYTES.get(request.resource_type, 0)
+            await route.abort()
+
+        await context.route("**/*", handle)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "disabled_sources": sorted(self.disabled_sources),
+            "requests_allowed": self.allowed,
+            "requests_blocked": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "bytes_saved_estimate": self.bytes_saved_estimate,
+        }
+
+
+resource_filter = ResourceFilter(RESOURCE_POLICIES)
+
+
 class BaseScraper(ABC):
-    def __init__(self):
-        pass
+    # BidItem.source label; also the result-cache key prefix
+    source_name: str = ""
+
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        # Browser contexts are leased from the shared warm pool instead of
+        # launching a fresh Chromium per search.
+        self.pool = pool or get_pool()
+
+    @asynccontextmanager
+    async def session_context(self, **session):
+        """
+        Leases a pool context for one scraper session. With SCRAPER_HAR_MODE
+        the session is recorded to, or replayed from, a HAR archive keyed by
+        `session` (e.g. keywords and category). This source's resource filter
+        is installed once here, so it covers every page of the context.
+        """
+        async with self.pool.context(**har_archive.context_options(self.source_name, session)) as context:
+            await har_archive.install(context, self.source_name, session)
+            # Routed after the HAR handler so it runs first and falls back to it
+            await resource_filter.install(context, self.source_name)
+            yield context
+
+    async def new_page(self, context):
+        """Opens a page in a session_context context (the resource filter is already routed)."""
+        return await context.new_page()
 
     @abstractmethod
     async def search(self, keyword: str, category: str) -> List[BidItem]:
         """Search bids with keyword and category."""
         pass
 
-def normalize_date(date_str: str) -> Optional[str]:
+
+# --- Condition-driven waits -------------------------------------------------
+# Every helper takes a Deadline shared by the whole scraper flow and returns
+# as soon as the DOM condition holds, instead of sleeping a fixed time.
+
+# Texts the portals show instead of a result table when nothing matches
+EMPTY_RESULT_MARKERS = [
+    "該当するデータはありません",
+    "該当するデータがありません",
+    "該当データはありません",
+    "該当する案件はありません",
+    "検索結果はありません",
+]
+
+POLL_INTERVAL_MS = 100
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining <= 0
+
+    def timeout_ms(self, cap: Optional[float] = None) -> float:
+        """Playwright timeout for the rest of the budget, optionally capped (seconds)."""
+        remaining = self.remaining if cap is None else min(self.remaining, cap)
+        # Playwright treats 0 as "no timeout"
+        return max(1.0, remaining * 1000)
+
+
+_WAIT_FOR_ANY_JS = """([selectors, texts]) => {
+    for (const [key, sel] of Object.entries(selectors)) {
+        if (document.querySelector(sel)) return key;
+    }
+    const body = document.body ? document.body.innerText : "";
+    for (const [key, list] of Object.entries(texts)) {
+        if (list.some(t => body.includes(t))) return key;
+    }
+    return null;
+}"""
+
+
+async def wait_for_any(target, deadline: Deadline, selectors: Optional[Dict[str, str]] = None,
+                       texts: Optional[Dict[str, List[str]]] = None) -> Optional[str]:
     """
-    Normalizes date string to YYYY-MM-DD.
-    Handles:
-    - YYYY/MM/DD, YYYY-MM-DD
-    - R6.11.27 (Reiwa)
-    - H30.11.27 (Heisei)
-    - S60.11.27 (Showa)
-    - 令和6年11月27日
+    Waits until one of the named selectors or texts is present in the page or
+    frame `target`. Returns the matching name, or None when the deadline passes.
     """
-    if not date_str:
+    try:
+        handle = await target.wait_for_function(
+            _WAIT_FOR_ANY_JS, arg=[selectors or {}, texts or {}],
+            timeout=deadline.timeout_ms(), polling=POLL_INTERVAL_MS,
+        )
+        return await handle.json_value()
+    except Exception as e:
+        logger.info(f"wait_for_any gave up: {e}")
+        return None
+
+
+async def wait_for_results(target, table_selector: str, deadline: Deadline,
+                           empty_markers: Optional[List[str]] = None) -> Optional[str]:
+    """Waits for a result table or an empty-result marker: returns "table", "empty" or None."""
+    return await wait_for_any(
+        target, deadline,
+        selectors={"table": table_selector},
+        texts={"empty": empty_markers if empty_markers is not None else EMPTY_RESULT_MARKERS},
+    )
+
+
+async def wait_for_frame(page, deadline: Deadline, text: Optional[str] = None,
+                         selector: Optional[str] = None):
+    """Polls every frame of `page` until one contains `text` or `selector`; None on deadline."""
+    query = selector if selector is not None else f"text={text}"
+    while True:
+        for frame in page.frames:
+            try:
+                if await frame.locator(query).count() > 0:
+                    return frame
+            except Exception:
+                # Frame navigated or detached while we looked at it
+                pass
+        if deadline.expired:
+            return None
+        await asyncio.sleep(POLL_INTERVAL_MS / 1000)
+
+
+async def wait_for_popup(context, action, deadline: Deadline, grace: float = 5.0):
+    """
+    Runs `action` and returns the page it opens, or None if no popup appears
+    within `grace` seconds (the click navigated in place instead).
+    """
+    try:
+        async with context.expect_page(timeout=deadline.timeout_ms(cap=grace)) as popup_info:
+            await action()
+        popup = await popup_info.value
+    except PlaywrightTimeoutError:
+        logger.info("No popup opened")
         return None
-    
-    date_str = date_str.strip()
-    
-    # Handle ranges: pick the last date (Deadline)
-    # Common separators: ～, ~, - (careful with YYYY-MM-DD)
-    # We split by '～' or '~' first.
-    if '～' in date_str:
-        date_str = date_str.split('～')[-1].strip()
-    elif '~' in date_str:
-        date_str = date_str.split('~')[-1].strip()
-    elif ' - ' in date_str: # Space hyphen space to avoid YYYY-MM-DD conflict
-        date_str = date_str.split(' - ')[-1].strip()
-    elif 'から' in date_str:
-        date_str = date_str.split('から')[-1].strip()
-    
     try:
-        import re
-        from datetime import datetime
-        
-        # Handle "令和XX年XX月XX日"
-        match = re.match(r'.*令和(\d+)年(\d+)月(\d+)日', date_str)
-        if match:
-            year = int(match.group(1)) + 2018
-            return f"{year}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
-            
-        # Handle "R6.11.27" or "R06.11.27"
-        match = re.match(r'.*R(\d+)\.(\d+)\.(\d+)', date_str)
-        if match:
-            year = int(match.group(1)) + 2018
-            return f"{year}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
-
-        # Handle "H30.11.27"
-        match = re.match(r'.*H(\d+)\.(\d+)\.(\d+)', date_str)
-        if match:
-            year = int(match.group(1)) + 1988
-            return f"{year}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
-
-        # Handle "S60.11.27"
-        match = re.match(r'.*S(\d+)\.(\d+)\.(\d+)', date_str)
-        if match:
-            year = int(match.group(1)) + 1925
-            return f"{year}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
-            
-        # Handle "MM月DD日" (Assume current year)
-        match = re.match(r'.*?(\d+)月(\d+)日', date_str)
-        if match:
-            year = datetime.now().year
-            # If month is drastically different? For now assume current year.
-            # E.g. if today is Jan 2025 and date is Dec 25, it might be 2024.
-            # But usually bids are recent.
-            # Let's just use current year.
-            return f"{year}-{match.group(1).zfill(2)}-{match.group(2).zfill(2)}"
-
-        # Handle "YYYY/MM/DD" or "YYYY.MM.DD"
-        clean_str = date_str.replace('/', '-').replace('.', '-')
-        
-        # Basic YYYY-MM-DD check
-        match = re.search(r'(\d{4})-(\d{1,2})-(\d{1,2})', clean_str)
-        if match:
-            return f"{match.group(1)}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
-            
-        return date_str
+        await popup.wait_for_load_state("domcontentloaded", timeout=deadline.timeout_ms())
     except Exception:
-        return date_str
+        pass
+    return popup
+
+
+async def mark_stale(target, selector: str):
+    """Tags the current matches of `selector` so a later wait only sees re-rendered ones."""
+    await target.evaluate(
+        "sel => document.querySelectorAll(sel).forEach(el => el.setAttribute('data-stale', '1'))",
+        selector,
+    )
@@ -0,0 +1,222 @@
+from contextlib import asynccontextmanager
+from typing import List, Optional, Set
+from playwright.async_api import async_playwright, Browser, BrowserContext
+from metrics import span
+import asyncio
+import logging
+import os
+
+try:
+    import psutil
+except ImportError:  # in requirements.txt; without it RSS recycling is disabled (logged at start)
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+def _descendants() -> Set[int]:
+    """Pids of every process below this one (Playwright driver, browsers, their children)."""
+    if psutil is None:
+        return set()
+    try:
+        return {child.pid for child in psutil.Process().children(recursive=True)}
+    except psutil.Error:
+        return set()
+
+
+def _browser_process(before: Set[int]):
+    """
+    The Chromium main process started since the `before` snapshot: Playwright
+    launches it with --remote-debugging-pipe, and unlike its renderer/GPU
+    helpers it has no --type= switch.
+    """
+    if psutil is None:
+        return None
+    try:
+        children = psutil.Process().children(recursive=True)
+    except psutil.Error:
+        return None
+    for child in children:
+        if child.pid in before:
+            continue
+        try:
+            cmdline = child.cmdline()
+        except psutil.Error:
+            continue
+        if "--remote-debugging-pipe" in cmdline and not any(arg.startswith("--type=") for arg in cmdline):
+            return child
+    return None
+
+
+class _PooledBrowser:
+    def __init__(self, browser: Browser, process=None):
+        self.browser = browser
+        # psutil.Process of this browser's Chromium main process; None when unknown
+        self.process = process
+        self.uses = 0
+        self.leases = 0
+        self.retiring = False
+
+    def rss_mb(self) -> Optional[float]:
+        """Resident memory of this browser's own process tree."""
+        if self.process is None:
+            return None
+        try:
+            processes = [self.process] + self.process.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+
+class BrowserPool:
+    """
+    One Playwright driver plus a small set of warm Chromium processes.
+    Scrapers lease an isolated BrowserContext per search; a browser is
+    recycled after `max_uses` leases or when its own Chromium process tree's
+    RSS exceeds `max_rss_mb`.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 50, max_rss_mb: int = 1024,
+                 max_contexts: int = 8, headless: bool = True):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.headless = headless
+        self._playwright = None
+        self._browsers: List[_PooledBrowser] = []
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max_contexts)
+        self.launch_count = 0
+
+    @classmethod
+    def from_env(cls) -> "BrowserPool":
+        return cls(
+            size=int(os.getenv("BROWSER_POOL_SIZE", "2")),
+            max_uses=int(os.getenv("BROWSER_MAX_USES", "50")),
+            max_rss_mb=int(os.getenv("BROWSER_MAX_RSS_MB", "1024")),
+            max_contexts=int(os.getenv("BROWSER_MAX_CONTEXTS", "8")),
+        )
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    @property
+    def live_browsers(self) -> int:
+        return len(self._browsers)
+
+    async def start(self):
+        async with self._lock:
+            if self._playwright is not None:
+                return
+            if psutil is None and self.max_rss_mb:
+                logger.warning(f"psutil is not installed: BROWSER_MAX_RSS_MB={self.max_rss_mb} is not enforced, "
+                               f"browsers are only recycled after {self.max_uses} uses")
+            self._playwright = await async_playwright().start()
+            for _ in range(self.size):
+                self._browsers.append(await self._launch())
+            logger.info(f"Browser pool started with {self.size} browsers")
+
+    async def stop(self):
+        async with self._lock:
+            for pooled in self._browsers:
+                try:
+                    await pooled.browser.close()
+                except Exception:
+                    pass
+            self._browsers = []
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+            logger.info("Browser pool stopped")
+
+    async def _launch(self) -> _PooledBrowser:
+        # Launches are serialized by self._lock, so the one new main process is this browser's
+        before = _descendants()
+        with span("browser.launch"):
+            browser = await self._playwright.chromium.launch(headless=self.headless)
+        self.launch_count += 1
+        return _PooledBrowser(browser, _browser_process(before))
+
+    async def _acquire(self) -> _PooledBrowser:
+        if not self.started:
+            await self.start()
+        async with self._lock:
+            candidates = [b for b in self._browsers if not b.retiring and b.browser.is_connected()]
+            if len(candidates) < self.size:
+                # Replace crashed or retired browsers before picking one
+                for pooled in [b for b in self._browsers if not b.browser.is_connected()]:
+                    self._browsers.remove(pooled)
+                while len(candidates) < self.size:
+                    pooled = await self._launch()
+                    self._browsers.append(pooled)
+                    candidates.append(pooled)
+            pooled = min(candidates, key=lambda b: b.leases)
+            pooled.leases += 1
+            return pooled
+
+    async def _release(self, pooled: _PooledBrowser):
+        async with self._lock:
+            pooled.leases -= 1
+            pooled.uses += 1
+            if not pooled.retiring and (pooled.uses >= self.max_uses or self._over_rss_limit(pooled)):
+                logger.info(f"Retiring browser after {pooled.uses} uses")
+                pooled.retiring = True
+            if pooled.retiring and pooled.leases == 0:
+                if pooled in self._browsers:
+                    self._browsers.remove(pooled)
+                try:
+                    await pooled.browser.close()
+                except Exception:
+                    pass
+
+    def _over_rss_limit(self, pooled: _PooledBrowser) -> bool:
+        rss_mb = pooled.rss_mb()
+        return rss_mb is not None and rss_mb > self.max_rss_mb
+
+    def rss_mb(self) -> Optional[float]:
+        """Resident memory of the pooled browsers (each measured over its own process tree)."""
+        sizes = [size for size in (pooled.rss_mb() for pooled in self._browsers) if size is not None]
+        return sum(sizes) if sizes else None
+
+    @asynccontextmanager
+    async def context(self, **kwargs):
+        """Lease an isolated BrowserContext; it is closed when the block exits."""
+        kwargs.setdefault("user_agent", DEFAULT_USER_AGENT)
+        kwargs.setdefault("locale", "ja-JP")
+        async with self._slots:
+            pooled = await self._acquire()
+            context: Optional[BrowserContext] = None
+            try:
+                with span("browser.context"):
+                    context = await pooled.browser.new_context(**kwargs)
+                yield context
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                await self._release(pooled)
+
+
+_default_pool: Optional[BrowserPool] = None
+
+
+def get_pool() -> BrowserPool:
+    """
+    Shared pool; started and stopped by the FastAPI lifespan in main.py.
+    Scrapers used outside the app start it lazily on first lease.
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = BrowserPool.from_env()
+    return _default_pool
@@ -0,0 +1,88 @@
+from datetime import date
+from functools import lru_cache
+from typing import Iterable, List, Optional
+import re
+import unicodedata
+
+# First year of each era minus one: R1 = 2019, H1 = 1989, S1 = 1926
+ERA_OFFSETS = {
+    "令和": 2018, "R": 2018,
+    "平成": 1988, "H": 1988,
+    "昭和": 1925, "S": 1925,
+}
+
+# One pass over the (NFKC-normalized) string; ranges resolve to the last date
+_DATE = re.compile(r"""
+    (?:(?P<era>令和|平成|昭和|(?<![A-Za-z])[RHS])\s*(?P<era_year>元|\d{1,2})\s*[年.\-/]\s*
+       (?P<era_month>\d{1,2})\s*[月.\-/]\s*(?P<era_day>\d{1,2}))
+  | (?:(?P<year>\d{4})\s*[年.\-/]\s*(?P<month>\d{1,2})\s*[月.\-/]\s*(?P<day>\d{1,2}))
+  | (?:(?<!\d)(?P<short_month>\d{1,2})\s*月\s*(?P<short_day>\d{1,2})\s*日)
+""", re.VERBOSE)
+
+MEMO_SIZE = 65536
+
+
+def _valid(month: int, day: int) -> bool:
+    return 1 <= month <= 12 and 1 <= day <= 31
+
+
+def _infer_year(month: int, day: int, reference: date) -> int:
+    """The year that puts MM/DD closest to the reference date (Dec 25 seen on Jan 5 is last year)."""
+    best_year, best_distance = reference.year, None
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            distance = abs((date(year, month, day) - reference).days)
+        except ValueError:  # Feb 29 in a non-leap year
+            continue
+        if best_distance is None or distance < best_distance:
+            best_year, best_distance = year, distance
+    return best_year
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _normalize(text: str, reference: date) -> str:
+    folded = unicodedata.normalize("NFKC", text)
+    result = None
+    for match in _DATE.finditer(folded):
+        if match.group("era"):
+            era_year = match.group("era_year")
+            year = ERA_OFFSETS[match.group("era")] + (1 if era_year == "元" else int(era_year))
+            month, day = int(match.group("era_month")), int(match.group("era_day"))
+        elif match.group("year"):
+            year, month, day = int(match.group("year")), int(match.group("month")), int(match.group("day"))
+        else:
+            month, day = int(match.group("short_month")), int(match.group("short_day"))
+            if not _valid(month, day):
+                continue
+            year = _infer_year(month, day, reference)
+        if _valid(month, day):
+            result = f"{year:04d}-{month:02d}-{day:02d}"
+    return result if result is not None else text
+
+
+def normalize_date(date_str: Optional[str], reference: Optional[date] = None) -> Optional[str]:
+    """
+    Normalizes a portal date string to YYYY-MM-DD; unparseable strings come
+    back stripped but otherwise unchanged. Handles:
+    - YYYY/MM/DD, YYYY-MM-DD, YYYY.MM.DD, YYYY年MM月DD日
+    - R6.11.27, H30.11.27, S60.11.27, 令和6年11月27日, 平成元年1月8日
+    - MM月DD日, with the year closest to `reference` (default today)
+    - ranges ("A～B", "AからB"): the last date, i.e. the deadline
+    """
+    if not date_str:
+        return None
+    date_str = date_str.strip()
+    if not date_str:
+        return None
+    return _normalize(date_str, reference or date.today())
+
+
+def normalize_dates(values: Iterable[Optional[str]], reference: Optional[date] = None) -> List[Optional[str]]:
+    """Batch normalize_date; repeated strings are answered from the memo."""
+    reference = reference or date.today()
+    return [normalize_date(value, reference) for value in values]
+
+
+def memo_stats() -> dict:
+    info = _normalize.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
@@ -1,148 +1,175 @@
-from typing import List
-from playwright.async_api import async_playwright
-from .base import BaseScraper, BidItem
+from typing import Dict, List
+from .base import BaseScraper, BidItem, mark_stale
+from metrics import span
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Overridable so benchmarks can target the offline stand-in (benchmarks/standin.py)
+BASE_URL = os.getenv("GOV_BASE_URL", "https://www.p-portal.go.jp").rstrip("/")
+SEARCH_URL = f"{BASE_URL}/pps-web-biz/UAA01/OAA0100?OAA0115"
+
+EXTRACT_JS = r"""() => {
+    const items = [];
+    const rows = document.querySelectorAll('table.main-summit-info:not([data-stale]) tbody tr.highlight');
+
+    rows.forEach(row => {
+        // Title
+        const titleEl = row.querySelector('td[id$="articleNm"]');
+        const title = titleEl ? titleEl.innerText.trim() : "Unknown Title";
+    
+        // Org
+        const orgEl = row.querySelector('td[id$="procurementOrgan"]');
+        const org = orgEl ? orgEl.innerText.trim() : "Government";
+    
+        // Date (Deadline/Start Date)
+        // Found in td ending with procurementImplementNoticeBean
+        const dateTd = row.querySelector('td[id$="procurementImplementNoticeBean"]');
+        let deadline = "";
+        if (dateTd) {
+            const text = dateTd.innerText;
+            // Match pattern like 令和07年01月09日
+            const match = text.match(/令和(\d+)年(\d+)月(\d+)日/);
+            if (match) {
+                const year = parseInt(match[1]) + 2018; // Reiwa 1 = 2019, so +2018
+                const month = match[2].padStart(2, '0');
+                const day = match[3].padStart(2, '0');
+                deadline = `${year}-${month}-${day}`;
+            }
+        }
+    
+        // URL
+        // Prefer "入札" (Bid) button which has a direct link in onclick
+        let url = "";
+        const bidBtn = row.querySelector('a.info-button.keiyaku');
+        if (bidBtn) {
+            const onclick = bidBtn.getAttribute('onclick');
+            if (onclick) {
+                const match = onclick.match(/window\.open\('([^']+)'/);
+                if (match) url = match[1];
+            }
+        }
+    
+        // Fallback to "公示本文" (Public Notice) if no bid link
+        if (!url) {
+            const detailBtn = row.querySelector('a.koukoku.info-button');
+            if (detailBtn) {
+                url = detailBtn.href;
+            }
+        }
+    
+        items.push({
+            title: title,
+            org: org,
+            url: url,
+            deadline: deadline
+        });
+    });
+    return items;
+}"""
+
 class GovernmentPortalScraper(BaseScraper):
+    source_name = "Gov Portal"
+
     async def search(self, keyword: str, category: str) -> List[BidItem]:
-        results = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                locale="ja-JP"
-            )
-            page = await context.new_page()
-            
-            try:
-                # Direct link to search page
-                search_url = "https://www.p-portal.go.jp/pps-web-biz/UAA01/OAA0100?OAA0115"
-                await page.goto(search_url, timeout=60000)
-                await page.wait_for_load_state("networkidle")
-                
-                # Select Category
-                # Categories: '物品' (Goods), '役務' (Services), '工事' (Construction), '測量' (Surveying)
-                # Map input category to these.
-                target_cats = []
-                if category == "construction":
-                    target_cats = ['工事']
-                elif category == "goods":
-                    target_cats = ['物品']
-                elif category == "services":
-                    target_cats = ['役務']
-                elif category == "all":
-                    target_cats = ['物品', '役務', '工事']
-                
-                for cat in target_cats:
-                    try:
-                        await page.locator(f"label:has-text('{cat}')").locator("input").check()
-                    except:
-                        pass
-                
-                # Input Keyword
-                if keyword:
-                    try:
-                        # Use the ID found in HTML: #case-name
-                        await page.fill("#case-name", keyword)
-                    except Exception as e:
-                        logger.warning(f"Could not fill keyword: {e}")
-                
-                # Click Search
-                # The search button ID is #OAA0102
-                await page.click("#OAA0102", timeout=60000)
-                
-                # Wait for results
-                # Wait for "a.koukoku.info-button" or similar
+        results = await self.search_many([keyword], category)
+        return results.get(keyword, [])
+
+    async def search_many(self, keywords: List[str], category: str) -> Dict[str, List[BidItem]]:
+        """
+        Runs several keywords through one loaded search form: the page is
+        opened once and #case-name is refilled and resubmitted per keyword.
+        """
+        results: Dict[str, List[BidItem]] = {}
+        async with self.session_context(keywords=list(keywords), category=category) as context:
+            page = await self.new_page(context)
+            form_loaded = False
+
+            for keyword in keywords:
                 try:
-                    await page.wait_for_selector("a.koukoku.info-button", timeout=20000)
-                except:
-                    logger.info("No results found or timeout on Gov Portal.")
-                    return []
-
-                # Extract items
-                items = await page.evaluate(r"""() => {
-                    const items = [];
-                    const rows = document.querySelectorAll('table.main-summit-info tbody tr.highlight');
-                    
-                    rows.forEach(row => {
-                        // Title
-                        const titleEl = row.querySelector('td[id$="articleNm"]');
-                        const title = titleEl ? titleEl.innerText.trim() : "Unknown Title";
-                        
-                        // Org
-                        const orgEl = row.querySelector('td[id$="procurementOrgan"]');
-                        const org = orgEl ? orgEl.innerText.trim() : "Government";
-                        
-                        // Date (Deadline/Start Date)
-                        // Found in td ending with procurementImplementNoticeBean
-                        const dateTd = row.querySelector('td[id$="procurementImplementNoticeBean"]');
-                        let deadline = "";
-                        if (dateTd) {
-                            const text = dateTd.innerText;
-                            // Match pattern like 令和07年01月09日
-                            const match = text.match(/令和(\d+)年(\d+)月(\d+)日/);
-                            if (match) {
-                                const year = parseInt(match[1]) + 2018; // Reiwa 1 = 2019, so +2018
-                                const month = match[2].padStart(2, '0');
-                                const day = match[3].padStart(2, '0');
-                                deadline = `${year}-${month}-${day}`;
-                            }
-                        }
-                        
-                        // URL
-                        // Prefer "入札" (Bid) button which has a direct link in onclick
-                        let url = "";
-                        const bidBtn = row.querySelector('a.info-button.keiyaku');
-                        if (bidBtn) {
-                            const onclick = bidBtn.getAttribute('onclick');
-                            if (onclick) {
-                                const match = onclick.match(/window\.open\('([^']+)'/);
-                                if (match) url = match[1];
-                            }
-                        }
-                        
-                        // Fallback to "公示本文" (Public Notice) if no bid link
-                        if (!url) {
-                            const detailBtn = row.querySelector('a.koukoku.info-button');
-                            if (detailBtn) {
-                                url = detailBtn.href;
-                            }
-                        }
-                        
-                        items.push({
-                            title: title,
-                            org: org,
-                            url: url,
-                            deadline: deadline
-                        });
-                    });
-                    return items;
-                }""")
-                
-                for item in items:
-                    url = item['url']
-                    if url:
-                        if url.startswith("javascript:"):
-                            # Cannot link directly to javascript post actions
-                            # Fallback to the search page or top page
-                            url = "https://www.p-portal.go.jp/pps-web-biz/UAA01/OAA0100?OAA0115"
-                        elif not url.startswith("http"):
-                            url = f"https://www.p-portal.go.jp{url}"
-                        
-                    results.append(BidItem(
-                        title=item['title'],
-                        organization=item['org'],
-                        deadline=item['deadline'],
-                        category=category,
-                        url=url,
-                        source="Gov Portal"
-                    ))
-                    
-            except Exception as e:
-                logger.error(f"Error scraping Gov Portal: {e}")
-            finally:
-                await browser.close()
-                
+                    # Reuse the form left on the page by the previous submit
+                    if not form_loaded or await page.locator("#case-name").count() == 0:
+                        await self._open_form(page)
+                        form_loaded = True
+                    results[keyword] = await self._submit(page, keyword, category)
+                except Exception as e:
+                    logger.error(f"Error scraping Gov Portal: {e}")
+                    results[keyword] = []
+                    # Start from a freshly loaded form for the next keyword
+                    form_loaded = False
+
+        return results
+
+    async def _open_form(self, page):
+        # Direct link to search page
+        with span("page.goto", self.source_name):
+            await page.goto(SEARCH_URL, timeout=60000)
+            await page.wait_for_load_state("networkidle")
+
+    async def _submit(self, page, keyword: str, category: str) -> List[BidItem]:
+        # Select Category
+        # Categories: '物品' (Goods), '役務' (Services), '工事' (Construction), '測量' (Surveying)
+        # Map input category to these.
+        target_cats = []
+        if category == "construction":
+            target_cats = ['工事']
+        elif category == "goods":
+            target_cats = ['物品']
+        elif category == "services":
+            target_cats = ['役務']
+        elif category == "all":
+            target_cats = ['物品', '役務', '工事']
+
+        for cat in target_cats:
+            try:
+                await page.locator(f"label:has-text('{cat}')").locator("input").check()
+            except:
+                pass
+
+        # Input Keyword (fill() clears the previous keyword)
+        try:
+            # Use the ID found in HTML: #case-name
+            await page.fill("#case-name", keyword or "")
+        except Exception as e:
+            logger.warning(f"Could not fill keyword: {e}")
+
+        # Tag the previous keyword's table so the wait below only sees new rows
+        await mark_stale(page, "table.main-summit-info")
+
+        # Click Search
+        # The search button ID is #OAA0102
+        await page.click("#OAA0102", timeout=60000)
+
+        # Wait for results from this submit, not the previous keyword's table
+        try:
+            with span("search", self.source_name):
+                await page.wait_for_selector("table.main-summit-info:not([data-stale]) a.koukoku.info-button", timeout=20000)
+        except:
+            logger.info("No results found or timeout on Gov Portal.")
+            return []
+
+        # Extract items
+        with span("extract", self.source_name):
+            items = await page.evaluate(EXTRACT_JS)
+
+        results = []
+        for item in items:
+            url = item['url']
+            if url:
+                if url.startswith("javascript:"):
+                    # Cannot link directly to javascript post actions
+                    # Fallback to the search page or top page
+                    url = SEARCH_URL
+                elif not url.startswith("http"):
+                    url = f"{BASE_URL}{url}"
+
+            results.append(BidItem(
+                title=item['title'],
+                organization=item['org'],
+                deadline=item['deadline'],
+                category=category,
+                url=url,
+                source="Gov Portal"
+            ))
         return results
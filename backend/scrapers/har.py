@@ -0,0 +1,77 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator
+import hashlib
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# off: normal network access
+# record: every browser session is saved to a HAR archive (closed with the context)
+# replay: sessions are served from their archive; nothing goes to the network
+HAR_MODE = os.getenv("SCRAPER_HAR_MODE", "off").lower()
+HAR_DIR = os.getenv("SCRAPER_HAR_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "har"))
+
+
+class HarNotFound(Exception):
+    """Replay mode was asked for a session that was never recorded."""
+
+
+class HarArchive:
+    """
+    One HAR file per scraper session, keyed by source and session parameters
+    (keywords, category), with a JSON manifest next to it so captures can be
+    listed and replayed later.
+    """
+
+    def __init__(self, mode: str = HAR_MODE, directory: str = HAR_DIR):
+        if mode not in ("off", "record", "replay"):
+            logger.warning(f"Unknown SCRAPER_HAR_MODE {mode!r}; HAR recording disabled")
+            mode = "off"
+        self.mode = mode
+        self.directory = Path(directory)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def path(self, source: str, session: Dict) -> Path:
+        slug = re.sub(r"\W+", "_", source).strip("_").lower()
+        digest = hashlib.sha1(json.dumps(session, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+        return self.directory / slug / f"{digest}.har"
+
+    def context_options(self, source: str, session: Dict) -> Dict:
+        """Extra BrowserPool.context() kwargs for this session."""
+        if self.mode != "record":
+            return {}
+        path = self.path(source, session)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        manifest = {"source": source, "recorded_at": datetime.now().isoformat(timespec="seconds"), **session}
+        path.with_suffix(".json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"Recording {source} session to {path}")
+        return {"record_har_path": str(path), "record_har_content": "embed", "record_har_mode": "full"}
+
+    async def install(self, context, source: str, session: Dict):
+        """In replay mode, serves the context from its archive; unknown requests are aborted."""
+        if self.mode != "replay":
+            return
+        path = self.path(source, session)
+        if not path.exists():
+            raise HarNotFound(f"No {source} capture for {session} ({path})")
+        await context.route_from_har(str(path), not_found="abort")
+
+    def captures(self) -> Iterator[Dict]:
+        """Manifests of every recorded session."""
+        for manifest in sorted(self.directory.glob("*/*.json")):
+            if not manifest.with_suffix(".har").exists():
+                continue
+            try:
+                yield json.loads(manifest.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable HAR manifest {manifest}: {e}")
+
+
+har_archive = HarArchive()
@@ -0,0 +1,250 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlencode, urljoin
+from bs4 import BeautifulSoup
+from .browser_pool import DEFAULT_USER_AGENT
+from .har import har_archive
+from metrics import span
+import httpx
+import logging
+import os
+import re
+import time
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:  # lxml is optional; the stdlib parser is slower but works
+    HTML_PARSER = "html.parser"
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FASTPATH_ENABLED = os.getenv("SCRAPER_HTTP_FASTPATH", "1") != "0"
+# After a failure the HTTP path is skipped for this long before it is retried
+FASTPATH_COOLDOWN_SECONDS = float(os.getenv("SCRAPER_HTTP_FASTPATH_COOLDOWN", "600"))
+
+
+class UnexpectedPageShape(Exception):
+    """The portal returned a page the HTTP path does not know how to drive."""
+
+
+class HttpPage:
+    def __init__(self, response: httpx.Response):
+        self.url = str(response.url)
+        self.encoding = response.encoding or "utf-8"
+        self.text = response.text
+        self.soup = BeautifulSoup(self.text, HTML_PARSER)
+
+    def has_text(self, text: str) -> bool:
+        return text in self.soup.get_text()
+
+    def form_fields(self, form) -> List[Tuple[str, str]]:
+        """Successful controls of `form` as the browser would submit them (no buttons)."""
+        fields = []
+        for control in form.find_all(["input", "select", "textarea"]):
+            name = control.get("name")
+            if not name or control.has_attr("disabled"):
+                continue
+            if control.name == "input":
+                input_type = (control.get("type") or "text").lower()
+                if input_type in ("submit", "button", "image", "reset", "file"):
+                    continue
+                if input_type in ("checkbox", "radio") and not control.has_attr("checked"):
+                    continue
+                fields.append((name, control.get("value", "on" if input_type in ("checkbox", "radio") else "")))
+            elif control.name == "select":
+                selected = control.find("option", selected=True) or control.find("option")
+                if selected is not None:
+                    fields.append((name, selected.get("value", selected.get_text(strip=True))))
+            else:
+                fields.append((name, control.get_text()))
+        return fields
+
+
+class HttpSession:
+    """Cookie-keeping HTTP client that submits forms in the page's own charset."""
+
+    def __init__(self, timeout: float = 30.0):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": DEFAULT_USER_AGENT, "Accept-Language": "ja-JP,ja;q=0.9"},
+            timeout=timeout,
+            follow_redirects=True,
+        )
+
+    async def __aenter__(self) -> "HttpSession":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def get(self, url: str) -> HttpPage:
+        response = await self.client.get(url)
+        response.raise_for_status()
+        return HttpPage(response)
+
+    async def submit(self, page: HttpPage, form, overrides: Dict[str, str],
+                     action: Optional[str] = None, extra: Sequence[Tuple[str, str]] = ()) -> HttpPage:
+        fields = [(k, v) for k, v in page.form_fields(form) if k not in overrides]
+        fields.extend(overrides.items())
+        fields.extend(extra)
+        url = urljoin(page.url, action or form.get("action") or page.url)
+        if (form.get("method") or "get").lower() == "post":
+            body = urlencode(fields, encoding=page.encoding, errors="replace")
+            response = await self.client.post(
+                url, content=body, headers={"Content-Type": "application/x-www-form-urlencoded"})
+        else:
+            response = await self.client.get(url, params=fields)
+        response.raise_for_status()
+        return HttpPage(response)
+
+
+_FORM_REF = re.compile(r"document\.(?:forms\[(\d+)\]|forms\[['\"](\w+)['\"]\]|(\w+))\.")
+_FIELD_ASSIGN = re.compile(
+    r"(?:\.(\w+)\.value|getElementById\(['\"](\w+)['\"]\)\.value|elements\[['\"](\w+)['\"]\]\.value)"
+    r"\s*=\s*([^;\n]+)"
+)
+_ACTION_ASSIGN = re.compile(r"\.action\s*=\s*(['\"])(.*?)\1")
+
+
+async def _script_sources(session: HttpSession, page: HttpPage) -> List[str]:
+    sources = [s.get_text() for s in page.soup.find_all("script") if not s.get("src")]
+    for script in page.soup.find_all("script", src=True):
+        try:
+            response = await session.client.get(urljoin(page.url, script["src"]))
+            sources.append(response.text)
+        except httpx.HTTPError:
+            pass
+    return sources
+
+
+def _function_body(source: str, name: str) -> Optional[Tuple[List[str], str]]:
+    match = re.search(r"function\s+" + re.escape(name) + r"\s*\(([^)]*)\)\s*\{", source)
+    if not match:
+        return None
+    depth, start = 1, match.end()
+    for i in range(start, len(source)):
+        if source[i] == "{":
+            depth += 1
+        elif source[i] == "}":
+            depth -= 1
+            if depth == 0:
+                params = [p.strip() for p in match.group(1).split(",") if p.strip()]
+                return params, source[start:i]
+    return None
+
+
+def _js_value(expression: str, scope: Dict[str, object]) -> str:
+    expression = expression.strip()
+    if expression in scope:
+        return str(scope[expression])
+    literal = re.fullmatch(r"(['\"])(.*)\1", expression)
+    if literal:
+        return literal.group(2)
+    if re.fullmatch(r"-?\d+(\.\d+)?", expression):
+        return expression
+    raise UnexpectedPageShape(f"Cannot evaluate JS expression {expression!r}")
+
+
+async def submit_js_call(session: HttpSession, page: HttpPage, function: str, args: Sequence[object],
+                         overrides: Optional[Dict[str, str]] = None) -> HttpPage:
+    """
+    Emulates a portal's `function NAME(...) { form.x.value = ...; form.submit(); }`
+    navigation helper by reading its source and posting the same fields.
+    Raises UnexpectedPageShape when the function does not fit that pattern.
+    """
+    for source in await _script_sources(session, page):
+        parsed = _function_body(source, function)
+        if parsed is None:
+            continue
+        params, body = parsed
+        scope = dict(zip(params, args))
+
+        forms = page.soup.find_all("form")
+        if not forms:
+            raise UnexpectedPageShape(f"No form on page for {function}")
+        form = forms[0]
+        ref = _FORM_REF.search(body)
+        if ref:
+            index, quoted, name = ref.groups()
+            if index is not None and int(index) < len(forms):
+                form = forms[int(index)]
+            elif quoted or name:
+                form = page.soup.find("form", attrs={"name": quoted or name}) or form
+
+        fields = dict(overrides or {})
+        for match in _FIELD_ASSIGN.finditer(body):
+            field = match.group(1) or match.group(2) or match.group(3)
+            fields[field] = _js_value(match.group(4), scope)
+        action = _ACTION_ASSIGN.search(body)
+        return await session.submit(page, form, fields, action=action.group(2) if action else None)
+
+    raise UnexpectedPageShape(f"JS function {function} not found")
+
+
+class FastPath:
+    """
+    Runs the browserless implementation first and falls back to Playwright on
+    any error it raises (cancellation excepted). After a failure the fast path is
+    skipped for a cooldown, so a changed portal costs one extra round trip.
+    """
+
+    def __init__(self, name: str, cooldown: float = FASTPATH_COOLDOWN_SECONDS):
+        self.name = name
+        self.cooldown = cooldown
+        self.disabled_until = 0.0
+        self.successes = 0
+        self.fallbacks = 0
+
+    @property
+    def healthy(self) -> bool:
+        # HAR record/replay only sees browser traffic
+        return FASTPATH_ENABLED and not har_archive.enabled and time.monotonic() >= self.disabled_until
+
+    async def run(self, fast: Callable[[], Awaitable[T]], slow: Callable[[], Awaitable[T]]) -> T:
+        if self.healthy:
+            try:
+                with span("http.fastpath", self.name):
+                    result = await fast()
+                self.successes += 1
+                return result
+            except Exception as e:
+                # Any failure, not only UnexpectedPageShape/httpx errors: a changed page can also
+                # surface as AttributeError/KeyError/TypeError. CancelledError is not an Exception.
+                self.fallbacks += 1
+                self.disabled_until = time.monotonic() + self.cooldown
+                logger.warning(f"{self.name} HTTP fast path failed, using Playwright: {e!r}")
+        return await slow()
+
+    async def iterate(self, fast: Callable[[], AsyncIterator[T]], slow: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Async-generator variant of run(); falls back only if the fast path
+        failed before yielding. A failure after some batches were yielded is
+        re-raised: the caller keeps what it streamed, but must not take the
+        truncated listing for a complete one (e.g. cache it).
+        """
+        if self.healthy:
+            yielded = False
+            try:
+                async for batch in fast():
+                    yielded = True
+                    yield batch
+                self.successes += 1
+                return
+            except Exception as e:
+                self.fallbacks += 1
+                self.disabled_until = time.monotonic() + self.cooldown
+                if yielded:
+                    # Restarting in the browser would repeat rows already delivered
+                    logger.warning(f"{self.name} HTTP fast path failed mid-stream: {e!r}")
+                    raise
+                logger.warning(f"{self.name} HTTP fast path failed, using Playwright: {e!r}")
+        async for batch in slow():
+            yield batch
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "successes": self.successes,
+            "fallbacks": self.fallbacks,
+        }
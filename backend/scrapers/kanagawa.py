@@ -1,58 +1,111 @@
-from typing import List
-from playwright.async_api import async_playwright
-from .base import BaseScraper, BidItem
+from typing import Dict, List
+from .base import (BaseScraper, BidItem, Deadline, mark_stale, normalize_dates,
+                   wait_for_frame, wait_for_popup, wait_for_results)
+from .snapshot import ListingSnapshot
+from .http_fastpath import FastPath
+from .kanagawa_http import TOP_URL, KanagawaHttpScraper
+from metrics import span
 import logging
-import asyncio
+import os
 
 logger = logging.getLogger(__name__)
 
+# The portal ignores our keyword, so the full listing is crawled once per
+# interval and every keyword is filtered against that snapshot.
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("KANAGAWA_SNAPSHOT_TTL", "900"))
+MAX_PAGES = int(os.getenv("KANAGAWA_MAX_PAGES", "20"))
+# Time budget for one complete listing crawl
+CRAWL_DEADLINE_SECONDS = float(os.getenv("KANAGAWA_CRAWL_DEADLINE", "180"))
+# How long a click may take to open its popup before we assume it navigated in place
+POPUP_GRACE_SECONDS = 5.0
+
+GOODS_LINK_SELECTOR = "a[onclick*='P6510_10']"
+FRESH_ROW_SELECTOR = "table[border='1']:not([data-stale]) tr td"
+
+# Plain HTTP through the frameset first; Playwright only when that fails
+fast_path = FastPath("Kanagawa")
+
+# Data row tds: 0 detail btn, 1 attachment btn, 2 procurement no., 3 dept,
+# 4 method, 5 category, 6 opening date, 7 title, 8 location, 9 deadline.
+# An optional keyword filters on the title inside the page.
+EXTRACT_JS = """(keyword) => {
+    const rows = [];
+    for (const tr of document.querySelectorAll("table[border='1']:not([data-stale]) tr")) {
+        const cells = tr.querySelectorAll('td');
+        if (cells.length < 10) continue;
+        const title = cells[7].textContent.trim();
+        if (keyword && !title.includes(keyword)) continue;
+        rows.push([title, cells[3].textContent.trim(), cells[5].textContent.trim(), cells[9].textContent.trim()]);
+    }
+    return rows;
+}"""
+
 class KanagawaScraper(BaseScraper):
+    source_name = "Kanagawa"
+
+    # Shared by every scraper instance (one is created per API request)
+    _snapshots: Dict[str, ListingSnapshot] = {}
+
+    def snapshot(self, category: str) -> ListingSnapshot:
+        snapshot = self._snapshots.get(category)
+        if snapshot is None:
+            snapshot = ListingSnapshot(lambda: self._crawl_listing(category), SNAPSHOT_REFRESH_SECONDS)
+            self._snapshots[category] = snapshot
+        return snapshot
+
     async def search(self, keyword: str, category: str) -> List[BidItem]:
+        try:
+            rows = await self.snapshot(category).get()
+        except Exception as e:
+            logger.error(f"Error scraping Kanagawa: {e}")
+            return []
+
+        return self.matching(rows, keyword)
+
+    @staticmethod
+    def matching(rows: List[BidItem], keyword: str) -> List[BidItem]:
+        """Snapshot rows whose title contains `keyword` (all rows for an empty keyword)."""
+        results = [item for item in rows if not keyword or keyword in item.title]
+        logger.info(f"Kanagawa snapshot: {len(results)} of {len(rows)} rows match '{keyword}'")
+        return results
+
+    async def _crawl_listing(self, category: str) -> List[BidItem]:
+        return await fast_path.run(
+            lambda: KanagawaHttpScraper(self.pool).crawl_listing(category),
+            lambda: self._crawl_listing_browser(category),
+        )
+
+    async def _crawl_listing_browser(self, category: str) -> List[BidItem]:
+        """Walks the frame chain and collects every page of the listing."""
         results = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                locale="ja-JP"
-            )
-            page = await context.new_page()
-            
+        deadline = Deadline(CRAWL_DEADLINE_SECONDS)
+        async with self.session_context(category=category) as context:
+            page = await self.new_page(context)
+
             try:
                 # 1. Top Page
-                url = "http://nyusatsu.e-kanagawa.lg.jp/"
-                logger.info(f"Navigating to {url}")
-                await page.goto(url, timeout=60000)
-                await page.wait_for_load_state("networkidle")
-                
-                # 2. Click "入札情報サービスシステム"
-                # It opens a new window/tab usually.
-                # Use a more robust way to get the new page.
-                initial_pages = len(context.pages)
-                await page.click("text=入札情報サービスシステム")
-                await page.wait_for_timeout(3000) # Wait for potential popup
-                
-                if len(context.pages) > initial_pages:
-                    page2 = context.pages[-1]
-                    logger.info("Popup detected, switching to new page")
-                else:
-                    page2 = page
-                    logger.info("No popup detected, continuing on same page")
-                
-                await page2.wait_for_load_state("networkidle")
-                
-                # 3. Find Menu Frame and Click "神奈川県"
-                await page2.wait_for_timeout(2000)
-                
-                menu_frame = None
-                for frame in page2.frames:
-                    try:
-                        if await frame.locator("text=神奈川県").count() > 0:
-                            menu_frame = frame
-                            break
-                    except:
-                        pass
-                
-                if menu_frame:
+                logger.info(f"Navigating to {TOP_URL}")
+                with span("page.goto", self.source_name):
+                    await page.goto(TOP_URL, timeout=deadline.timeout_ms(), wait_until="domcontentloaded")
+                    entry_link = page.locator("text=入札情報サービスシステム").first
+                    await entry_link.wait_for(timeout=deadline.timeout_ms())
+
+                # 2-4. Popup and frame hunting up to the search form
+                with span("frames", self.source_name):
+                    # 2. Click "入札情報サービスシステム"
+                    # It opens a new window/tab usually.
+                    page2 = await wait_for_popup(context, entry_link.click, deadline, grace=POPUP_GRACE_SECONDS)
+                    if page2 is not None:
+                        logger.info("Popup detected, switching to new page")
+                    else:
+                        page2 = page
+                        logger.info("No popup detected, continuing on same page")
+
+                    # 3. Find Menu Frame and Click "神奈川県"
+                    menu_frame = await wait_for_frame(page2, deadline, text="神奈川県")
+                    if not menu_frame:
+                        raise RuntimeError("Could not find menu frame with '神奈川県'")
+
                     logger.info(f"Found menu frame with Kanagawa: {menu_frame.url}")
                     # Click "神奈川県" inside the frame
                     link = menu_frame.locator("a:has-text('神奈川県')").first
@@ -60,139 +113,79 @@ class KanagawaScraper(BaseScraper):
                         await link.click()
                     else:
                         await menu_frame.click("text=神奈川県")
-                        
-                    await page2.wait_for_timeout(5000) # Wait for navigation
-                    
-                    # 4. Inspect frames for the specific Goods link
-                    found_link = False
-                    for i, frame in enumerate(page2.frames):
-                        logger.info(f"Checking Frame {i}: {frame.url}")
-                        try:
-                            # Look for the specific link
-                            link = frame.locator("a[onclick*='P6510_10']").first
-                            if await link.count() > 0:
-                                logger.info(f"Found Goods link in Frame {i}")
-                                await link.click()
-                                found_link = True
-                                await page2.wait_for_timeout(5000)
-                                break
-                        except:
-                            pass
-                    
-                    if found_link:
-                        # Check for new pages (Search Form)
-                        search_page = None
-                        if len(context.pages) > initial_pages:
-                            search_page = context.pages[-1]
-                        else:
-                            # If no new page, it might be in a frame.
-                            # But usually the search form is in the main frame or a specific frame.
-                            # Based on debug, it's in a frame (Frame 0 of page2).
-                            # Let's find the frame with the search form.
-                            for frame in page2.frames:
-                                if "検索条件入力" in await frame.content():
-                                    search_page = frame
-                                    break
-                        
-                        if search_page:
-                            logger.info("Found search form page/frame")
-                            
-                            # Select Page Size = 100
-                            try:
-                                await search_page.select_option("select[name='ddl_pageSize']", "100")
-                                logger.info("Selected page size 100")
-                            except:
-                                logger.warning("Could not select page size")
-
-                            # Click Search
-                            # The button is input[value="検索"]
-                            await search_page.click("input[value='検索']")
-                            logger.info("Clicked Search button")
-                            
-                            await page2.wait_for_timeout(5000)
-                            
-                            # Parse Results
-                            rows = await search_page.locator("table[border='1'] tr").all()
-                            logger.info(f"Found {len(rows)} rows in result table")
-                            
-                            for row in rows:
-                                cols = await row.locator("td").all()
-                                # We expect about 10-11 columns.
-                                # The header rows have th, data rows have th (No.) and td.
-                                # Let's check if it's a data row.
-                                # Data row: th(No), td(Btn), td(Btn), td(ID), td(Dept), td(Method), td(Cat), td(Date), td(Title), td(Loc), td(Dead)
-                                # Total 1 th + 10 td = 11 elements.
-                                
-                                if len(cols) < 8:
-                                    continue
-                                    
-                                try:
-                                    # Extract text from columns
-                                    # Indices in 'cols' (which only contains tds):
-                                    # 0: Detail Button
-                                    # 1: Attachment Button
-                                    # 2: Procurement Number
-                                    # 3: Department
-                                    # 4: Method
-                                    # 5: Category
-                                    # 6: Opening Date
-                                    # 7: Title
-                                    # 8: Location
-                                    # 9: Deadline
-                                    
-                                    title = await cols[7].text_content()
-                                    title = title.strip() if title else ""
-                                    
-                                    # Filter by keyword
-                                    if keyword and keyword not in title:
-                                        continue
-                                        
-                                    # Extract other columns
-                                    dept = await cols[3].text_content()
-                                    method = await cols[4].text_content()
-                                    category_text = await cols[5].text_content()
-                                    opening_date = await cols[6].text_content()
-                                    deadline = await cols[9].text_content()
-
-                                    # Clean up text
-                                    dept = dept.strip() if dept else ""
-                                    method = method.strip() if method else ""
-                                    category_text = category_text.strip() if category_text else ""
-                                    opening_date = opening_date.strip() if opening_date else ""
-                                    deadline = deadline.strip() if deadline else ""
-                                    
-                                    # Create BidItem
-                                    item = BidItem(
-                                        title=title,
-                                        organization=dept,
-                                        deadline=normalize_date(deadline),
-                                        category=category_text,
-                                        url="http://nyusatsu.e-kanagawa.lg.jp/",
-                                        source="Kanagawa"
-                                    )
-                                    results.append(item)
-                                    logger.info(f"Found match: {title}")
-                                    
-                                except Exception as e:
-                                    logger.error(f"Error parsing row: {e}")
-                                    continue
-                                    
-                        else:
-                            logger.error("Could not find search form frame")
-                    else:
-                        logger.error("Could not find '入札公告' link for Goods in any frame")
-                        
-                else:
-                    logger.error("Could not find menu frame with '神奈川県'")
-                
-            except Exception as e:
-                logger.error(f"Error scraping Kanagawa: {e}")
+
+                    # 4. Wait for the frame holding the specific Goods link
+                    goods_frame = await wait_for_frame(page2, deadline, selector=GOODS_LINK_SELECTOR)
+                    if not goods_frame:
+                        raise RuntimeError("Could not find '入札公告' link for Goods in any frame")
+                    logger.info(f"Found Goods link in frame {goods_frame.url}")
+
+                    # The search form opens either in a new window or inside page2
+                    goods_link = goods_frame.locator(GOODS_LINK_SELECTOR).first
+                    form_page = await wait_for_popup(context, goods_link.click, deadline, grace=POPUP_GRACE_SECONDS)
+                    search_page = await wait_for_frame(form_page or page2, deadline, text="検索条件入力")
+                    if not search_page:
+                        raise RuntimeError("Could not find search form frame")
+
+                logger.info("Found search form page/frame")
+
+                # Select Page Size = 100
+                try:
+                    await search_page.select_option("select[name='ddl_pageSize']", "100", timeout=deadline.timeout_ms(cap=5))
+                    logger.info("Selected page size 100")
+                except:
+                    logger.warning("Could not select page size")
+
+                # Click Search
+                # The button is input[value="検索"]
+                # (layout tables on the form itself must not count as results)
+                await mark_stale(search_page, "table[border='1']")
+                await search_page.click("input[value='検索']", timeout=deadline.timeout_ms())
+                logger.info("Clicked Search button")
+
+                with span("search", self.source_name):
+                    outcome = await wait_for_results(search_page, FRESH_ROW_SELECTOR, deadline)
+                if outcome != "table":
+                    logger.info(f"Kanagawa search returned no table ({outcome})")
+                    return results
+
+                # Parse every result page, following the "次へ" pager
+                for page_no in range(1, MAX_PAGES + 1):
+                    with span("extract", self.source_name):
+                        page_rows = await self._parse_rows(search_page)
+                    logger.info(f"Kanagawa page {page_no}: {len(page_rows)} rows")
+                    results.extend(page_rows)
+
+                    next_link = search_page.locator("a:has-text('次へ'), input[value*='次へ']").first
+                    if not page_rows or await next_link.count() == 0:
+                        break
+                    # Wait for the re-rendered table rather than a fixed delay
+                    await mark_stale(search_page, "table[border='1']")
+                    await next_link.click()
+                    with span("next_page", self.source_name):
+                        outcome = await wait_for_results(search_page, FRESH_ROW_SELECTOR, deadline)
+                    if outcome != "table":
+                        break
+
+            except Exception:
                 # Save screenshot on error
                 try:
                     await page.screenshot(path="kanagawa_error.png")
                 except:
                     pass
-            finally:
-                await browser.close()
-                
+                raise
+
         return results
+
+    async def _parse_rows(self, search_page, keyword: str = "") -> List[BidItem]:
+        # One round trip per page: [title, dept, category, deadline] tuples
+        rows = await search_page.evaluate(EXTRACT_JS, keyword)
+        deadlines = normalize_dates(row[3] for row in rows)
+        return [BidItem(
+            title=title,
+            organization=dept,
+            deadline=deadline,
+            category=category_text,
+            url=TOP_URL,
+            source="Kanagawa"
+        ) for (title, dept, category_text, _), deadline in zip(rows, deadlines)]
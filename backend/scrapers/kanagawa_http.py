@@ -0,0 +1,154 @@
+from typing import List, Optional
+from urllib.parse import urljoin
+from .base import BaseScraper, BidItem, EMPTY_RESULT_MARKERS, normalize_dates
+from .http_fastpath import HttpPage, HttpSession, UnexpectedPageShape
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Overridable so benchmarks can target the offline stand-in (benchmarks/standin.py)
+TOP_URL = os.getenv("KANAGAWA_BASE_URL", "http://nyusatsu.e-kanagawa.lg.jp").rstrip("/") + "/"
+MAX_PAGES = int(os.getenv("KANAGAWA_MAX_PAGES", "20"))
+MAX_FRAME_DEPTH = 3
+
+_QUOTED_URL = re.compile(r"['\"]([^'\"]+)['\"]")
+_POSTBACK = re.compile(r"__doPostBack\(['\"]([^'\"]*)['\"]\s*,\s*['\"]([^'\"]*)['\"]\)")
+
+
+def _link_url(link, must_contain: Optional[str] = None) -> Optional[str]:
+    """href, or the URL a window.open-style onclick would load."""
+    href = link.get("href") or ""
+    if href and not href.startswith("javascript:") and href != "#":
+        if must_contain is None or must_contain in href:
+            return href
+    for candidate in _QUOTED_URL.findall(link.get("onclick") or "") + _QUOTED_URL.findall(href):
+        if must_contain is not None and must_contain not in candidate:
+            continue
+        if "/" in candidate or "." in candidate or "?" in candidate:
+            return candidate
+    return None
+
+
+class KanagawaHttpScraper(BaseScraper):
+    """
+    Browserless version of KanagawaScraper: follows the frameset with plain
+    GETs and drives the ASP.NET search form with form posts.
+    """
+    source_name = "Kanagawa"
+
+    async def search(self, keyword: str, category: str) -> List[BidItem]:
+        rows = await self.crawl_listing(category)
+        return [item for item in rows if not keyword or keyword in item.title]
+
+    async def crawl_listing(self, category: str) -> List[BidItem]:
+        async with HttpSession() as session:
+            top = await session.get(TOP_URL)
+            entry = top.soup.find("a", string=re.compile("入札情報サービスシステム"))
+            entry_url = _link_url(entry) if entry is not None else None
+            if not entry_url:
+                raise UnexpectedPageShape("Kanagawa entry link not found")
+            system = await session.get(urljoin(top.url, entry_url))
+
+            menu_page, link = await self._find_link(session, system, text="神奈川県")
+            menu_url = _link_url(link)
+            if not menu_url:
+                raise UnexpectedPageShape("Kanagawa menu link has no URL")
+            kanagawa = await session.get(urljoin(menu_page.url, menu_url))
+
+            goods_page, goods_link = await self._find_link(session, kanagawa, onclick="P6510_10")
+            goods_url = _link_url(goods_link, must_contain="P6510")
+            if not goods_url:
+                raise UnexpectedPageShape("Kanagawa goods link has no URL")
+            form_root = await session.get(urljoin(goods_page.url, goods_url))
+
+            search_page = await self._find_page(session, form_root, lambda p: p.has_text("検索条件入力"))
+            if search_page is None:
+                raise UnexpectedPageShape("Kanagawa search form not found")
+            button = search_page.soup.select_one("input[value='検索']")
+            form = button.find_parent("form") if button is not None else None
+            if form is None:
+                raise UnexpectedPageShape("Kanagawa search button not found")
+
+            extra = [(button["name"], button.get("value", ""))] if button.get("name") else []
+            page = await session.submit(search_page, form, {"ddl_pageSize": "100"}, extra=extra)
+
+            results = []
+            for page_no in range(1, MAX_PAGES + 1):
+                page_rows = self._parse(page)
+                logger.info(f"Kanagawa (HTTP) page {page_no}: {len(page_rows)} rows")
+                results.extend(page_rows)
+                next_page = await self._next_page(session, page) if page_rows else None
+                if next_page is None:
+                    break
+                page = next_page
+            return results
+
+    async def _frames(self, session: HttpSession, page: HttpPage, depth: int = 0) -> List[HttpPage]:
+        """The page followed by every (i)frame document below it."""
+        pages = [page]
+        if depth >= MAX_FRAME_DEPTH:
+            return pages
+        for frame in page.soup.find_all(["frame", "iframe"], src=True):
+            child = await session.get(urljoin(page.url, frame["src"]))
+            pages.extend(await self._frames(session, child, depth + 1))
+        return pages
+
+    async def _find_page(self, session: HttpSession, root: HttpPage, predicate) -> Optional[HttpPage]:
+        for page in await self._frames(session, root):
+            if predicate(page):
+                return page
+        return None
+
+    async def _find_link(self, session: HttpSession, root: HttpPage, text: Optional[str] = None,
+                         onclick: Optional[str] = None):
+        for page in await self._frames(session, root):
+            for link in page.soup.find_all("a"):
+                if text is not None and text in link.get_text():
+                    return page, link
+                if onclick is not None and onclick in (link.get("onclick") or "") + (link.get("href") or ""):
+                    return page, link
+        raise UnexpectedPageShape(f"Kanagawa link not found: {text or onclick}")
+
+    async def _next_page(self, session: HttpSession, page: HttpPage) -> Optional[HttpPage]:
+        button = page.soup.select_one("input[value*='次へ']")
+        if button is not None and button.get("name"):
+            form = button.find_parent("form")
+            if form is not None:
+                return await session.submit(page, form, {}, extra=[(button["name"], button.get("value", ""))])
+
+        link = page.soup.find("a", string=re.compile("次へ"))
+        if link is None:
+            return None
+        postback = _POSTBACK.search(link.get("href") or "")
+        form = page.soup.find("form")
+        if postback and form is not None:
+            return await session.submit(page, form, {
+                "__EVENTTARGET": postback.group(1),
+                "__EVENTARGUMENT": postback.group(2),
+            })
+        url = _link_url(link)
+        if url:
+            return await session.get(urljoin(page.url, url))
+        raise UnexpectedPageShape("Kanagawa pager link not understood")
+
+    def _parse(self, page: HttpPage) -> List[BidItem]:
+        rows = page.soup.select("table[border='1'] tr")
+        if not rows:
+            if any(page.has_text(marker) for marker in EMPTY_RESULT_MARKERS):
+                return []
+            raise UnexpectedPageShape("Kanagawa result table not found")
+
+        cells = [row.find_all("td") for row in rows]
+        # Same td layout as the Playwright parser: [3] dept, [5] category, [7] title, [9] deadline
+        cells = [cols for cols in cells if len(cols) >= 10]
+        deadlines = normalize_dates(cols[9].get_text(strip=True) for cols in cells)
+        return [BidItem(
+            title=cols[7].get_text(strip=True),
+            organization=cols[3].get_text(strip=True),
+            deadline=deadline,
+            category=cols[5].get_text(strip=True),
+            url=TOP_URL,
+            source="Kanagawa"
+        ) for cols, deadline in zip(cells, deadlines)]
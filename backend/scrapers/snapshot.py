@@ -0,0 +1,50 @@
+from typing import Awaitable, Callable, List, Optional
+from .base import BidItem
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ListingSnapshot:
+    """
+    In-memory copy of a full portal listing, refreshed at most once per
+    `refresh_interval` seconds. Concurrent callers that find the snapshot
+    expired share a single refresh.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[List[BidItem]]], refresh_interval: float):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.rows: Optional[List[BidItem]] = None
+        self.loaded_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.rows is not None and time.monotonic() - self.loaded_at < self.refresh_interval
+
+    async def get(self) -> List[BidItem]:
+        if self.fresh:
+            return self.rows
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self.fresh:
+                return self.rows
+            try:
+                rows = await self.loader()
+            except Exception as e:
+                if self.rows is None:
+                    raise
+                logger.error(f"Snapshot refresh failed, serving stale rows: {e}")
+                return self.rows
+            self.rows = rows
+            self.loaded_at = time.monotonic()
+            logger.info(f"Snapshot refreshed with {len(rows)} rows")
+            return self.rows
+
+    def invalidate(self):
+        self.loaded_at = 0.0
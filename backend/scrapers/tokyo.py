@@ -1,29 +1,103 @@
-from typing import List
-from playwright.async_api import async_playwright
-from .base import BaseScraper, BidItem, normalize_date
+from typing import AsyncIterator, List, Optional
+from .base import (BaseScraper, BidItem, Deadline, EMPTY_RESULT_MARKERS, mark_stale, normalize_date,
+                   wait_for_any, wait_for_results)
+from .http_fastpath import FastPath
+from .tokyo_http import ENTRY_URL, TokyoHttpScraper
+from metrics import span
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Time budget for one complete search flow
+SEARCH_DEADLINE_SECONDS = float(os.getenv("TOKYO_SEARCH_DEADLINE", "60"))
+# Upper bound on rows collected across result pages by search()
+MAX_ITEMS = int(os.getenv("TOKYO_MAX_ITEMS", "500"))
+
+CONFIRM_SELECTOR = "a[href*='SelectSubmit(4,3)']"
+PAGER_SELECTOR = "a:has-text('次へ'), a:has-text('次ページ')"
+FRESH_TABLE_SELECTOR = "table.list-data:not([data-stale])"
+
+# Plain form posts first; Playwright only when they fail or the page shape changed
+fast_path = FastPath("Tokyo Metro")
+
+EXTRACT_JS = """() => {
+    const items = [];
+    const table = document.querySelector('table.list-data:not([data-stale])');
+    if (!table) return [];
+    
+    const rows = Array.from(table.querySelectorAll('tr'));
+    
+    for (let i = 1; i < rows.length; i++) {
+        const row = rows[i];
+        const cells = row.querySelectorAll('td');
+        if (cells.length < 10) continue;
+        
+        const link = row.querySelector("a[href*='SelectSubmitNo']");
+        if (!link) continue;
+        
+        const title = link.innerText.trim();
+        // Construct absolute URL? The link is JS. 
+        // We can just return the title and maybe a dummy URL or try to extract ID.
+        // The original scraper extracted href.
+        const url = "https://www.e-procurement.metro.tokyo.lg.jp/indexPbi.jsp"; // Placeholder as it's JS link
+        
+        let org = "";
+        if (cells.length > 10) {
+            org = cells[10].innerText.trim();
+        }
+        
+        let deadline = "";
+        if (cells.length > 8) {
+            deadline = cells[8].innerText.trim();
+        }
+        
+        items.push({
+            title: title,
+            url: url,
+            org: org,
+            deadline: deadline
+        });
+    }
+    return items;
+}"""
+
 class TokyoMetroScraper(BaseScraper):
+    source_name = "Tokyo Metro"
+
     async def search(self, keyword: str, category: str) -> List[BidItem]:
         results = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                locale="ja-JP"
-            )
-            page = await context.new_page()
+        async for batch in self.iter_pages(keyword, category, limit=MAX_ITEMS):
+            results.extend(batch)
+        return results
+
+    def iter_pages(self, keyword: str, category: str, limit: Optional[int] = None,
+                   deadline: Optional[Deadline] = None) -> AsyncIterator[List[BidItem]]:
+        """
+        Yields BidItem batches one result page at a time, until `limit` rows
+        or the deadline. The next page is requested before the current batch
+        is handed to the caller, so it loads while the caller works.
+        """
+        deadline = deadline or Deadline(SEARCH_DEADLINE_SECONDS)
+        return fast_path.iterate(
+            lambda: TokyoHttpScraper(self.pool).iter_pages(keyword, category, limit, deadline),
+            lambda: self._iter_browser(keyword, category, limit, deadline),
+        )
+
+    async def _iter_browser(self, keyword: str, category: str, limit: Optional[int],
+                            deadline: Deadline) -> AsyncIterator[List[BidItem]]:
+        async with self.session_context(keywords=[keyword], category=category) as context:
+            page = await self.new_page(context)
             
             try:
-                await page.goto("https://www.e-procurement.metro.tokyo.lg.jp/indexPbi.jsp", timeout=60000)
-                await page.wait_for_load_state("networkidle")
+                with span("page.goto", self.source_name):
+                    await page.goto(ENTRY_URL, timeout=deadline.timeout_ms(),
+                                    wait_until="domcontentloaded")
+                    await page.wait_for_function("typeof SelectTargetSubmit === 'function'", timeout=deadline.timeout_ms())
                 
                 # Click "発注予定情報" (Order Schedule)
                 await page.evaluate("SelectTargetSubmit(3,3,'_top')")
-                await page.wait_for_load_state("networkidle")
-                await page.wait_for_timeout(2000)
+                await page.wait_for_selector("input[name='ankenName']", timeout=deadline.timeout_ms())
                 
                 # Select Category
                 target_selector = "input[name='constConsgoods']" # Default Construction
@@ -38,75 +112,53 @@ class TokyoMetroScraper(BaseScraper):
                 
                 # Click Search
                 await page.evaluate("setTimeout(() => SelectSubmitOrder(4,1), 0)")
-                await page.wait_for_timeout(5000)
                 
-                # Check for confirmation page
-                if await page.locator("a[href*='SelectSubmit(4,3)']").count() > 0:
-                    await page.evaluate("SelectSubmit(4,3)")
-                    await page.wait_for_load_state("networkidle")
+                # Either the results, an empty-result message or a confirmation page
+                with span("search", self.source_name):
+                    outcome = await wait_for_any(
+                        page, deadline,
+                        selectors={"table": "table.list-data", "confirm": CONFIRM_SELECTOR},
+                        texts={"empty": EMPTY_RESULT_MARKERS},
+                    )
+                    if outcome == "confirm":
+                        await page.evaluate("SelectSubmit(4,3)")
+                        outcome = await wait_for_results(page, "table.list-data", deadline)
                 
-                # Wait for results
-                try:
-                    await page.wait_for_selector("table.list-data", timeout=10000)
-                except:
+                if outcome != "table":
                     logger.info("No results found or timeout.")
-                    return []
+                    return
                 
-                # Extract items (First page only for real-time speed)
-                items = await page.evaluate("""() => {
-                    const items = [];
-                    const table = document.querySelector('table.list-data');
-                    if (!table) return [];
-                    
-                    const rows = Array.from(table.querySelectorAll('tr'));
-                    
-                    for (let i = 1; i < rows.length; i++) {
-                        const row = rows[i];
-                        const cells = row.querySelectorAll('td');
-                        if (cells.length < 10) continue;
-                        
-                        const link = row.querySelector("a[href*='SelectSubmitNo']");
-                        if (!link) continue;
-                        
-                        const title = link.innerText.trim();
-                        // Construct absolute URL? The link is JS. 
-                        // We can just return the title and maybe a dummy URL or try to extract ID.
-                        // The original scraper extracted href.
-                        const url = "https://www.e-procurement.metro.tokyo.lg.jp/indexPbi.jsp"; // Placeholder as it's JS link
-                        
-                        let org = "";
-                        if (cells.length > 10) {
-                            org = cells[10].innerText.trim();
-                        }
-                        
-                        let deadline = "";
-                        if (cells.length > 8) {
-                            deadline = cells[8].innerText.trim();
-                        }
-                        
-                        items.push({
-                            title: title,
-                            url: url,
-                            org: org,
-                            deadline: deadline
-                        });
-                    }
-                    return items;
-                }""")
-                
-                for item in items:
-                    results.append(BidItem(
+                collected = 0
+                while True:
+                    with span("extract", self.source_name):
+                        items = await page.evaluate(EXTRACT_JS)
+                    batch = [BidItem(
                         title=item['title'],
                         organization=item['org'],
                         deadline=normalize_date(item['deadline']),
                         category=category,
                         url=item['url'],
                         source="Tokyo Metro"
-                    ))
+                    ) for item in items]
+                    if limit is not None:
+                        batch = batch[:limit - collected]
+                    collected += len(batch)
+
+                    # Prefetch: start loading the next page before yielding this one
+                    pager = page.locator(PAGER_SELECTOR).first
+                    more = (limit is None or collected < limit) and not deadline.expired and await pager.count() > 0
+                    if more:
+                        await mark_stale(page, "table.list-data")
+                        await pager.click(no_wait_after=True)
+
+                    if batch:
+                        yield batch
+                    if not more:
+                        break
+                    with span("next_page", self.source_name):
+                        outcome = await wait_for_results(page, FRESH_TABLE_SELECTOR, deadline)
+                    if outcome != "table":
+                        break
                     
             except Exception as e:
                 logger.error(f"Error scraping Tokyo Metro: {e}")
-            finally:
-                await browser.close()
-                
-        return results
@@ -0,0 +1,122 @@
+from typing import AsyncIterator, List, Optional
+from .base import BaseScraper, BidItem, Deadline, EMPTY_RESULT_MARKERS, normalize_date
+from .http_fastpath import HttpSession, UnexpectedPageShape, submit_js_call
+from metrics import span
+import asyncio
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Overridable so benchmarks can target the offline stand-in (benchmarks/standin.py)
+BASE_URL = os.getenv("TOKYO_BASE_URL", "https://www.e-procurement.metro.tokyo.lg.jp").rstrip("/")
+ENTRY_URL = f"{BASE_URL}/indexPbi.jsp"
+
+_PAGER_TEXT = re.compile("次へ|次ページ")
+_JS_CALL = re.compile(r"(?:javascript:)?\s*(\w+)\(([^)]*)\)")
+
+
+class TokyoHttpScraper(BaseScraper):
+    """
+    Browserless version of TokyoMetroScraper: the indexPbi.jsp flow is a chain
+    of server-rendered forms, so it is replayed with plain form posts.
+    """
+    source_name = "Tokyo Metro"
+
+    async def search(self, keyword: str, category: str) -> List[BidItem]:
+        results = []
+        async for batch in self.iter_pages(keyword, category):
+            results.extend(batch)
+        return results
+
+    async def iter_pages(self, keyword: str, category: str, limit: Optional[int] = None,
+                         deadline: Optional[Deadline] = None) -> AsyncIterator[List[BidItem]]:
+        """Same contract as TokyoMetroScraper.iter_pages."""
+        async with HttpSession() as session:
+            page = await session.get(ENTRY_URL)
+
+            # "発注予定情報" (Order Schedule)
+            page = await submit_js_call(session, page, "SelectTargetSubmit", [3, 3, "_top"])
+            keyword_input = page.soup.select_one("input[name='ankenName']")
+            if keyword_input is None:
+                raise UnexpectedPageShape("Tokyo search form not found")
+            form = keyword_input.find_parent("form")
+            if form is None:
+                raise UnexpectedPageShape("Tokyo keyword field is outside any form")
+
+            # Category checkbox + keyword; submitted by SelectSubmitOrder(4,1)
+            checkbox_name = "itemConsgoods" if category == "goods" else "constConsgoods"
+            checkbox = form.select_one(f"input[name='{checkbox_name}']")
+            if checkbox is None:
+                raise UnexpectedPageShape(f"Tokyo category checkbox {checkbox_name} not found")
+            overrides = {checkbox_name: checkbox.get("value", "on")}
+            if keyword:
+                overrides["ankenName"] = keyword
+            page = await submit_js_call(session, page, "SelectSubmitOrder", [4, 1], overrides)
+
+            # Confirmation page
+            if page.soup.select_one("a[href*='SelectSubmit(4,3)']") is not None:
+                page = await submit_js_call(session, page, "SelectSubmit", [4, 3])
+
+            collected = 0
+            while True:
+                batch = self._parse(page, category)
+                if limit is not None:
+                    batch = batch[:limit - collected]
+                collected += len(batch)
+
+                # Prefetch: request the next page before handing this batch out
+                pager_call = self._pager_call(page)
+                more = (pager_call is not None and (limit is None or collected < limit)
+                        and (deadline is None or not deadline.expired))
+                next_page = None
+                if more:
+                    next_page = asyncio.ensure_future(submit_js_call(session, page, *pager_call))
+                try:
+                    if batch:
+                        yield batch
+                    if not more:
+                        return
+                    with span("next_page", f"{self.source_name} (HTTP)"):
+                        page = await next_page
+                finally:
+                    if next_page is not None and not next_page.done():
+                        next_page.cancel()
+
+    def _pager_call(self, page):
+        """(function, args) behind the "次へ" link, if there is one."""
+        for link in page.soup.find_all("a"):
+            if not _PAGER_TEXT.search(link.get_text()):
+                continue
+            match = _JS_CALL.search(link.get("href") or "") or _JS_CALL.search(link.get("onclick") or "")
+            if match:
+                args = [a.strip().strip("'\"") for a in match.group(2).split(",") if a.strip()]
+                return match.group(1), [int(a) if a.lstrip("-").isdigit() else a for a in args]
+        return None
+
+    def _parse(self, page, category: str) -> List[BidItem]:
+        table = page.soup.select_one("table.list-data")
+        if table is None:
+            if any(page.has_text(marker) for marker in EMPTY_RESULT_MARKERS):
+                return []
+            raise UnexpectedPageShape("Tokyo result table not found")
+
+        results = []
+        # Same columns as the Playwright extractor: title link, [8] deadline, [10] org
+        for row in table.find_all("tr")[1:]:
+            cells = row.find_all("td")
+            if len(cells) < 10:
+                continue
+            link = row.select_one("a[href*='SelectSubmitNo']")
+            if link is None:
+                continue
+            results.append(BidItem(
+                title=link.get_text(strip=True),
+                organization=cells[10].get_text(strip=True) if len(cells) > 10 else "",
+                deadline=normalize_date(cells[8].get_text(strip=True)),
+                category=category,
+                url=ENTRY_URL,
+                source="Tokyo Metro"
+            ))
+        return results
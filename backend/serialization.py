@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, Union
+
+from scrapers.base import BidItem
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder produces the same JSON, just slower
+    orjson = None
+
+# Non-streaming responses larger than this are gzipped for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "16384"))
+
+# Field order of one search result; also the "columns" of the columnar layout
+RESULT_COLUMNS = ["id", "title", "organization", "deadline", "category", "url", "source"]
+
+ResultRow = Tuple[str, str, str, Optional[str], str, str, str]
+
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON (Japanese text stays unescaped)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def ndjson(events: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async for event in events:
+        yield dumps(event) + b"\n"
+
+
+def result_row(key: str, item: BidItem) -> ResultRow:
+    """One result in RESULT_COLUMNS order. Scraper output is trusted, so no per-row validation."""
+    return (key, item.title, item.organization, item.deadline, item.category, item.url, item.source)
+
+
+def layout_rows(rows: Sequence[ResultRow], layout: str) -> Union[List[dict], dict]:
+    """layout=columns: {"columns": [...], "rows": [[...]]}; otherwise one object per row."""
+    if layout == "columns":
+        return {"columns": RESULT_COLUMNS, "rows": rows}
+    return [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+
+
+def etag(rows: Sequence[ResultRow], layout: str) -> str:
+    """
+    Weak validator derived from the rows: ids are content fingerprints
+    (source, title, organization, deadline), plus the fields outside them.
+    """
+    digest = hashlib.sha1(layout.encode("utf-8"))
+    for row in rows:
+        digest.update("\x1f".join((row[0], row[4], row[5])).encode("utf-8"))
+        digest.update(b"\x1e")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored on both sides
+    candidates = {value.strip().replace("W/", "", 1) for value in if_none_match.split(",")}
+    return tag.replace("W/", "", 1) in candidates
+
+
+def maybe_gzip(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Returns (body, content encoding)."""
+    if len(body) < GZIP_MIN_BYTES or "gzip" not in (accept_encoding or "").lower():
+        return body, None
+    return gzip.compress(body, compresslevel=6), "gzip"
@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from scheduler import PRIORITY_LOW, PRIORITY_NORMAL, scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One underlying call shared by every waiter on its keys."""
+
+    def __init__(self, keys: List[Hashable], client: str, priority: int, number: int,
+                 batch: bool = False, streaming: bool = False):
+        self.keys = keys
+        # Scheduler client of the caller that started the call
+        self.owner = client
+        self.priority = priority
+        # Low-priority calls queue under a client of their own, so promoting
+        # one of them does not promote the rest of its owner's speculative work
+        self.client = f"{client}/flight-{number}" if priority == PRIORITY_LOW else client
+        # Batch flights resolve to {key: items}; the others to the items themselves
+        self.batch = batch
+        self.task: Optional[asyncio.Future] = None
+        self.waiters = 0
+        # Streaming flights: batches so far, and an event replaced after each one
+        self.batches: Optional[List[list]] = [] if streaming else None
+        self.changed = asyncio.Event()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def value(self, key: Hashable):
+        result = self.task.result()
+        return result.get(key, []) if self.batch else result
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight scraper calls, keyed like the result cache
+    by (source, keyword, category): the first caller starts the call as a task
+    and later callers wait on the same task. Waiters are counted, so one
+    client going away only detaches that client; the call is cancelled once
+    nobody is waiting for it any more.
+
+    Fetch callables get the scheduler client to queue under. A call started
+    at low priority (speculative refine, saved searches) is promoted as
+    soon as a normal-priority caller joins it, so that caller never waits
+    behind idle-only work.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._numbers = itertools.count(1)
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        self.promoted = 0
+
+    def _new(self, keys: List[Hashable], client: str, priority: int, **kwargs) -> _Flight:
+        if scheduler.is_promoted(client):
+            priority = PRIORITY_NORMAL
+        return _Flight(keys, client, priority, next(self._numbers), **kwargs)
+
+    def _start(self, flight: _Flight, run: Callable[[str], Awaitable[Any]]) -> _Flight:
+        for key in flight.keys:
+            self._flights[key] = flight
+        flight.task = asyncio.ensure_future(run(flight.client))
+        flight.task.add_done_callback(lambda task: self._finished(flight))
+        self.started += 1
+        return flight
+
+    def _finished(self, flight: _Flight):
+        self._forget(flight)
+        if flight.client != flight.owner:
+            scheduler.forget(flight.client)
+        flight.notify()
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            # Retrieved here so a failure nobody waits for any more is not reported as unhandled
+            logger.debug(f"Shared call for {flight.keys} failed: {flight.task.exception()!r}")
+
+    def _forget(self, flight: _Flight):
+        for key in flight.keys:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _join(self, key: Hashable, priority: int) -> Optional[_Flight]:
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            if priority == PRIORITY_NORMAL and flight.priority == PRIORITY_LOW:
+                self._promote(flight)
+        return flight
+
+    def _promote(self, flight: _Flight):
+        flight.priority = PRIORITY_NORMAL
+        scheduler.promote(flight.client)
+        self.promoted += 1
+
+    def promote(self, client: str):
+        """Promotes the low-priority calls `client` started (see Scheduler.promote)."""
+        for flight in {id(flight): flight for flight in self._flights.values()}.values():
+            if flight.owner == client and flight.priority == PRIORITY_LOW:
+                self._promote(flight)
+
+    def _leave(self, flight: _Flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # Last waiter went away: stop the call, and let new callers start a fresh one
+            self.abandoned += 1
+            self._forget(flight)
+            flight.task.cancel()
+
+    async def _wait(self, flight: _Flight):
+        flight.waiters += 1
+        try:
+            # Cancelling this waiter must not cancel the shared task
+            await asyncio.shield(flight.task)
+        finally:
+            self._leave(flight)
+
+    async def do(self, key: Hashable, fetch: Callable[[str], Awaitable[Any]], client: str,
+                 priority: int = PRIORITY_NORMAL):
+        flight = self._join(key, priority) or self._start(self._new([key], client, priority), fetch)
+        await self._wait(flight)
+        return flight.value(key)
+
+    async def do_many(self, keys: List[Hashable],
+                      fetch_many: Callable[[List[Hashable], str], Awaitable[Dict[Hashable, Any]]],
+                      client: str, priority: int = PRIORITY_NORMAL) -> Dict[Hashable, Any]:
+        """Keys already in flight are joined; the rest share one new fetch_many call."""
+        flights: Dict[Hashable, _Flight] = {}
+        missing = []
+        for key in keys:
+            flight = self._join(key, priority)
+            if flight is None:
+                missing.append(key)
+            else:
+                flights[key] = flight
+        if missing:
+            batch = self._start(self._new(missing, client, priority, batch=True),
+                                lambda flight_client: fetch_many(missing, flight_client))
+            flights.update((key, batch) for key in missing)
+
+        distinct = list({id(flight): flight for flight in flights.values()}.values())
+        for flight in distinct:
+            flight.waiters += 1
+        try:
+            await asyncio.gather(*(asyncio.shield(flight.task) for flight in distinct))
+        finally:
+            for flight in distinct:
+                self._leave(flight)
+        return {key: flight.value(key) for key, flight in flights.items()}
+
+    async def stream(self, key: Hashable, iterate: Callable[[str], AsyncIterator[list]], client: str,
+                     priority: int = PRIORITY_NORMAL) -> AsyncIterator[list]:
+        """
+        Streaming variant for iter_pages: every follower gets all batches of
+        the shared crawl from the first one. A plain call already in flight
+        for the key is joined and yields its result as one batch.
+        """
+        flight = self._join(key, priority)
+        if flight is not None and flight.batches is None:
+            await self._wait(flight)
+            yield flight.value(key)
+            return
+        if flight is None:
+            flight = self._new([key], client, priority, streaming=True)
+            self._start(flight, lambda flight_client: self._pump(flight, iterate, flight_client))
+
+        flight.waiters += 1
+        try:
+            position = 0
+            while True:
+                changed = flight.changed
+                while position < len(flight.batches):
+                    yield flight.batches[position]
+                    position += 1
+                if flight.task.done():
+                    # Re-raises the crawl's error, if any
+                    flight.task.result()
+                    return
+                await changed.wait()
+        finally:
+            self._leave(flight)
+
+    async def _pump(self, flight: _Flight, iterate: Callable[[str], AsyncIterator[list]], client: str) -> list:
+        collected = []
+        async for batch in iterate(client):
+            collected.extend(batch)
+            flight.batches.append(batch)
+            flight.notify()
+        return collected
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len({id(flight) for flight in self._flights.values()}),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "promoted": self.promoted,
+        }
+
+
+flights = SingleFlight()
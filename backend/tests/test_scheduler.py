@@ -0,0 +1,25 @@
+import asyncio
+
+from scheduler import Scheduler, SourceLimit
+
+
+def test_waiter_cancelled_during_release_is_skipped():
+    async def scenario():
+        scheduler = Scheduler({"Kanagawa": SourceLimit(concurrency=1)}, global_concurrency=4)
+        holder = scheduler.slot("Kanagawa", "a")
+        await holder.__aenter__()
+        waiter = asyncio.ensure_future(scheduler.run("Kanagawa", "b", lambda: asyncio.sleep(0)))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["sources"]["Kanagawa"]["queue_depth"] == 1
+
+        # Cancelled while queued, and the slot is freed before its task gets to run
+        waiter.cancel()
+        await holder.__aexit__(None, None, None)
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert waiter.cancelled()
+
+        source = scheduler.stats()["sources"]["Kanagawa"]
+        assert (source["running"], source["queue_depth"], scheduler.global_running) == (0, 0, 0)
+        assert await asyncio.wait_for(scheduler.run("Kanagawa", "c", lambda: asyncio.sleep(0, "ok")), 1) == "ok"
+
+    asyncio.run(scenario())
@@ -0,0 +1,605 @@
+"""
+Out-of-process scraper workers fed from a SQLite job queue.
+
+With SCRAPER_BACKEND=queue the API never drives a browser: every scraper
+call becomes a row in the queue, and worker processes (each with its own
+warm browser pool) claim jobs, run the real scraper and append the result
+batches for the API to stream back.
+
+The queue is a SQLite file, so the API and its workers are meant to run on
+one host. The file uses a rollback journal rather than WAL (WAL needs shared
+memory on one host), so workers elsewhere can only share it over a network
+filesystem whose byte-range locks actually work (e.g. NFSv4 with locking
+enabled); many NFS/SMB setups do not lock reliably, and then claims and
+heartbeats can collide. Anything beyond that needs a real broker behind
+the WorkQueue interface.
+
+    cd backend && python -m worker --processes 2
+    cd backend && python -m worker --processes 1 --sources "Tokyo Metro"
+"""
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import AsyncIterator, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from scrapers.base import BidItem
+
+logger = logging.getLogger(__name__)
+
+# local: scrapers run in the API process; queue: they run in worker processes
+SCRAPER_BACKEND = os.getenv("SCRAPER_BACKEND", "local").lower()
+QUEUE_PATH = os.getenv("SCRAPER_QUEUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_queue.db"))
+# Worker processes the API starts itself in queue mode; 0 when workers run elsewhere
+LOCAL_WORKERS = int(os.getenv("SCRAPER_LOCAL_WORKERS", "2"))
+# Jobs one worker process runs at once (they share its browser pool)
+WORKER_CONCURRENCY = int(os.getenv("SCRAPER_WORKER_CONCURRENCY", "2"))
+# A running job whose worker has not sent a heartbeat for this long is handed to another worker
+LEASE_SECONDS = float(os.getenv("SCRAPER_QUEUE_LEASE", "60"))
+MAX_ATTEMPTS = int(os.getenv("SCRAPER_QUEUE_MAX_ATTEMPTS", "2"))
+# How long a job may wait unclaimed before the API gives up on it
+CLAIM_TIMEOUT_SECONDS = float(os.getenv("SCRAPER_QUEUE_CLAIM_TIMEOUT", "120"))
+POLL_SECONDS = float(os.getenv("SCRAPER_QUEUE_POLL", "0.2"))
+# How often the API requeues or fails jobs whose worker stopped sending heartbeats
+EXPIRE_SECONDS = LEASE_SECONDS / 4
+# How often the API checks that its local worker processes are still alive
+SUPERVISE_SECONDS = float(os.getenv("SCRAPER_WORKER_SUPERVISE", "5"))
+# Finished jobs nobody collected are deleted after this long
+RETENTION_SECONDS = 3600
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    -- AUTOINCREMENT: ids of discarded jobs must never be handed out again
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    method TEXT NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS scrape_jobs_status ON scrape_jobs(status, id);
+CREATE TABLE IF NOT EXISTS scrape_batches (
+    job_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class WorkerError(Exception):
+    """A worker failed the job, or no worker claimed it in time."""
+
+
+def _encode(items: List[BidItem]) -> list:
+    return [asdict(item) for item in items]
+
+
+def _decode(rows: list) -> List[BidItem]:
+    return [BidItem(**row) for row in rows]
+
+
+class WorkQueue:
+    """
+    SQLite-backed job queue shared by the API and the workers. Claims run in
+    an immediate transaction, so any number of processes on the host (see the
+    module docstring for other hosts) can poll the same queue.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH):
+        self.path = path
+        # Autocommit; transactions are opened explicitly in _transaction
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # Rollback journal: WAL's shared-memory index only works within one host
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def submit(self, source: str, method: str, args: dict) -> int:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO scrape_jobs (source, method, args, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (source, method, json.dumps(args, ensure_ascii=False), QUEUED, time.time()))
+            return cursor.lastrowid
+
+    def claim(self, worker: str, sources: Optional[List[str]] = None) -> Optional[sqlite3.Row]:
+        """Takes the oldest queued job (of `sources`, if given) for `worker`."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            query = "SELECT * FROM scrape_jobs WHERE status = ?"
+            params: list = [QUEUED]
+            if sources:
+                query += f" AND source IN ({','.join('?' * len(sources))})"
+                params.extend(sources)
+            job = conn.execute(query + " ORDER BY id LIMIT 1", params).fetchone()
+            if job is None:
+                return None
+            conn.execute(
+                "UPDATE scrape_jobs SET status = ?, worker = ?, attempts = attempts + 1, heartbeat_at = ? WHERE id = ?",
+                (RUNNING, worker, now, job["id"]))
+            return job
+
+    def expire(self):
+        """
+        Requeues or fails jobs whose lease ran out. Workers do this on every
+        claim; the API does it too, so a job still ends when no worker is left.
+        """
+        with self._transaction() as conn:
+            self._requeue_expired(conn, time.time())
+
+    def _requeue_expired(self, conn, now: float):
+        # The worker died or hung: retry elsewhere, up to MAX_ATTEMPTS
+        expired = now - LEASE_SECONDS
+        conn.execute("UPDATE scrape_jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ? "
+                     "AND attempts < ?", (QUEUED, RUNNING, expired, MAX_ATTEMPTS))
+        conn.execute("UPDATE scrape_jobs SET status = ?, error = ?, finished_at = ? WHERE status = ? "
+                     "AND heartbeat_at < ?", (FAILED, "worker lease expired", now, RUNNING, expired))
+        conn.execute("DELETE FROM scrape_batches WHERE job_id IN "
+                     "(SELECT id FROM scrape_jobs WHERE finished_at < ?)", (now - RETENTION_SECONDS,))
+        conn.execute("DELETE FROM scrape_jobs WHERE finished_at < ?", (now - RETENTION_SECONDS,))
+
+    def heartbeat(self, job_ids: List[int]) -> List[int]:
+        """Extends the lease of running jobs; returns those that were cancelled meanwhile."""
+        if not job_ids:
+            return []
+        marks = ",".join("?" * len(job_ids))
+        with self._transaction() as conn:
+            conn.execute(f"UPDATE scrape_jobs SET heartbeat_at = ? WHERE status = ? AND id IN ({marks})",
+                         [time.time(), RUNNING, *job_ids])
+            rows = conn.execute(f"SELECT id FROM scrape_jobs WHERE status = ? AND id IN ({marks})",
+                                [CANCELLED, *job_ids]).fetchall()
+        return [row["id"] for row in rows]
+
+    def batch_count(self, job_id: int) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scrape_batches WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+    def append(self, job_id: int, worker: str, payload) -> bool:
+        """Stores the next batch; False if `worker` no longer owns the job (cancelled or lease lost)."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO scrape_batches (job_id, seq, payload) "
+                "SELECT ?, (SELECT COUNT(*) FROM scrape_batches WHERE job_id = ?), ? "
+                "WHERE EXISTS (SELECT 1 FROM scrape_jobs WHERE id = ? AND status = ? AND worker = ?)",
+                (job_id, job_id, json.dumps(payload, ensure_ascii=False), job_id, RUNNING, worker))
+            return cursor.rowcount > 0
+
+    def finish(self, job_id: int, worker: str, error: Optional[str] = None):
+        with self._transaction() as conn:
+            conn.execute("UPDATE scrape_jobs SET status = ?, error = ?, finished_at = ? "
+                         "WHERE id = ? AND status = ? AND worker = ?",
+                         (FAILED if error else DONE, error, time.time(), job_id, RUNNING, worker))
+
+    def cancel(self, job_id: int):
+        with self._transaction() as conn:
+            conn.execute("UPDATE scrape_jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                         (CANCELLED, time.time(), job_id, QUEUED, RUNNING))
+
+    def poll(self, positions: Dict[int, int]) -> Dict[int, tuple]:
+        """For each job id -> seq `since`: (status, error, batches from `since`)."""
+        if not positions:
+            return {}
+        marks = ",".join("?" * len(positions))
+        with self._lock:
+            jobs = {row["id"]: row for row in self._conn.execute(
+                f"SELECT id, status, error FROM scrape_jobs WHERE id IN ({marks})", list(positions)).fetchall()}
+            batches = {job_id: self._conn.execute(
+                "SELECT payload FROM scrape_batches WHERE job_id = ? AND seq >= ? ORDER BY seq",
+                (job_id, since)).fetchall() for job_id, since in positions.items() if job_id in jobs}
+        results = {}
+        for job_id in positions:
+            job = jobs.get(job_id)
+            if job is None:
+                results[job_id] = (CANCELLED, "job disappeared from the queue", [])
+            else:
+                results[job_id] = (job["status"], job["error"], [json.loads(row["payload"]) for row in batches[job_id]])
+        return results
+
+    def discard(self, job_id: int):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM scrape_batches WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM scrape_jobs WHERE id = ?", (job_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM scrape_jobs GROUP BY status").fetchall()
+            workers = self._conn.execute("SELECT COUNT(DISTINCT worker) FROM scrape_jobs WHERE status = ?",
+                                         (RUNNING,)).fetchone()[0]
+        return {"path": self.path, "by_status": {row["status"]: row["n"] for row in rows}, "busy_workers": workers}
+
+
+_default_queue: Optional[WorkQueue] = None
+
+
+def get_queue() -> WorkQueue:
+    global _default_queue
+    if _default_queue is None:
+        _default_queue = WorkQueue()
+    return _default_queue
+
+
+# Pushed by the poller when a job stayed queued past CLAIM_TIMEOUT_SECONDS
+_UNCLAIMED = "unclaimed"
+
+
+class _Watch:
+    def __init__(self):
+        self.received = 0
+        self.status: Optional[str] = None
+        # Since when the job has been waiting for a worker (again, after a lease expired)
+        self.queued_since = time.monotonic()
+        self.updates: asyncio.Queue = asyncio.Queue()
+
+
+class QueuePoller:
+    """
+    The API's single reader of the queue: one task polls every job some
+    RemoteScraper call is waiting on, in one executor call per tick, and
+    hands each job its new batches and status changes. It also runs the
+    lease expiry sweep, so jobs of dead workers end up FAILED (or queued
+    again) even when no live worker is claiming jobs.
+    """
+
+    def __init__(self, queue: WorkQueue):
+        self.queue = queue
+        self._watches: Dict[int, _Watch] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def watch(self, job_id: int) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (tests, restarts): watches of the old one are gone with it
+            self._watches.clear()
+            self._task = None
+            self._loop = loop
+        watch = self._watches[job_id] = _Watch()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._poll())
+        return watch.updates
+
+    def unwatch(self, job_id: int):
+        self._watches.pop(job_id, None)
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        expired_at = time.monotonic()
+        try:
+            while self._watches:
+                if time.monotonic() - expired_at >= EXPIRE_SECONDS:
+                    expired_at = time.monotonic()
+                    try:
+                        await loop.run_in_executor(None, self.queue.expire)
+                    except sqlite3.Error as e:
+                        logger.warning(f"Expiring scrape queue leases failed: {e!r}")
+                positions = {job_id: watch.received for job_id, watch in self._watches.items()}
+                try:
+                    results = await loop.run_in_executor(None, self.queue.poll, positions)
+                except sqlite3.Error as e:
+                    logger.warning(f"Polling the scrape queue failed: {e!r}")
+                    results = {}
+                now = time.monotonic()
+                for job_id, (status, error, batches) in results.items():
+                    watch = self._watches.get(job_id)
+                    if watch is None:
+                        continue
+                    if status == QUEUED and watch.status not in (None, QUEUED):
+                        watch.queued_since = now
+                    if status == QUEUED and now - watch.queued_since > CLAIM_TIMEOUT_SECONDS:
+                        status = _UNCLAIMED
+                    if batches or status != watch.status:
+                        watch.received += len(batches)
+                        watch.status = status
+                        watch.updates.put_nowait((status, error, batches))
+                await asyncio.sleep(POLL_SECONDS)
+        finally:
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"watched_jobs": len(self._watches)}
+
+
+_pollers: Dict[int, QueuePoller] = {}
+
+
+def get_poller(queue: WorkQueue) -> QueuePoller:
+    poller = _pollers.get(id(queue))
+    if poller is None or poller.queue is not queue:
+        poller = _pollers[id(queue)] = QueuePoller(queue)
+    return poller
+
+
+class RemoteScraper:
+    """
+    Stands in for a BaseScraper in the API process: search, search_many and
+    iter_pages are submitted to the queue and their batches come back
+    through the shared QueuePoller.
+    Cancelling a call cancels the job, and the worker stops it at its next heartbeat.
+    """
+
+    def __init__(self, source_name: str, queue: Optional[WorkQueue] = None):
+        self.source_name = source_name
+        self.queue = queue or get_queue()
+        self.poller = get_poller(self.queue)
+
+    async def _run(self, method: str, **args) -> AsyncIterator:
+        loop = asyncio.get_running_loop()
+        job_id = await loop.run_in_executor(None, self.queue.submit, self.source_name, method, args)
+        updates = self.poller.watch(job_id)
+        finished = False
+        try:
+            while True:
+                status, error, batches = await updates.get()
+                for payload in batches:
+                    yield payload
+                if status == DONE:
+                    finished = True
+                    return
+                if status in (FAILED, CANCELLED):
+                    finished = True
+                    raise WorkerError(f"{self.source_name} {method} job {job_id} {status}: {error}")
+                if status == _UNCLAIMED:
+                    raise WorkerError(f"No scraper worker claimed {self.source_name} job {job_id} "
+                                      f"within {CLAIM_TIMEOUT_SECONDS:.0f}s")
+        finally:
+            self.poller.unwatch(job_id)
+            # Not awaited: this also runs when the caller was cancelled
+            if finished:
+                loop.run_in_executor(None, self.queue.discard, job_id)
+            else:
+                loop.run_in_executor(None, self.queue.cancel, job_id)
+
+    async def search(self, keyword: str, category: str) -> List[BidItem]:
+        items = []
+        async for rows in self._run("search", keyword=keyword, category=category):
+            items.extend(_decode(rows))
+        return items
+
+    async def search_many(self, keywords: List[str], category: str) -> Dict[str, List[BidItem]]:
+        found = {}
+        async for batch in self._run("search_many", keywords=list(keywords), category=category):
+            found.update((kw, _decode(rows)) for kw, rows in batch.items())
+        return found
+
+    async def iter_pages(self, keyword: str, category: str, limit: Optional[int] = None) -> AsyncIterator[List[BidItem]]:
+        async for rows in self._run("iter_pages", keyword=keyword, category=category, limit=limit):
+            yield _decode(rows)
+
+
+def scraper_for(scraper_class):
+    """The scraper the API should call: the real one, or its queue proxy in SCRAPER_BACKEND=queue."""
+    if SCRAPER_BACKEND == "queue":
+        return RemoteScraper(scraper_class.source_name)
+    return scraper_class()
+
+
+class _LostJob(Exception):
+    """The job was cancelled or handed to another worker while this one ran it."""
+
+
+async def _execute(queue: WorkQueue, worker: str, scrapers: Dict, job: sqlite3.Row):
+    loop = asyncio.get_running_loop()
+    scraper = scrapers[job["source"]]
+    args = json.loads(job["args"])
+    method = job["method"]
+
+    async def deliver(payload):
+        if not await loop.run_in_executor(None, queue.append, job["id"], worker, payload):
+            raise _LostJob(job["id"])
+
+    if method == "iter_pages":
+        # A retried job skips the pages an earlier attempt already delivered
+        skip = await loop.run_in_executor(None, queue.batch_count, job["id"])
+        async for batch in scraper.iter_pages(args["keyword"], args["category"], limit=args.get("limit")):
+            if skip:
+                skip -= 1
+                continue
+            await deliver(_encode(batch))
+    elif method == "search_many":
+        found = await scraper.search_many(args["keywords"], args["category"])
+        await deliver({kw: _encode(items) for kw, items in found.items()})
+    elif method == "search":
+        await deliver(_encode(await scraper.search(args["keyword"], args["category"])))
+    else:
+        raise ValueError(f"Unknown scraper method {method!r}")
+
+
+async def serve(name: str, sources: Optional[List[str]] = None, concurrency: int = WORKER_CONCURRENCY,
+                queue_path: str = QUEUE_PATH):
+    """One worker process: a warm browser pool and up to `concurrency` jobs at a time."""
+    from scrapers.browser_pool import get_pool
+    from scrapers.gov import GovernmentPortalScraper
+    from scrapers.kanagawa import KanagawaScraper
+    from scrapers.tokyo import TokyoMetroScraper
+
+    queue = WorkQueue(queue_path)
+    pool = get_pool()
+    await pool.start()
+    scrapers = {s.source_name: s for s in (TokyoMetroScraper(pool), GovernmentPortalScraper(pool), KanagawaScraper(pool))}
+    running: Dict[int, asyncio.Task] = {}
+    slots = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def run(job):
+        try:
+            await _execute(queue, name, scrapers, job)
+            error = None
+        except (asyncio.CancelledError, _LostJob):
+            logger.info(f"Worker {name}: job {job['id']} cancelled")
+            return
+        except Exception as e:
+            logger.error(f"Worker {name}: job {job['id']} ({job['source']} {job['method']}) failed: {e!r}")
+            error = repr(e)
+        finally:
+            running.pop(job["id"], None)
+            slots.release()
+        await loop.run_in_executor(None, queue.finish, job["id"], name, error)
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            for job_id in await loop.run_in_executor(None, queue.heartbeat, list(running)):
+                task = running.get(job_id)
+                if task is not None:
+                    task.cancel()
+
+    beat = asyncio.ensure_future(heartbeat())
+    logger.info(f"Worker {name} serving {', '.join(sources) if sources else 'all sources'} from {queue_path}")
+    try:
+        while True:
+            await slots.acquire()
+            job = await loop.run_in_executor(None, queue.claim, name, sources)
+            if job is None:
+                slots.release()
+                await asyncio.sleep(POLL_SECONDS)
+                continue
+            running[job["id"]] = asyncio.ensure_future(run(job))
+    finally:
+        beat.cancel()
+        for task in list(running.values()):
+            task.cancel()
+        await pool.stop()
+        queue.close()
+
+
+def _process_main(name: str, sources: Optional[List[str]], concurrency: int, queue_path: str):
+    logging.basicConfig(level=logging.INFO)
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    try:
+        asyncio.run(serve(name, sources, concurrency, queue_path))
+    except KeyboardInterrupt:
+        pass
+
+
+def _start_process(index: int, sources: Optional[List[str]], concurrency: int, queue_path: str,
+                   generation: int = 0) -> multiprocessing.Process:
+    # spawn: workers must not inherit the parent's event loop or Playwright driver
+    context = multiprocessing.get_context("spawn")
+    # A restarted worker gets a new name, so it never appends to jobs its predecessor held
+    name = f"{socket.gethostname()}-{os.getpid()}-{index}" + (f".{generation}" if generation else "")
+    process = context.Process(target=_process_main, args=(name, sources, concurrency, queue_path),
+                              name=f"scraper-worker-{index}", daemon=True)
+    process.start()
+    return process
+
+
+def start_processes(count: int, sources: Optional[List[str]] = None, concurrency: int = WORKER_CONCURRENCY,
+                    queue_path: str = QUEUE_PATH) -> List[multiprocessing.Process]:
+    return [_start_process(index, sources, concurrency, queue_path) for index in range(count)]
+
+
+def stop_processes(processes: List[multiprocessing.Process], timeout: float = 10):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout)
+
+
+class WorkerSupervisor:
+    """
+    The API's local worker processes (SCRAPER_LOCAL_WORKERS): started with
+    the API, and restarted when one exits while the API is running. The
+    jobs a dead worker held are requeued or failed by the lease sweep.
+    """
+
+    def __init__(self, count: int, sources: Optional[List[str]] = None,
+                 concurrency: int = WORKER_CONCURRENCY, queue_path: str = QUEUE_PATH):
+        self.count = count
+        self.sources = sources
+        self.concurrency = concurrency
+        self.queue_path = queue_path
+        self.processes: List[multiprocessing.Process] = []
+        self.restarts = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.count > 0:
+            self.processes = start_processes(self.count, self.sources, self.concurrency, self.queue_path)
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(SUPERVISE_SECONDS)
+            for index, process in enumerate(self.processes):
+                if process.is_alive():
+                    continue
+                self.restarts += 1
+                logger.error(f"Scraper worker {process.name} (pid {process.pid}) exited with code "
+                             f"{process.exitcode}; restarting it")
+                try:
+                    self.processes[index] = _start_process(index, self.sources, self.concurrency,
+                                                           self.queue_path, self.restarts)
+                except Exception as e:
+                    logger.error(f"Restarting scraper worker {process.name} failed: {e!r}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        stop_processes(self.processes)
+        self.processes = []
+
+    def stats(self) -> dict:
+        return {"processes": len(self.processes), "alive": sum(p.is_alive() for p in self.processes),
+                "restarts": self.restarts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=LOCAL_WORKERS or 1, help="worker processes to run")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="jobs per process")
+    parser.add_argument("--sources", help="comma-separated source names to serve, e.g. \"Tokyo Metro,Kanagawa\"")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="queue database (SCRAPER_QUEUE_PATH)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()] if args.sources else None
+    processes = start_processes(args.processes, sources, args.concurrency, args.queue)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_processes(processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+const API_BASE = 'http://localhost:8004';
+// The running search job survives a reload: its id is kept here and the page reattaches on load
+const JOB_STORAGE_KEY = 'searchJob';
+const MAX_RECONNECTS = 5;
+
 async function search() {
     const freeText = document.getElementById('freeText').value.trim();
     // Keyword and Category inputs are removed. Defaulting to 'all' for category.
@@ -8,13 +13,50 @@ async function search() {
         return;
     }
 
+    // Collect selected sources
+    const sources = [];
+    if (document.getElementById('sourceGov').checked) sources.push('gov');
+    if (document.getElementById('sourceTokyo').checked) sources.push('tokyo');
+    if (document.getElementById('sourceKanagawa').checked) sources.push('kanagawa');
+
+    if (sources.length === 0) {
+        alert("検索対象を少なくとも1つ選択してください");
+        return;
+    }
+
+    try {
+        const response = await fetch(`${API_BASE}/api/v1/search-jobs`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ category: category, free_text: freeText, sources: sources.join(','), layout: 'columns' })
+        });
+
+        if (!response.ok) {
+            throw new Error('Search failed');
+        }
+
+        const job = await response.json();
+        localStorage.setItem(JOB_STORAGE_KEY, JSON.stringify({ id: job.id, freeText: freeText }));
+        await runJob(job.id);
+    } catch (error) {
+        console.error('Error:', error);
+        alert('検索中にエラーが発生しました');
+    }
+}
+
+// Streams a job's events from the start, reconnecting after dropped connections
+// with ?since= so no event is shown twice.
+async function runJob(jobId) {
     const loading = document.getElementById('loading');
     const tbody = document.querySelector('#resultsTable tbody');
+    const logList = document.getElementById('logList');
+    const searchLogs = document.getElementById('searchLogs');
 
     const now = new Date();
     const timeStr = now.toLocaleString('ja-JP', { timeZone: 'Asia/Tokyo' });
 
-
     loading.style.display = 'block';
     const loadingText = document.getElementById('loadingText');
     if (loadingText) {
@@ -22,119 +64,160 @@ async function search() {
     }
 
     tbody.innerHTML = ''; // Clear previous results
+    logList.innerHTML = '';
+    searchLogs.style.display = 'block';
+
+    const state = { since: 0, finished: false, finalResults: null };
 
     try {
-        const url = new URL('http://localhost:8004/api/v1/bids');
-        // Keyword 'q' is no longer used
-        url.searchParams.append('category', category);
-        if (freeText) url.searchParams.append('free_text', freeText);
-
-        // Collect selected sources
-        const sources = [];
-        if (document.getElementById('sourceGov').checked) sources.push('gov');
-        if (document.getElementById('sourceTokyo').checked) sources.push('tokyo');
-        if (document.getElementById('sourceKanagawa').checked) sources.push('kanagawa');
-
-        if (sources.length > 0) {
-            url.searchParams.append('sources', sources.join(','));
-        } else {
-            alert("検索対象を少なくとも1つ選択してください");
-            return;
-        }
+        for (let attempt = 0; !state.finished && attempt <= MAX_RECONNECTS; attempt++) {
+            if (attempt > 0) {
+                await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            }
+            let response;
+            try {
+                response = await fetch(`${API_BASE}/api/v1/search-jobs/${jobId}/events?since=${state.since}`);
+            } catch (e) {
+                console.error('Connection lost, retrying:', e);
+                continue;
+            }
+            if (response.status === 404) {
+                // Expired or the server restarted
+                localStorage.removeItem(JOB_STORAGE_KEY);
+                return;
+            }
+            if (!response.ok) {
+                throw new Error('Search failed');
+            }
 
-        const response = await fetch(url, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json'
+            try {
+                await readEvents(response, event => handleEvent(event, state, tbody, logList));
+            } catch (e) {
+                console.error('Connection lost, retrying:', e);
             }
-        });
+        }
 
-        if (!response.ok) {
-            throw new Error('Search failed');
+        if (!state.finished) {
+            throw new Error('Search job stream did not finish');
         }
+        localStorage.removeItem(JOB_STORAGE_KEY);
 
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
-        let buffer = '';
-
-        const logList = document.getElementById('logList');
-        const searchLogs = document.getElementById('searchLogs');
-
-        logList.innerHTML = '';
-        searchLogs.style.display = 'block';
-
-        let finalResults = [];
-
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-
-            buffer += decoder.decode(value, { stream: true });
-            const lines = buffer.split('\n');
-            buffer = lines.pop(); // Keep the last incomplete line
-
-            for (const line of lines) {
-                if (!line.trim()) continue;
-                try {
-                    const event = JSON.parse(line);
-                    if (event.type === 'log') {
-                        // Update loading text for immediate feedback
-
-                        // Add to log list
-                        const li = document.createElement('li');
-                        li.innerHTML = `・${event.message}`;
-                        li.style.marginBottom = '5px';
-                        logList.appendChild(li);
-                        // Auto-scroll to bottom of logs
-                    } else if (event.type === 'result') {
-                        finalResults = event.data;
-                    }
-                } catch (e) {
-                    console.error('Error parsing JSON line:', e);
-                }
-            }
+        if (state.finalResults !== null) {
+            // The final list is authoritative (ordering, late dedup)
+            tbody.innerHTML = '';
+            state.finalResults.forEach(item => tbody.appendChild(buildRow(item)));
         }
 
-        if (finalResults.length === 0) {
+        if (tbody.children.length === 0) {
             tbody.innerHTML = '<tr><td colspan="6">結果が見つかりませんでした</td></tr>';
-        } else {
-            finalResults.forEach(item => {
-                const row = document.createElement('tr');
-
-                // Check if expired
-                let isExpired = false;
-                if (item.deadline) {
-                    const deadlineDate = new Date(item.deadline);
-                    const now = new Date();
-                    if (deadlineDate < now) {
-                        isExpired = true;
-                    }
-                }
-
-                if (isExpired) {
-                    row.style.color = '#aaa';
-                    row.style.backgroundColor = '#f0f0f0';
-                }
-
-                row.innerHTML = `
-                    <td>${item.title}</td>
-                    <td>${item.organization}</td>
-                    <td>
-                        ${item.deadline || '-'}
-                        ${isExpired ? '<br><span style="color: red; font-weight: bold; font-size: 0.8em;">受付終了</span>' : ''}
-                    </td>
-                    <td>${item.category}</td>
-                    <td>${item.source}</td>
-                    <td><a href="${item.url}" target="_blank" style="${isExpired ? 'color: #aaa;' : ''}">詳細</a></td>
-                `;
-                tbody.appendChild(row);
-            });
         }
-
-    } catch (error) {
-        console.error('Error:', error);
-        alert('検索中にエラーが発生しました');
     } finally {
         loading.style.display = 'none';
     }
 }
+
+async function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop(); // Keep the last incomplete line
+
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            try {
+                onEvent(JSON.parse(line));
+            } catch (e) {
+                console.error('Error parsing JSON line:', e);
+            }
+        }
+    }
+}
+
+function handleEvent(event, state, tbody, logList) {
+    if (event.seq !== undefined) {
+        state.since = event.seq + 1;
+    }
+    if (event.type === 'log') {
+        // Add to log list
+        const li = document.createElement('li');
+        li.innerHTML = `・${event.message}`;
+        li.style.marginBottom = '5px';
+        logList.appendChild(li);
+    } else if (event.type === 'result_chunk') {
+        // Show rows from each site as soon as that site answers; with ranking on,
+        // positions says where each row goes among the rows shown so far
+        const positions = event.positions;
+        rowsOf(event.data).forEach((item, i) => {
+            const before = positions ? tbody.children[positions[i]] : null;
+            tbody.insertBefore(buildRow(item), before || null);
+        });
+    } else if (event.type === 'result') {
+        state.finalResults = rowsOf(event.data);
+        state.finished = true;
+    } else if (event.type === 'error') {
+        state.finished = true;
+        alert(event.message || '検索中にエラーが発生しました');
+    }
+}
+
+// Reattach to a search that was still running when the page was reloaded
+window.addEventListener('load', () => {
+    const saved = localStorage.getItem(JOB_STORAGE_KEY);
+    if (!saved) return;
+    try {
+        const job = JSON.parse(saved);
+        document.getElementById('freeText').value = job.freeText || '';
+        runJob(job.id).catch(error => console.error('Error:', error));
+    } catch (e) {
+        localStorage.removeItem(JOB_STORAGE_KEY);
+    }
+});
+
+// Results arrive as {"columns": [...], "rows": [[...]]}; rebuild one object per row
+function rowsOf(data) {
+    if (Array.isArray(data)) return data;
+    return data.rows.map(values => {
+        const item = {};
+        data.columns.forEach((column, i) => { item[column] = values[i]; });
+        return item;
+    });
+}
+
+function buildRow(item) {
+    const row = document.createElement('tr');
+
+    // Check if expired
+    let isExpired = false;
+    if (item.deadline) {
+        const deadlineDate = new Date(item.deadline);
+        const now = new Date();
+        if (deadlineDate < now) {
+            isExpired = true;
+        }
+    }
+
+    if (isExpired) {
+        row.style.color = '#aaa';
+        row.style.backgroundColor = '#f0f0f0';
+    }
+
+    row.innerHTML = `
+        <td>${item.title}</td>
+        <td>${item.organization}</td>
+        <td>
+            ${item.deadline || '-'}
+            ${isExpired ? '<br><span style="color: red; font-weight: bold; font-size: 0.8em;">受付終了</span>' : ''}
+        </td>
+        <td>${item.category}</td>
+        <td>${item.source}</td>
+        <td><a href="${item.url}" target="_blank" style="${isExpired ? 'color: #aaa;' : ''}">詳細</a></td>
+    `;
+    return row;
+}